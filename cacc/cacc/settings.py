@@ -7,6 +7,32 @@ env = environ.Env(
     SECRET_KEY=(str, "1bi0em9uelpr=93qwj41(@$o=_^ifct3)0#$mgty(mt+fii-_#"),
     ALLOWED_HOSTS=list,
     TIME_ZONE=(str, "UTC"),
+    REVIEWS_BATCH_MAX_SIZE=(int, 1000),
+    REVIEWS_BATCH_CHUNK_SIZE=(int, 500),
+    REVIEWS_EXPORT_CHUNK_SIZE=(int, 2000),
+    CACHE_URL=(str, "locmemcache://"),
+    REVIEWS_CACHE_TTL=(int, 300),
+    REVIEWS_COUNT_TTL=(int, 300),
+    REVIEWS_AUTH_CACHE_SIZE=(int, 10000),
+    REVIEWS_AUTH_CACHE_TTL=(int, 60),
+    REVIEWS_PERF_SAMPLE_RATE=(float, 1.0),
+    REVIEWS_INGEST_QUEUE=(bool, False),
+    REVIEWS_INGEST_PATH=(str, None),
+    REVIEWS_INGEST_WORKER=(bool, True),
+    REVIEWS_INGEST_MAX_PENDING=(int, 100000),
+    REVIEWS_INGEST_BATCH_SIZE=(int, 500),
+    REVIEWS_INGEST_DRAIN_TIMEOUT=(int, 30),
+    DATABASE_REPLICA_URLS=(list, []),
+    DATABASE_CONN_MAX_AGE=(int, 60),
+    REVIEWS_REPLICA_PIN_SECONDS=(int, 5),
+    REVIEWS_THROTTLE_REVIEWER=(str, "60/min"),
+    REVIEWS_THROTTLE_ADDRESS=(str, "300/min"),
+    REVIEWS_NUM_PROXIES=(int, None),
+    REVIEWS_DUPLICATE_ACTION=(str, "flag"),
+    REVIEWS_DUPLICATE_THRESHOLD=(float, 0.8),
+    REVIEWS_COMPRESSION=(bool, True),
+    REVIEWS_GZIP_LEVEL=(int, 5),
+    REVIEWS_BROTLI_QUALITY=(int, 6),
 )
 
 environ.Env.read_env()
@@ -27,10 +53,13 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "rest_framework",
     "django_filters",
-    "reviews",
+    "reviews.apps.ReviewsConfig",
 ]
 
 MIDDLEWARE = [
+    "reviews.middleware.PerformanceMiddleware",
+    "reviews.middleware.ReplicaPinMiddleware",
+    "reviews.middleware.CompressionMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -64,6 +93,24 @@ DATABASES = {
     "default": env.db(),
 }
 
+# Read replicas, which mirror the primary database when testing
+for index, url in enumerate(env("DATABASE_REPLICA_URLS"), 1):
+    DATABASES[f"replica{index}"] = {
+        **environ.Env.db_url_config(url),
+        "TEST": {"MIRROR": "default"},
+    }
+
+# Connections are kept open across requests and checked before being reused
+for database in DATABASES.values():
+    database.setdefault("CONN_MAX_AGE", env("DATABASE_CONN_MAX_AGE"))
+    database.setdefault("CONN_HEALTH_CHECKS", True)
+
+DATABASE_ROUTERS = ["reviews.routers.ReadReplicaRouter"]
+
+CACHES = {
+    "default": env.cache(),
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": (
@@ -105,10 +152,109 @@ LOGIN_URL = "login"
 REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": ["rest_framework.permissions.IsAdminUser"],
     "DEFAULT_PAGINATION_CLASS": (
-        "rest_framework.pagination.LimitOffsetPagination"
+        "reviews.api.v1.pagination.CountedPagination"
     ),
     "PAGE_SIZE": 100,
+    "DEFAULT_RENDERER_CLASSES": (
+        "reviews.api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "reviews.api.authentication.CachedUserJWTAuthentication",
     ),
+    # Proxies in front of the application, whose X-Forwarded-For entries
+    # identify clients to the submission limits
+    "NUM_PROXIES": env("REVIEWS_NUM_PROXIES"),
+}
+
+# Largest number of reviews accepted by the batch endpoint and the number of
+# reviews inserted per bulk_create call
+REVIEWS_BATCH_MAX_SIZE = env("REVIEWS_BATCH_MAX_SIZE")
+REVIEWS_BATCH_CHUNK_SIZE = env("REVIEWS_BATCH_CHUNK_SIZE")
+
+# Number of rows fetched per round trip when exporting reviews
+REVIEWS_EXPORT_CHUNK_SIZE = env("REVIEWS_EXPORT_CHUNK_SIZE")
+
+# Cache holding the serialized list pages and their generation counters, and
+# how long a page is kept in seconds
+REVIEWS_CACHE_ALIAS = "default"
+REVIEWS_CACHE_TTL = env("REVIEWS_CACHE_TTL")
+
+# Seconds the unfiltered list counts of each visibility scope stay cached,
+# adjusted by writes meanwhile, and the planner estimate from which filtered
+# lists report an estimated count on PostgreSQL instead of counting rows
+REVIEWS_COUNT_TTL = env("REVIEWS_COUNT_TTL")
+REVIEWS_COUNT_ESTIMATE_THRESHOLD = 10000
+
+# Number of user records kept by the JWT authentication and how long a record
+# is trusted in seconds, which bounds staleness when CACHE_URL is not shared
+REVIEWS_AUTH_CACHE_SIZE = env("REVIEWS_AUTH_CACHE_SIZE")
+REVIEWS_AUTH_CACHE_TTL = env("REVIEWS_AUTH_CACHE_TTL")
+
+# Share of the requests whose timings are recorded, sent in a Server-Timing
+# header and aggregated by /api/v1/metrics/, 0 disables the recording
+REVIEWS_PERF_SAMPLE_RATE = env("REVIEWS_PERF_SAMPLE_RATE")
+
+# Write-behind review creation: accepted reviews are stored in a durable queue
+# file and inserted in batches by a worker thread of each process, or by
+# manage.py process_review_queue when REVIEWS_INGEST_WORKER is off. New
+# reviews are refused once REVIEWS_INGEST_MAX_PENDING are waiting, and the
+# worker drains the queue for up to REVIEWS_INGEST_DRAIN_TIMEOUT seconds on
+# shutdown
+REVIEWS_INGEST_QUEUE = env("REVIEWS_INGEST_QUEUE")
+REVIEWS_INGEST_PATH = env("REVIEWS_INGEST_PATH") or os.path.join(
+    BASE_DIR, "review-queue.sqlite3"
+)
+REVIEWS_INGEST_WORKER = env("REVIEWS_INGEST_WORKER")
+REVIEWS_INGEST_MAX_PENDING = env("REVIEWS_INGEST_MAX_PENDING")
+REVIEWS_INGEST_BATCH_SIZE = env("REVIEWS_INGEST_BATCH_SIZE")
+REVIEWS_INGEST_DRAIN_TIMEOUT = env("REVIEWS_INGEST_DRAIN_TIMEOUT")
+
+# Seconds between two polls of an idle queue, after which a claimed batch is
+# handed to another worker, and after which processed entries are deleted
+REVIEWS_INGEST_POLL_INTERVAL = 1
+REVIEWS_INGEST_LEASE = 300
+REVIEWS_INGEST_RETENTION = 7 * 86400
+
+# Seconds between two checks for companies changed by other processes, which
+# reload the autocomplete index, and the largest number of suggestions
+REVIEWS_AUTOCOMPLETE_REFRESH = 5
+REVIEWS_AUTOCOMPLETE_MAX_LIMIT = 50
+
+# Replicas serving the safe requests of the API and the admin pages, how long
+# the reads of a user stay on the primary after a write, and the seconds
+# between two health checks of a replica
+REVIEWS_READ_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+REVIEWS_REPLICA_PIN_SECONDS = env("REVIEWS_REPLICA_PIN_SECONDS")
+REVIEWS_REPLICA_CHECK_INTERVAL = 10
+
+# Seconds a review may take to commit after its date, which the daily rating
+# rollup waits before counting it, the number of company days written per
+# query by a refresh, and the longest time series served
+REVIEWS_ROLLUP_SETTLE = 60
+REVIEWS_ROLLUP_BATCH_SIZE = 500
+REVIEWS_ROLLUP_MAX_DAYS = 366
+
+# Largest number of reviews submitted, alone or in batches, per reviewer and
+# per client address, such as "60/min", empty for no limit
+REVIEWS_THROTTLE_RATES = {
+    "reviewer": env("REVIEWS_THROTTLE_REVIEWER"),
+    "address": env("REVIEWS_THROTTLE_ADDRESS"),
 }
+
+# What happens to reviews whose summary nearly duplicates another one:
+# "flag" records the most similar review, "reject" refuses the submission and
+# an empty value skips the detection. Summaries are near-duplicates from an
+# estimated share of common word triples of REVIEWS_DUPLICATE_THRESHOLD, and
+# at most REVIEWS_DUPLICATE_MAX_CANDIDATES reviews are compared with each one
+REVIEWS_DUPLICATE_ACTION = env("REVIEWS_DUPLICATE_ACTION")
+REVIEWS_DUPLICATE_THRESHOLD = env("REVIEWS_DUPLICATE_THRESHOLD")
+REVIEWS_DUPLICATE_MAX_CANDIDATES = 100
+
+# JSON and NDJSON responses of REVIEWS_COMPRESSION_MIN_SIZE bytes or more are
+# compressed for the clients accepting it, with brotli when the brotli
+# package is installed and gzip otherwise, at the given levels
+REVIEWS_COMPRESSION = env("REVIEWS_COMPRESSION")
+REVIEWS_GZIP_LEVEL = env("REVIEWS_GZIP_LEVEL")
+REVIEWS_BROTLI_QUALITY = env("REVIEWS_BROTLI_QUALITY")
+REVIEWS_COMPRESSION_MIN_SIZE = 1024
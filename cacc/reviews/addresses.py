@@ -0,0 +1,39 @@
+"""Packed client addresses and CIDR ranges
+
+Addresses are packed to 16 bytes, IPv4 addresses being mapped into IPv6 as
+``::ffff:a.b.c.d``. Packed addresses compare as bytes in address order on
+every database, so the addresses of a network are a contiguous range of the
+indexed column, read with an index range scan for both families.
+"""
+
+import ipaddress
+
+# Prefix of the IPv4 addresses mapped into IPv6
+IPV4_MAPPED = bytes(10) + b"\xff\xff"
+
+
+def pack(address):
+    """Gets the 16 bytes of an address, or None if it is not valid"""
+
+    try:
+        address = ipaddress.ip_address(address)
+
+    except ValueError:
+        return None
+
+    if address.version == 4:
+        return IPV4_MAPPED + address.packed
+
+    return address.packed
+
+
+def network_range(network):
+    """Gets the first and last packed addresses of a network
+
+    Accepts a CIDR such as ``203.0.113.0/24`` or ``2001:db8::/48``, host bits
+    being ignored, or a single address. Raises ``ValueError`` otherwise.
+    """
+
+    network = ipaddress.ip_network(network.strip(), strict=False)
+
+    return pack(network.network_address), pack(network.broadcast_address)
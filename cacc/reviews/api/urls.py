@@ -1,3 +1,3 @@
-from .v1.urls import router as v1
+from .v1 import urls as v1
 
-urlpatterns = [*v1.urls]
+urlpatterns = [*v1.urlpatterns]
@@ -0,0 +1,44 @@
+"""Visibility of reviews to the requesting user
+
+Staff users see every review, regular users their own reviews only. The
+sync viewset and the async views share these rules.
+"""
+
+from ... import cache, models
+
+
+class ReviewAccessMixin:
+    """Scopes the reviews of a view to the ones the user may access"""
+
+    def get_queryset(self):
+        """Filters the query based on the current user"""
+
+        user = self.request.user
+        queryset = models.CompanyReview.objects.all()
+
+        # Make sure regular users can access their own reviews only
+        if not user.is_staff:
+            queryset = queryset.filter(reviewer=user)
+
+        return queryset
+
+    def get_archived_queryset(self):
+        """Gets the archived reviews the current user may read"""
+
+        user = self.request.user
+        queryset = models.ArchivedReview.objects.all()
+
+        if not user.is_staff:
+            queryset = queryset.filter(reviewer=user)
+
+        return queryset
+
+    def get_count_scope(self):
+        """Counts the list from the counter of the reviews the user sees"""
+
+        user = self.request.user
+
+        if user.is_staff:
+            return cache.ALL_SCOPE
+
+        return cache.reviewer_scope(user.pk)
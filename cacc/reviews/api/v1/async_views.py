@@ -0,0 +1,283 @@
+"""Async views listing, retrieving and creating reviews
+
+Under ASGI these views wait on the cache and the database without holding a
+worker thread. They accept the same requests and respond with the same data
+as the matching actions of ``CompanyReviewViewSet``.
+"""
+
+from contextlib import suppress
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views import View
+from rest_framework import exceptions, permissions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from ... import duplicates, models, perf
+from .. import authentication, renderers
+from . import (
+    access,
+    fieldsets,
+    filters,
+    pagination,
+    records,
+    serializers,
+    throttling,
+    views,
+)
+
+
+class AsyncAPIView(View):
+    """Base of the async API views
+
+    Authenticates the request with its JWT, checks the permissions and the
+    throttles and turns API exceptions into JSON error responses as DRF
+    views do.
+    """
+
+    authentication_class = authentication.CachedUserJWTAuthentication
+    permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = []
+    renderer = renderers.FastJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """Exempts the view from CSRF checks, tokens authenticate it"""
+
+        view = super().as_view(**initkwargs)
+        # Same as csrf_exempt, which older Django wraps in a sync function
+        view.csrf_exempt = True
+
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        """Authenticates the request and runs its handler"""
+
+        request = Request(
+            request,
+            parsers=[
+                parser() for parser in api_settings.DEFAULT_PARSER_CLASSES
+            ],
+        )
+        self.request = request
+
+        try:
+            await self.authenticate(request)
+            self.check_permissions(request)
+            # The throttle counters are read and written with the sync cache
+            await sync_to_async(self.check_throttles)(request)
+
+            return await super().dispatch(request, *args, **kwargs)
+
+        except exceptions.APIException as error:
+            return self.handle_exception(error)
+
+    async def authenticate(self, request):
+        """Sets the user and the token of the request"""
+
+        result = await self.authentication_class().aauthenticate(request)
+
+        if result is None:
+            request.user, request.auth = AnonymousUser(), None
+
+        else:
+            request.user, request.auth = result
+
+    def check_permissions(self, request):
+        """Rejects requests lacking any of the permissions"""
+
+        for permission_class in self.permission_classes:
+            if not permission_class().has_permission(request, self):
+                if request.auth is None:
+                    raise exceptions.NotAuthenticated()
+
+                raise exceptions.PermissionDenied()
+
+    def get_throttles(self):
+        """Gets the throttles of the request"""
+
+        return [throttle_class() for throttle_class in self.throttle_classes]
+
+    def check_throttles(self, request):
+        """Rejects requests over the rate of any of the throttles"""
+
+        durations = [
+            throttle.wait()
+            for throttle in self.get_throttles()
+            if not throttle.allow_request(request, self)
+        ]
+
+        if durations:
+            durations = [wait for wait in durations if wait is not None]
+            raise exceptions.Throttled(max(durations, default=None))
+
+    def handle_exception(self, error):
+        """Responds with the details of an API exception"""
+
+        if isinstance(error.detail, (list, dict)):
+            data = error.detail
+
+        else:
+            data = {"detail": error.detail}
+
+        response = self.render(data, error.status_code)
+
+        if getattr(error, "wait", None):
+            response["Retry-After"] = "%d" % error.wait
+
+        if response.status_code == status.HTTP_401_UNAUTHORIZED:
+            response["WWW-Authenticate"] = (
+                self.authentication_class().authenticate_header(self.request)
+            )
+
+        return response
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        """Renders data as a JSON response"""
+
+        with perf.timed("render"):
+            content = self.renderer.render(data)
+
+        return HttpResponse(
+            content, status=status_code, content_type="application/json"
+        )
+
+
+class AsyncReviewMixin(access.ReviewAccessMixin):
+    """Scopes the reviews to the ones the user may access"""
+
+    filter_backends = [
+        filters.ReviewFilterBackend,
+        filters.ReviewSearchFilter,
+        filters.ReviewOrderingFilter,
+    ]
+    ordering_fields = ("date", "rating", "id")
+
+    def get_fieldset(self):
+        """Gets the review fields selected by the request, or None"""
+
+        return fieldsets.select_fields(
+            self.request.query_params,
+            serializers.CompanyReviewSerializer.Meta.fields,
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        """Gets a review serializer for the current request"""
+
+        kwargs.setdefault("context", {})["request"] = self.request
+
+        return serializers.CompanyReviewSerializer(*args, **kwargs)
+
+
+class AsyncReviewListView(AsyncReviewMixin, AsyncAPIView):
+    """Lists and creates reviews"""
+
+    throttle_classes = [
+        throttling.ReviewerRateThrottle,
+        throttling.AddressRateThrottle,
+    ]
+
+    def get_throttles(self):
+        """Limits the rate of submissions as the sync create does"""
+
+        if self.request.method != "POST":
+            return []
+
+        return super().get_throttles()
+
+    async def get(self, request):
+        """Lists the visible reviews a page at a time"""
+
+        queryset = self.get_queryset()
+
+        # The filters only build the query, none of them reads the database
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(request, queryset, self)
+
+        fields = self.get_fieldset()
+        paginator = pagination.ReviewPagination()
+        page = await paginator.apaginate_queryset(
+            records.review_rows(queryset, fields), request, self
+        )
+        data = records.review_record_list(page, fields)
+
+        return self.render(paginator.get_paginated_response(data).data)
+
+    async def post(self, request):
+        """Creates a review, or queues it when ingestion is write-behind"""
+
+        context = {
+            "preloaded": {"company": await self.preload_companies(request)}
+        }
+        serializer = self.get_serializer(data=request.data, context=context)
+
+        # Rejecting near-duplicates looks up similar summaries
+        if settings.REVIEWS_DUPLICATE_ACTION == duplicates.REJECT:
+            await sync_to_async(serializer.is_valid)(raise_exception=True)
+
+        else:
+            serializer.is_valid(raise_exception=True)
+
+        if settings.REVIEWS_INGEST_QUEUE:
+            data = await sync_to_async(views.queue_review)(request, serializer)
+            response = self.render(data, status.HTTP_202_ACCEPTED)
+            response["Location"] = data["url"]
+
+            return response
+
+        # The review and its company's aggregates are saved in a single
+        # transaction, which the async ORM cannot open
+        await sync_to_async(serializer.save)()
+
+        return self.render(serializer.data, status.HTTP_201_CREATED)
+
+    async def preload_companies(self, request):
+        """Loads the company referenced by the submitted review"""
+
+        company_id = None
+
+        if isinstance(request.data, dict):
+            with suppress(TypeError, ValueError):
+                company_id = int(request.data.get("company"))
+
+        if company_id is None or not serializers.pks_in_range(
+            models.Company, {company_id}
+        ):
+            return {}
+
+        return {
+            company.pk: company
+            async for company in models.Company.objects.filter(pk=company_id)
+        }
+
+
+class AsyncReviewDetailView(AsyncReviewMixin, AsyncAPIView):
+    """Retrieves a single review"""
+
+    async def get(self, request, pk):
+        """Responds with a review visible to the user"""
+
+        fields = self.get_fieldset()
+
+        try:
+            row = await records.review_rows(self.get_queryset(), fields).aget(
+                pk=pk
+            )
+
+        except models.CompanyReview.DoesNotExist:
+            archived = records.review_rows(
+                self.get_archived_queryset(), fields
+            )
+
+            try:
+                row = await archived.aget(pk=pk)
+
+            except models.ArchivedReview.DoesNotExist:
+                raise exceptions.NotFound(
+                    "No CompanyReview matches the given query."
+                )
+
+        return self.render(records.review_record(row, fields))
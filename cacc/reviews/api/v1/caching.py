@@ -0,0 +1,65 @@
+from django.conf import settings
+from rest_framework.response import Response
+
+from ... import cache, routers
+
+
+class CachedListMixin:
+    """Caches the serialized pages of a viewset's list action
+
+    Pages are keyed by the visibility scope of the user, the generations of
+    the models the list depends on and the full request url. Writing any of
+    those models bumps its generation, which orphans the cached pages.
+    """
+
+    cache_name = None
+    cache_models = ()
+
+    def __init_subclass__(cls, **kwargs):
+        """Registers the cache name of the subclass"""
+
+        super().__init_subclass__(**kwargs)
+
+        if cls.cache_name:
+            cache.CACHED_VIEWS.add(cls.cache_name)
+
+    def get_cache_scope(self):
+        """Gets the visibility scope of the user, None to skip caching"""
+
+        return "all"
+
+    def list(self, request, *args, **kwargs):
+        """Responds with a cached page when there is one"""
+
+        scope = self.get_cache_scope()
+
+        if scope is None:
+            return super().list(request, *args, **kwargs)
+
+        labels = [model._meta.label for model in self.cache_models]
+        key = cache.page_key(
+            self.cache_name,
+            scope,
+            cache.get_generations(labels),
+            request.build_absolute_uri(),
+        )
+        backend = cache.get_cache()
+        data = backend.get(key)
+
+        if data is not None:
+            cache.count(self.cache_name, "hits")
+            return Response(data)
+
+        cache.count(self.cache_name, "misses")
+        response = super().list(request, *args, **kwargs)
+
+        if response.status_code == 200:
+            ttl = settings.REVIEWS_CACHE_TTL
+
+            # A lagging replica may miss the write that bumped a generation
+            if routers.CURRENT.get() is not None:
+                ttl = min(ttl, settings.REVIEWS_REPLICA_PIN_SECONDS)
+
+            backend.set(key, response.data, ttl)
+
+        return response
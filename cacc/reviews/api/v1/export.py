@@ -0,0 +1,78 @@
+import csv
+import json
+
+from . import records
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class Echo:
+    """File-like object handing back whatever is written to it"""
+
+    def write(self, value):
+        """Returns the written value instead of storing it"""
+
+        return value
+
+
+def review_rows(queryset, chunk_size):
+    """Yields review rows as dicts keyed by serializer field name
+
+    Rows are read with a chunked iterator, which uses a server-side cursor
+    where the database supports it, so memory use does not grow with the
+    size of the export.
+    """
+
+    rows = records.review_rows(queryset.order_by("id"))
+
+    return records.review_records(rows.iterator(chunk_size=chunk_size))
+
+
+def ndjson_lines(rows):
+    """Encodes rows as newline delimited JSON"""
+
+    for row in rows:
+        line = json.dumps(row, ensure_ascii=False, separators=(",", ":"))
+        yield line + "\n"
+
+
+def csv_lines(rows):
+    """Encodes rows as CSV with a header line"""
+
+    writer = csv.writer(Echo())
+
+    yield writer.writerow([name for name, _ in records.REVIEW_FIELDS])
+
+    for row in rows:
+        yield writer.writerow(row.values())
+
+
+def buffered(lines, size=64 * 1024):
+    """Joins encoded lines into chunks of roughly ``size`` characters
+
+    Streaming every line on its own would cost one write per row.
+    """
+
+    chunk = []
+    length = 0
+
+    for line in lines:
+        chunk.append(line)
+        length += len(line)
+
+        if length >= size:
+            yield "".join(chunk)
+            chunk = []
+            length = 0
+
+    if chunk:
+        yield "".join(chunk)
+
+
+ENCODERS = {
+    "ndjson": ndjson_lines,
+    "csv": csv_lines,
+}
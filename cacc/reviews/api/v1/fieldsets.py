@@ -0,0 +1,106 @@
+"""Sparse fieldsets selected with the ``fields`` and ``exclude`` parameters
+
+``?fields=id,title`` keeps only the listed fields of each object and
+``?exclude=summary`` drops the listed ones, both may be combined. The
+selection narrows the columns read from the database as well as the output.
+"""
+
+from rest_framework.exceptions import ValidationError
+
+# Read actions that accept a fieldset, writes always use every field
+SPARSE_ACTIONS = ("list", "retrieve")
+
+
+def parse_names(value):
+    """Splits a comma separated list of names"""
+
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def select_fields(query_params, available):
+    """Gets the names selected by the request, in the order of available
+
+    Returns None when the request does not select any field.
+    """
+
+    requested = {}
+
+    for param in ("fields", "exclude"):
+        if param in query_params:
+            names = parse_names(query_params[param])
+            unknown = [name for name in names if name not in available]
+
+            if unknown:
+                raise ValidationError(
+                    {
+                        param: [
+                            f"Unknown fields: {', '.join(unknown)}. Choose "
+                            f"from {', '.join(available)}."
+                        ]
+                    }
+                )
+
+            requested[param] = set(names)
+
+    if not requested:
+        return None
+
+    included = requested.get("fields", set(available))
+    excluded = requested.get("exclude", set())
+
+    return tuple(
+        name for name in available if name in included and name not in excluded
+    )
+
+
+class SparseFieldsetMixin:
+    """Serves the read actions of a viewset with the requested fields only
+
+    The model fields backing the selected serializer fields are loaded with
+    ``only()``, the primary key is always loaded.
+    """
+
+    def get_fieldset(self):
+        """Gets the serializer fields selected by the request, or None"""
+
+        if self.action not in SPARSE_ACTIONS:
+            return None
+
+        if not hasattr(self, "_fieldset"):
+            available = self.get_serializer_class().Meta.fields
+            self._fieldset = select_fields(
+                self.request.query_params, available
+            )
+
+        return self._fieldset
+
+    def get_queryset(self):
+        """Defers the columns of the fields left out"""
+
+        queryset = super().get_queryset()
+        fieldset = self.get_fieldset()
+
+        if fieldset is None:
+            return queryset
+
+        opts = queryset.model._meta
+        concrete = {field.name for field in opts.concrete_fields}
+
+        return queryset.only(
+            opts.pk.name, *(name for name in fieldset if name in concrete)
+        )
+
+    def get_serializer(self, *args, **kwargs):
+        """Gets a serializer outputting the selected fields only"""
+
+        serializer = super().get_serializer(*args, **kwargs)
+        fieldset = self.get_fieldset()
+
+        if fieldset is not None:
+            fields = getattr(serializer, "child", serializer).fields
+
+            for name in list(fields):
+                if name not in fieldset:
+                    fields.pop(name)
+
+        return serializer
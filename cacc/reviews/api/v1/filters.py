@@ -0,0 +1,134 @@
+import django_filters
+from django import forms
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters
+
+from ... import addresses, models, search
+
+
+class ReviewSearchFilter(filters.BaseFilterBackend):
+    """Filters reviews with full-text search, best matches first"""
+
+    search_param = "search"
+
+    def filter_queryset(self, request, queryset, view):
+        """Applies the search terms of the request, if any"""
+
+        terms = request.query_params.get(self.search_param, "").strip()
+
+        if not terms:
+            return queryset
+
+        return search.search_reviews(queryset, terms)
+
+    def get_schema_operation_parameters(self, view):
+        """Describes the search parameter"""
+
+        return [
+            {
+                "name": self.search_param,
+                "required": False,
+                "in": "query",
+                "description": "Words to search in titles and summaries.",
+                "schema": {"type": "string"},
+            }
+        ]
+
+
+class NetworkField(forms.CharField):
+    """Form field parsing a CIDR or an address to a packed address range"""
+
+    def to_python(self, value):
+        """Gets the first and last packed addresses, or None"""
+
+        value = super().to_python(value)
+
+        if not value:
+            return None
+
+        try:
+            return addresses.network_range(value)
+
+        except ValueError:
+            raise forms.ValidationError(
+                "Enter an IPv4 or IPv6 address or network, such as "
+                "203.0.113.0/24.",
+                code="invalid",
+            )
+
+
+class NetworkFilter(django_filters.Filter):
+    """Filters on the packed addresses of a network, a range scan"""
+
+    field_class = NetworkField
+
+    def filter(self, qs, value):
+        """Keeps the rows whose packed address is in the range"""
+
+        if value is None:
+            return qs
+
+        return qs.filter(**{f"{self.field_name}__range": value})
+
+
+class ReviewFilterSet(django_filters.FilterSet):
+    """Filters reviews by company, rating, reviewer, date and address
+
+    Every combination is served by an index of migration 0007, the address
+    filter by the index of migration 0010. The filters on reviewer and
+    address are only offered to staff users.
+    """
+
+    company = django_filters.NumberFilter(field_name="company")
+    rating = django_filters.RangeFilter(field_name="rating")
+    reviewer = django_filters.NumberFilter(field_name="reviewer")
+    date = django_filters.IsoDateTimeFromToRangeFilter(field_name="date")
+    network = NetworkFilter(field_name="ip_packed")
+
+    class Meta:
+        """Configuration for this filter set"""
+
+        model = models.CompanyReview
+        fields = ("company", "rating", "reviewer", "date", "network")
+
+    def __init__(self, *args, request=None, **kwargs):
+        """Drops the staff filters for regular users"""
+
+        super().__init__(*args, request=request, **kwargs)
+
+        # Regular users only see their own reviews anyway
+        if request is None or not request.user.is_staff:
+            self.filters.pop("reviewer")
+            self.filters.pop("network")
+
+
+class ReviewFilterBackend(DjangoFilterBackend):
+    """Applies ReviewFilterSet whatever the view declares"""
+
+    def get_filterset_class(self, view, queryset=None):
+        """Gets the filter set of reviews"""
+
+        return ReviewFilterSet
+
+
+class ReviewOrderingFilter(filters.OrderingFilter):
+    """Orders reviews by the ``ordering_fields`` of the view
+
+    Ties are broken by date then id in the direction of the first key, which
+    keeps pages stable and matches the column order of the indexes.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        """Completes the requested ordering with its tie breakers"""
+
+        ordering = super().get_ordering(request, queryset, view)
+
+        if not ordering:
+            return ordering
+
+        prefix = "-" if ordering[0].startswith("-") else ""
+        named = {term.lstrip("-") for term in ordering}
+
+        return list(ordering) + [
+            f"{prefix}{name}" for name in ("date", "id") if name not in named
+        ]
@@ -0,0 +1,481 @@
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import EmptyResultSet
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from ... import cache
+from .filters import ReviewSearchFilter
+
+KEYSET_ORDERING = ("-date", "-id")
+
+# Values of the count query parameter leaving the count out
+NO_COUNT_VALUES = ("0", "false", "no")
+
+
+def encode_cursor(date, pk, reverse=False):
+    """Encodes a keyset position into an opaque cursor string"""
+
+    payload = json.dumps(
+        {"d": date.isoformat(), "i": pk, "r": int(reverse)},
+        separators=(",", ":"),
+    )
+
+    return base64.urlsafe_b64encode(payload.encode("ascii")).decode("ascii")
+
+
+def decode_cursor(cursor):
+    """Decodes an opaque cursor string into a (date, id, reverse) tuple"""
+
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        date = parse_datetime(payload["d"])
+        pk = int(payload["i"])
+        reverse = bool(payload.get("r", 0))
+
+    except (
+        binascii.Error,
+        KeyError,
+        TypeError,
+        ValueError,
+        UnicodeError,
+    ):
+        raise NotFound("Invalid cursor")
+
+    if date is None:
+        raise NotFound("Invalid cursor")
+
+    return date, pk, reverse
+
+
+def keyset_queryset(queryset, date=None, pk=None, reverse=False, size=100):
+    """Builds the query of up to ``size + 1`` rows following a position
+
+    When ``reverse`` is set the rows preceding the position are selected
+    instead, oldest first.
+    """
+
+    if reverse:
+        if date is not None:
+            queryset = queryset.filter(date__gte=date).exclude(
+                Q(date=date) & Q(id__lte=pk)
+            )
+        return queryset.order_by("date", "id")[: size + 1]
+
+    if date is not None:
+        queryset = queryset.filter(date__lte=date).exclude(
+            Q(date=date) & Q(id__gte=pk)
+        )
+
+    return queryset.order_by(*KEYSET_ORDERING)[: size + 1]
+
+
+def keyset_page(queryset, date=None, pk=None, reverse=False, size=100):
+    """Fetches up to ``size + 1`` rows following a (date, id) position
+
+    Rows are returned newest first. When ``reverse`` is set the rows
+    preceding the position are fetched instead, still newest first. The
+    extra row tells the caller whether there is another page.
+    """
+
+    rows = list(keyset_queryset(queryset, date, pk, reverse, size))
+
+    if reverse:
+        rows.reverse()
+
+    return rows
+
+
+def selection_sql(queryset):
+    """Gets the SQL selecting the rows of a queryset, whatever their order
+
+    Returns None for a queryset matching nothing.
+    """
+
+    try:
+        return queryset.order_by().values("pk").query.sql_with_params()
+
+    except EmptyResultSet:
+        return None
+
+
+def estimate_count(queryset):
+    """Gets the number of rows of a queryset estimated by the planner
+
+    Only PostgreSQL is supported.
+    """
+
+    sql, params = queryset.order_by().query.sql_with_params()
+
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+
+    # psycopg decodes the json column, other drivers may not
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+class CountedPagination(LimitOffsetPagination):
+    """Limit/offset pagination avoiding ``COUNT(*)`` where it can
+
+    Lists the filters leave whole are counted from the cached counter of the
+    scope given by the view's ``get_count_scope()``. Filtered lists are
+    counted, unless the PostgreSQL planner estimates them above
+    ``REVIEWS_COUNT_ESTIMATE_THRESHOLD`` rows, in which case the estimate is
+    sent with ``count_estimated``. Passing ``count=false`` leaves the count
+    out. Without an exact count, one more row is fetched to find whether
+    there is a next page.
+    """
+
+    count_query_param = "count"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginates the queryset with the cheapest count available"""
+
+        self.request = request
+        self.limit = self.get_limit(request)
+
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.count, self.count_exact = self.get_page_count(queryset, view)
+
+        if self.count_exact:
+            return self.slice_page(queryset)
+
+        return self.trim_page(
+            list(queryset[self.offset : self.offset + self.limit + 1])
+        )
+
+    def slice_page(self, queryset):
+        """Slices the page out of a queryset whose count is known"""
+
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        if self.count == 0 or self.offset > self.count:
+            return []
+
+        return list(queryset[self.offset : self.offset + self.limit])
+
+    def trim_page(self, rows):
+        """Trims the extra row fetched after a page of unknown count"""
+
+        self.has_next = len(rows) > self.limit
+
+        return rows[: self.limit]
+
+    def wants_count(self):
+        """Tells whether the client asked for the count"""
+
+        value = self.request.query_params.get(self.count_query_param, "")
+
+        return value.lower() not in NO_COUNT_VALUES
+
+    def get_count_scope(self, queryset, view):
+        """Gets the scope of the cached count of the list, None if filtered"""
+
+        get_scope = getattr(view, "get_count_scope", None)
+        scope = get_scope() if get_scope is not None else None
+
+        if scope is None:
+            return None
+
+        selected = selection_sql(queryset)
+
+        if selected is None or selected != selection_sql(view.get_queryset()):
+            return None
+
+        return scope
+
+    def get_page_count(self, queryset, view):
+        """Gets the count of the list and whether it is exact"""
+
+        if not self.wants_count():
+            return None, False
+
+        scope = self.get_count_scope(queryset, view)
+
+        if scope is not None:
+            label = queryset.model._meta.label
+            return cache.get_count(label, scope, queryset.count), True
+
+        if connections[queryset.db].vendor == "postgresql":
+            estimate = estimate_count(queryset)
+
+            if estimate >= settings.REVIEWS_COUNT_ESTIMATE_THRESHOLD:
+                return estimate, False
+
+        return queryset.count(), True
+
+    async def aget_page_count(self, queryset, view):
+        """Gets the count of the list and whether it is exact, from async code"""
+
+        if not self.wants_count():
+            return None, False
+
+        scope = self.get_count_scope(queryset, view)
+
+        if scope is not None:
+            label = queryset.model._meta.label
+            return await cache.aget_count(label, scope, queryset.acount), True
+
+        if connections[queryset.db].vendor == "postgresql":
+            estimate = await sync_to_async(estimate_count)(queryset)
+
+            if estimate >= settings.REVIEWS_COUNT_ESTIMATE_THRESHOLD:
+                return estimate, False
+
+        return await queryset.acount(), True
+
+    def get_paginated_response(self, data):
+        """Gets the response for the current page"""
+
+        fields = [("count", self.count)]
+
+        if self.count is not None and not self.count_exact:
+            fields.append(("count_estimated", True))
+
+        fields += [
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]
+
+        return Response(OrderedDict(fields))
+
+    def get_paginated_response_schema(self, schema):
+        """Describes the paginated response"""
+
+        response = super().get_paginated_response_schema(schema)
+        properties = response["properties"]
+        properties["count"]["nullable"] = True
+        properties["count_estimated"] = {"type": "boolean", "example": True}
+
+        return response
+
+    def get_next_link(self):
+        """Gets the link to the next page"""
+
+        if self.count_exact:
+            return super().get_next_link()
+
+        if not self.has_next:
+            return None
+
+        url = self.request.build_absolute_uri()
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+
+        return replace_query_param(
+            url, self.offset_query_param, self.offset + self.limit
+        )
+
+    def get_schema_operation_parameters(self, view):
+        """Describes the pagination parameters"""
+
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.count_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Pass false to leave the count out.",
+                "schema": {"type": "boolean"},
+            }
+        ]
+
+
+class ReviewPagination(CountedPagination):
+    """Limit/offset pagination with an opt-in keyset (cursor) mode
+
+    Passing the ``cursor`` query parameter, even empty, switches to keyset
+    pagination over ``(date, id)``. Every page then costs an index range
+    scan regardless of its depth and stays stable while new reviews arrive.
+    Other orderings and search results, ranked by relevance, are rejected
+    in this mode.
+    """
+
+    cursor_query_param = "cursor"
+    max_limit = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginates the queryset using the requested mode"""
+
+        if self.cursor_query_param not in request.query_params:
+            self.keyset = False
+            return super().paginate_queryset(queryset, request, view)
+
+        date, pk, reverse = self.start_keyset(request)
+        rows = keyset_page(queryset, date, pk, reverse, self.limit)
+
+        return self.finish_keyset(rows, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Paginates the queryset using the async ORM"""
+
+        if self.cursor_query_param in request.query_params:
+            date, pk, reverse = self.start_keyset(request)
+            rows = [
+                row
+                async for row in keyset_queryset(
+                    queryset, date, pk, reverse, self.limit
+                )
+            ]
+
+            if reverse:
+                rows.reverse()
+
+            return self.finish_keyset(rows, reverse)
+
+        self.keyset = False
+        self.request = request
+        self.limit = self.get_limit(request)
+
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.count, self.count_exact = await self.aget_page_count(
+            queryset, view
+        )
+        stop = self.offset + self.limit
+
+        if not self.count_exact:
+            return self.trim_page(
+                [row async for row in queryset[self.offset : stop + 1]]
+            )
+
+        if self.count == 0 or self.offset > self.count:
+            return []
+
+        return [row async for row in queryset[self.offset : stop]]
+
+    def start_keyset(self, request):
+        """Reads the keyset position of the requested page"""
+
+        self.keyset = True
+        self.request = request
+        self.limit = self.get_limit(request) or self.default_limit
+        self.display_page_controls = False
+        self.cursor = request.query_params[self.cursor_query_param]
+        self.check_keyset_ordering(request)
+
+        if self.cursor:
+            return decode_cursor(self.cursor)
+
+        return None, None, False
+
+    def check_keyset_ordering(self, request):
+        """Rejects the orderings keyset pages cannot follow"""
+
+        params = request.query_params
+        ordering = [
+            term.strip()
+            for term in params.get(api_settings.ORDERING_PARAM, "").split(",")
+            if term.strip()
+        ]
+
+        if ordering != list(KEYSET_ORDERING[: len(ordering)]):
+            raise ValidationError(
+                {
+                    api_settings.ORDERING_PARAM: [
+                        "Cursor pages are ordered by "
+                        f"{','.join(KEYSET_ORDERING)} only."
+                    ]
+                }
+            )
+
+        if params.get(ReviewSearchFilter.search_param, "").strip():
+            raise ValidationError(
+                {
+                    ReviewSearchFilter.search_param: [
+                        "Search results cannot be paged with a cursor."
+                    ]
+                }
+            )
+
+    def finish_keyset(self, rows, reverse):
+        """Trims the extra row of a keyset page and records its links"""
+
+        has_more = len(rows) > self.limit
+
+        if reverse:
+            rows = rows[-self.limit :] if has_more else rows
+            self.has_next = self.cursor != ""
+            self.has_previous = has_more
+
+        else:
+            rows = rows[: self.limit]
+            self.has_next = has_more
+            self.has_previous = self.cursor != ""
+
+        self.page = rows
+
+        return rows
+
+    def get_paginated_response(self, data):
+        """Gets the response for the current page"""
+
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        return Response(
+            OrderedDict(
+                [
+                    ("next", self.get_next_link()),
+                    ("previous", self.get_previous_link()),
+                    ("results", data),
+                ]
+            )
+        )
+
+    def _cursor_link(self, row, reverse):
+        """Builds a link to the page after or before a row"""
+
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.offset_query_param)
+        url = replace_query_param(url, self.limit_query_param, self.limit)
+        # Pages hold model instances or rows fetched with values()
+        if isinstance(row, dict):
+            cursor = encode_cursor(row["date"], row["id"], reverse)
+
+        else:
+            cursor = encode_cursor(row.date, row.id, reverse)
+
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        """Gets the link to the next page"""
+
+        if not self.keyset:
+            return super().get_next_link()
+
+        if not self.has_next or not self.page:
+            return None
+
+        return self._cursor_link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        """Gets the link to the previous page"""
+
+        if not self.keyset:
+            return super().get_previous_link()
+
+        if not self.has_previous or not self.page:
+            return None
+
+        return self._cursor_link(self.page[0], reverse=True)
@@ -0,0 +1,160 @@
+"""Read path rendering reviews straight from database rows
+
+Building ``CompanyReviewSerializer`` fields and model instances dominates the
+cost of a review page. Reviews that are only read are fetched with
+``values()`` instead and mapped to the exact representation the serializer
+would produce.
+"""
+
+import datetime
+
+from django.http import Http404
+from rest_framework import ISO_8601, serializers
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from ... import perf
+
+# Serializer field names of a review and the columns holding their values
+REVIEW_FIELDS = (
+    ("id", "id"),
+    ("company", "company_id"),
+    ("rating", "rating"),
+    ("title", "title"),
+    ("summary", "summary"),
+    ("ip_address", "ip_address"),
+    ("date", "date"),
+    ("reviewer", "reviewer_id"),
+)
+REVIEW_COLUMNS = tuple(column for _, column in REVIEW_FIELDS)
+
+# Columns read even when their fields are left out, cursor links need them
+CURSOR_COLUMNS = ("id", "date")
+
+
+def review_fields(fields=None):
+    """Gets the (name, column) pairs of a fieldset, or of every field"""
+
+    if fields is None:
+        return REVIEW_FIELDS
+
+    return tuple(
+        (name, column) for name, column in REVIEW_FIELDS if name in fields
+    )
+
+
+def review_rows(queryset, fields=None):
+    """Selects the columns of the review representation"""
+
+    columns = [column for _, column in review_fields(fields)]
+    columns += [column for column in CURSOR_COLUMNS if column not in columns]
+
+    return queryset.values(*columns)
+
+
+def date_formatter():
+    """Gets a function formatting datetimes exactly as DateTimeField does
+
+    The field looks up its format and the current time zone for every value,
+    which costs more than the conversion itself, so both are looked up once.
+    """
+
+    field = serializers.DateTimeField()
+    output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+    zone = field.default_timezone()
+
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+
+    if zone is None:
+        return field.to_representation
+
+    def to_representation(value):
+        """Formats an aware datetime in the current time zone"""
+
+        if not isinstance(value, datetime.datetime) or value.tzinfo is None:
+            return field.to_representation(value)
+
+        value = value.astimezone(zone).isoformat()
+
+        if value.endswith("+00:00"):
+            return value[:-6] + "Z"
+
+        return value
+
+    return to_representation
+
+
+def review_records(rows, fields=None):
+    """Yields the serializer representation of review rows"""
+
+    selected = review_fields(fields)
+    to_date = date_formatter()
+    has_date = any(name == "date" for name, _ in selected)
+
+    for row in rows:
+        record = {name: row[column] for name, column in selected}
+
+        if has_date:
+            record["date"] = to_date(record["date"])
+
+        yield record
+
+
+def review_record_list(rows, fields=None):
+    """Gets the serializer representation of review rows as a list"""
+
+    with perf.timed("serialize"):
+        return list(review_records(rows, fields))
+
+
+def review_record(row, fields=None):
+    """Gets the serializer representation of a review row"""
+
+    with perf.timed("serialize"):
+        return next(review_records([row], fields))
+
+
+class ReviewRecordsMixin:
+    """Serves the list and retrieve actions from review rows
+
+    Only the columns of the fieldset selected by ``get_fieldset()`` are
+    read and rendered. Reviews missing from the queryset are retrieved from
+    ``get_archived_queryset()``, lists only hold the reviews not archived.
+    """
+
+    def list(self, request, *args, **kwargs):
+        """Lists the reviews without building serializers or models"""
+
+        fields = self.get_fieldset()
+        queryset = review_rows(
+            self.filter_queryset(self.get_queryset()), fields
+        )
+        page = self.paginate_queryset(queryset)
+
+        if page is not None:
+            return self.get_paginated_response(
+                review_record_list(page, fields)
+            )
+
+        return Response(review_record_list(queryset, fields))
+
+    def retrieve(self, request, *args, **kwargs):
+        """Responds with a review without building a serializer or model"""
+
+        fields = self.get_fieldset()
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        lookup = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        queryset = review_rows(
+            self.filter_queryset(self.get_queryset()), fields
+        )
+
+        try:
+            row = get_object_or_404(queryset, **lookup)
+
+        except Http404:
+            archived = review_rows(self.get_archived_queryset(), fields)
+            row = get_object_or_404(archived, **lookup)
+
+        return Response(review_record(row, fields))
@@ -1,28 +1,169 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connections, router, transaction
 from rest_framework import serializers
-from ... import models
 
+from ... import addresses, duplicates, models, perf
 
-class ReviewerSerializer(serializers.ModelSerializer):
+
+def get_client_ip(request):
+    """Gets the client address of a request
+
+    The first address of the X-Forwarded-For header is preferred over the
+    address of the connecting peer.
+    """
+
+    meta = request.META
+
+    if "HTTP_X_FORWARDED_FOR" in meta:
+        header_data = meta.get("HTTP_X_FORWARDED_FOR")
+        addresses = header_data.replace(" ", "").split(",")
+        return addresses[0]
+
+    return meta.get("REMOTE_ADDR")
+
+
+def pks_in_range(model, pks):
+    """Gets the primary keys that fit in the primary key column of a model
+
+    Looking up an out of range key fails with an OverflowError or a
+    DataError instead of finding nothing.
+    """
+
+    field = model._meta.pk
+    ops = connections[router.db_for_read(model)].ops
+    low, high = ops.integer_field_range(field.get_internal_type())
+
+    return {
+        pk
+        for pk in pks
+        if (low is None or pk >= low) and (high is None or pk <= high)
+    }
+
+
+class PreloadedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Primary key field that resolves objects preloaded in the context
+
+    Batch endpoints load every referenced object with one query and pass
+    them as ``context["preloaded"][field_name]``, a dict keyed by primary
+    key, to avoid one query per validated item. Objects missing from the
+    preloaded dict do not exist, which lets async views validate without
+    querying.
+    """
+
+    def to_internal_value(self, data):
+        """Resolves the primary key from the preloaded objects if possible"""
+
+        preloaded = self.context.get("preloaded", {}).get(self.field_name)
+
+        if preloaded is None:
+            return super().to_internal_value(data)
+
+        try:
+            pk = self.get_queryset().model._meta.pk.to_python(data)
+
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+        if pk not in preloaded:
+            self.fail("does_not_exist", pk_value=data)
+
+        return preloaded[pk]
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """List serializer timing its representation for the request metrics"""
+
+    @property
+    def data(self):
+        """Gets the representation of the items"""
+
+        with perf.timed("serialize"):
+            return super().data
+
+
+class TimedModelSerializer(serializers.ModelSerializer):
+    """Model serializer timing its representation for the request metrics
+
+    Subclasses set ``list_serializer_class`` to ``TimedListSerializer`` in
+    their Meta so that lists are timed as well.
+    """
+
+    @property
+    def data(self):
+        """Gets the representation of the instance"""
+
+        with perf.timed("serialize"):
+            return super().data
+
+
+class ReviewerSerializer(TimedModelSerializer):
     """Serializes and deserializes Reviewer model data"""
 
     class Meta(object):
         """Configuration for this serializer"""
 
         model = models.Reviewer
+        list_serializer_class = TimedListSerializer
         fields = ("id", "first_name", "last_name")
 
 
-class CompanySerializer(serializers.ModelSerializer):
+class CompanySerializer(TimedModelSerializer):
     """Serializes and deserializes Company model data"""
 
     class Meta(object):
         """Configuration for this serializer"""
 
         model = models.Company
+        list_serializer_class = TimedListSerializer
         fields = ("id", "name")
 
 
-class CompanyReviewSerializer(serializers.ModelSerializer):
+class CompanyRatingStatsSerializer(TimedModelSerializer):
+    """Serializes the rating aggregates of a company"""
+
+    average_rating = serializers.FloatField(read_only=True)
+    histogram = serializers.DictField(
+        child=serializers.IntegerField(), read_only=True
+    )
+
+    class Meta(object):
+        """Configuration for this serializer"""
+
+        model = models.CompanyRatingStats
+        list_serializer_class = TimedListSerializer
+        fields = (
+            "company",
+            "review_count",
+            "rating_sum",
+            "average_rating",
+            "histogram",
+        )
+
+
+class CompanyDailyRatingSerializer(TimedModelSerializer):
+    """Serializes the rating aggregates of a company for one day"""
+
+    average_rating = serializers.FloatField(read_only=True)
+    histogram = serializers.DictField(
+        child=serializers.IntegerField(), read_only=True
+    )
+
+    class Meta(object):
+        """Configuration for this serializer"""
+
+        model = models.CompanyDailyRating
+        list_serializer_class = TimedListSerializer
+        fields = (
+            "day",
+            "review_count",
+            "rating_sum",
+            "average_rating",
+            "histogram",
+        )
+
+
+class CompanyReviewSerializer(TimedModelSerializer):
     """Serializes and deserializes CompanyReview model data"""
 
     reviewer = serializers.ModelField(
@@ -30,6 +171,10 @@ class CompanyReviewSerializer(serializers.ModelSerializer):
         required=False,
         read_only=True,
     )
+    company = PreloadedPrimaryKeyRelatedField(
+        queryset=models.Company.objects.all(),
+        label=models.CompanyReview._meta.get_field("company").verbose_name,
+    )
     ip_address = serializers.ReadOnlyField()
 
     def validate_rating(self, value):
@@ -43,29 +188,77 @@ class CompanyReviewSerializer(serializers.ModelSerializer):
 
         return value
 
-    def create(self, validated_data):
-        """Creates a CompanyReview object"""
+    def validate_summary(self, value):
+        """Rejects near-duplicates of stored summaries if configured"""
+
+        if settings.REVIEWS_DUPLICATE_ACTION != duplicates.REJECT:
+            return value
+
+        exclude = () if self.instance is None else (self.instance.pk,)
+
+        if duplicates.find_duplicate(value, exclude) is not None:
+            raise serializers.ValidationError(
+                "This summary is too similar to another review."
+            )
+
+        return value
+
+    def add_submission_data(self, validated_data):
+        """Adds the reviewer and the client address to validated data"""
+
         request = self.context["request"]
-        meta = request.META
 
-        # Add the reviewer data
         validated_data["reviewer"] = request.user
+        validated_data["ip_address"] = get_client_ip(request)
+        validated_data["ip_packed"] = addresses.pack(
+            validated_data["ip_address"]
+        )
+
+        return validated_data
+
+    def create(self, validated_data):
+        """Creates a CompanyReview object"""
+
+        validated_data = self.add_submission_data(validated_data)
+
+        with transaction.atomic():
+            review = super().create(validated_data)
+            models.CompanyRatingStats.objects.record(
+                [(review.company_id, review.rating, 1)]
+            )
+
+            if duplicates.is_enabled():
+                duplicates.index_reviews([review])
+
+        return review
+
+    def update(self, instance, validated_data):
+        """Updates a CompanyReview object"""
+
+        previous = (instance.company_id, instance.rating)
+        summary = instance.summary
+
+        with transaction.atomic():
+            review = super().update(instance, validated_data)
 
-        # Add the ip address data
-        if "HTTP_X_FORWARDED_FOR" in meta:
-            header_data = meta.get("HTTP_X_FORWARDED_FOR")
-            addresses = header_data.replace(" ", "").split(",")
-            validated_data["ip_address"] = addresses[0]
+            if previous != (review.company_id, review.rating):
+                models.CompanyRatingStats.objects.record(
+                    [
+                        (*previous, -1),
+                        (review.company_id, review.rating, 1),
+                    ]
+                )
 
-        else:
-            validated_data["ip_address"] = meta.get("REMOTE_ADDR")
+            if summary != review.summary and duplicates.is_enabled():
+                duplicates.index_reviews([review], replace=True)
 
-        return super().create(validated_data)
+        return review
 
     class Meta:
         """Configuration for this serializer"""
 
         model = models.CompanyReview
+        list_serializer_class = TimedListSerializer
         fields = (
             "id",
             "company",
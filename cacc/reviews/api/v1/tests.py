@@ -1,14 +1,53 @@
+import csv
+import gzip
+import json
+import os
 import random
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
 from unittest.mock import patch
 
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
-
-from ... import models
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ... import (
+    addresses,
+    autocomplete,
+    cache,
+    compression,
+    duplicates,
+    ingest,
+    models,
+    perf,
+    routers,
+)
+from .. import authentication, renderers
+from . import async_views, records, serializers, throttling
 
 V1_REVIEW_LIST = "api-v1-review-list"
 V1_REVIEW_DETAIL = "api-v1-review-detail"
 V1_REVIEW_LIST_URL = reverse(V1_REVIEW_LIST)
+V1_COMPANY_STATS = "api-v1-company-stats"
+V1_REVIEW_BATCH_URL = reverse("api-v1-review-batch")
+V1_REVIEW_EXPORT_URL = reverse("api-v1-review-export")
+V1_ASYNC_REVIEW_LIST_URL = reverse("api-v1-async-review-list")
+V1_METRICS_URL = reverse("api-v1-metrics-list")
+V1_COMPANY_AUTOCOMPLETE_URL = reverse("api-v1-company-autocomplete")
+V1_COMPANY_LIST_URL = reverse("api-v1-company-list")
+V1_COMPANY_RATINGS = "api-v1-company-ratings"
 
 ADMIN_USER_USERNAME = "admin"
 REGULAR_USER_USERNAME = "regular"
@@ -34,7 +73,18 @@ def create_random_reviews(review_count, users, companies=None):
         )
 
 
-class TestCompanyReviewListingEndpoint(APITestCase):
+class ReviewsAPITestCase(APITestCase):
+    """Base test case isolating the caches shared between requests"""
+
+    def setUp(self):
+        """Clears the cache, which is not rolled back with the database"""
+
+        super().setUp()
+        cache.get_cache().clear()
+        authentication.USER_RECORDS.clear()
+
+
+class TestCompanyReviewListingEndpoint(ReviewsAPITestCase):
     """Tests for the company review listing endpoint"""
 
     fixtures = ["test/companies", "test/users", "test/reviews"]
@@ -139,7 +189,7 @@ class TestCompanyReviewListingEndpoint(APITestCase):
         self.assertEqual(record_count, len(content["results"]))
 
 
-class TestCompanyReviewCreationEndpoint(APITestCase):
+class TestCompanyReviewCreationEndpoint(ReviewsAPITestCase):
     """Tests for the company review creation endpoint"""
 
     fixtures = ["test/companies", "test/users", "test/reviews"]
@@ -251,7 +301,7 @@ class TestCompanyReviewCreationEndpoint(APITestCase):
         self.assertEqual(content["ip_address"], remote_address)
 
 
-class TestCompanyReviewRetrievalEndpoint(APITestCase):
+class TestCompanyReviewRetrievalEndpoint(ReviewsAPITestCase):
     """Tests for the company review retrieval endpoint"""
 
     fixtures = ["test/companies", "test/users", "test/reviews"]
@@ -324,7 +374,7 @@ class TestCompanyReviewRetrievalEndpoint(APITestCase):
             self.assertEqual(review.id, content["id"])
 
 
-class TestCompanyReviewUpdateEndpoint(APITestCase):
+class TestCompanyReviewUpdateEndpoint(ReviewsAPITestCase):
     """Tests for the company review update endpoint"""
 
     fixtures = ["test/companies", "test/users", "test/reviews"]
@@ -366,7 +416,7 @@ class TestCompanyReviewUpdateEndpoint(APITestCase):
                     self.assertEqual(response.status_code, 403)
 
 
-class TestCompanyReviewDeletionEndpoint(APITestCase):
+class TestCompanyReviewDeletionEndpoint(ReviewsAPITestCase):
     """Tests for the company review deletion endpoint"""
 
     fixtures = ["test/companies", "test/users", "test/reviews"]
@@ -409,3 +459,2892 @@ class TestCompanyReviewDeletionEndpoint(APITestCase):
 
                     else:
                         self.assertEqual(response.status_code, 403)
+
+
+class TestCompanyReviewCursorPagination(ReviewsAPITestCase):
+    """Tests for the keyset pagination mode of the review listing endpoint"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates reviews to paginate"""
+
+        super().setUp()
+        models.CompanyReview.objects.all().delete()
+        self.reviewers = models.Reviewer.objects.filter(is_staff=False)
+        create_random_reviews(25, self.reviewers)
+        self.admin = models.Reviewer.objects.filter(is_staff=True).first()
+
+    def collect_pages(self, url):
+        """Follows next links and returns the ids on every page"""
+
+        ids = []
+
+        while url:
+            response = self.client.get(url, format="json")
+            self.assertEqual(response.status_code, 200)
+            content = response.json()
+            self.assertNotIn("count", content)
+            ids.extend(record["id"] for record in content["results"])
+            url = content["next"]
+
+        return ids
+
+    def test_pages_cover_all_reviews_in_order(self):
+        """Tests that following cursors yields every review once in order"""
+
+        self.client.force_authenticate(user=self.admin)
+
+        ids = self.collect_pages(f"{V1_REVIEW_LIST_URL}?cursor=&limit=10")
+        expected = list(
+            models.CompanyReview.objects.order_by("-date", "-id").values_list(
+                "id", flat=True
+            )
+        )
+
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_preceding_page(self):
+        """Tests that the previous link returns the preceding page"""
+
+        self.client.force_authenticate(user=self.admin)
+
+        url = f"{V1_REVIEW_LIST_URL}?cursor=&limit=10"
+        first = self.client.get(url, format="json").json()
+        second = self.client.get(first["next"], format="json").json()
+        back = self.client.get(second["previous"], format="json").json()
+
+        self.assertIsNone(first["previous"])
+        self.assertEqual(back["results"], first["results"])
+
+    def test_new_reviews_do_not_shift_pages(self):
+        """Tests that reviews created while paginating do not shift pages"""
+
+        self.client.force_authenticate(user=self.admin)
+
+        url = f"{V1_REVIEW_LIST_URL}?cursor=&limit=10"
+        first = self.client.get(url, format="json").json()
+
+        create_random_reviews(5, self.reviewers)
+
+        second = self.client.get(first["next"], format="json").json()
+        first_ids = {record["id"] for record in first["results"]}
+
+        self.assertEqual(len(second["results"]), 10)
+        self.assertFalse(first_ids & {r["id"] for r in second["results"]})
+        self.assertLess(
+            max(r["id"] for r in second["results"]), min(first_ids)
+        )
+
+    def test_regular_users_only_see_own_reviews(self):
+        """Tests that keyset pages keep the regular user filter"""
+
+        reviewer = self.reviewers.first()
+        self.client.force_authenticate(user=reviewer)
+
+        ids = self.collect_pages(f"{V1_REVIEW_LIST_URL}?cursor=&limit=3")
+        expected = models.CompanyReview.objects.filter(reviewer=reviewer)
+
+        self.assertEqual(sorted(ids), sorted(r.id for r in expected))
+
+    def test_deep_pages_do_not_use_offset(self):
+        """Tests that keyset pages do not issue OFFSET queries"""
+
+        self.client.force_authenticate(user=self.admin)
+
+        url = f"{V1_REVIEW_LIST_URL}?cursor=&limit=5"
+        first = self.client.get(url, format="json").json()
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(first["next"], format="json")
+
+        for query in context.captured_queries:
+            self.assertNotIn("OFFSET", query["sql"].upper())
+            self.assertNotIn("COUNT(", query["sql"].upper())
+
+    def test_invalid_cursor_is_rejected(self):
+        """Tests that a malformed cursor responds with not found"""
+
+        self.client.force_authenticate(user=self.admin)
+
+        response = self.client.get(
+            f"{V1_REVIEW_LIST_URL}?cursor=not-a-cursor", format="json"
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_other_orderings_are_rejected(self):
+        """Tests that cursor pages refuse orderings they cannot follow"""
+
+        self.client.force_authenticate(user=self.admin)
+
+        for query, param in (
+            ("ordering=rating", "ordering"),
+            ("ordering=-date,rating", "ordering"),
+            ("search=review", "search"),
+        ):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    f"{V1_REVIEW_LIST_URL}?cursor=&{query}", format="json"
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(param, response.json())
+
+        for query in ("ordering=-date", "ordering=-date,-id"):
+            with self.subTest(query=query):
+                response = self.client.get(
+                    f"{V1_REVIEW_LIST_URL}?cursor=&{query}", format="json"
+                )
+                self.assertEqual(response.status_code, 200)
+
+
+class TestCompanyRatingStats(ReviewsAPITestCase):
+    """Tests for the incrementally maintained company rating aggregates"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Prepares companies and users"""
+
+        super().setUp()
+        models.CompanyReview.objects.all().delete()
+        self.company = models.Company.objects.first()
+        self.other_company = models.Company.objects.create(name="Other")
+        self.admin = models.Reviewer.objects.filter(is_staff=True).first()
+        self.reviewer = models.Reviewer.objects.filter(is_staff=False).first()
+
+    def get_stats(self, company):
+        """Gets the stats of a company through the API"""
+
+        self.client.force_authenticate(user=self.admin)
+        url = reverse(V1_COMPANY_STATS, kwargs={"pk": company.id})
+        response = self.client.get(url, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()
+
+    def create_review(self, company):
+        """Creates a review through the API"""
+
+        self.client.force_authenticate(user=self.reviewer)
+        data = {
+            "title": "Title",
+            "summary": "Summary",
+            "company": company.id,
+            "rating": 1,
+        }
+        response = self.client.post(V1_REVIEW_LIST_URL, data, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        return response.json()
+
+    def test_company_without_reviews_has_empty_stats(self):
+        """Tests the stats of a company without reviews"""
+
+        stats = self.get_stats(self.other_company)
+
+        self.assertEqual(stats["review_count"], 0)
+        self.assertIsNone(stats["average_rating"])
+        self.assertEqual(stats["histogram"], dict.fromkeys("12345", 0))
+
+    def test_stats_follow_creation_update_and_deletion(self):
+        """Tests that API writes keep the aggregates up to date"""
+
+        reviews = [self.create_review(self.company) for _ in range(3)]
+
+        stats = self.get_stats(self.company)
+        self.assertEqual(stats["review_count"], 3)
+        self.assertEqual(stats["rating_sum"], 3)
+        self.assertEqual(stats["average_rating"], 1.0)
+        self.assertEqual(stats["histogram"]["1"], 3)
+
+        url = reverse(V1_REVIEW_DETAIL, kwargs={"pk": reviews[0]["id"]})
+        response = self.client.patch(
+            url, {"company": self.other_company.id}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.get_stats(self.company)["review_count"], 2)
+        self.assertEqual(self.get_stats(self.other_company)["review_count"], 1)
+
+        url = reverse(V1_REVIEW_DETAIL, kwargs={"pk": reviews[1]["id"]})
+        response = self.client.delete(url, format="json")
+        self.assertEqual(response.status_code, 204)
+
+        stats = self.get_stats(self.company)
+        self.assertEqual(stats["review_count"], 1)
+        self.assertEqual(stats["histogram"]["1"], 1)
+
+    def test_rebuild_command_fixes_drifted_stats(self):
+        """Tests that the rebuild command verifies and fixes aggregates"""
+
+        # Reviews created outside the API are not aggregated
+        create_random_reviews(4, [self.reviewer], [self.company])
+        models.CompanyReview.objects.filter(
+            id=models.CompanyReview.objects.first().id
+        ).update(rating=3)
+
+        output = {"stdout": StringIO(), "stderr": StringIO()}
+
+        with self.assertRaises(CommandError):
+            call_command("rebuild_company_stats", verify=True, **output)
+
+        call_command("rebuild_company_stats", batch_size=1, **output)
+        call_command("rebuild_company_stats", verify=True, **output)
+
+        stats = self.get_stats(self.company)
+        self.assertEqual(stats["review_count"], 4)
+        self.assertEqual(stats["rating_sum"], 6)
+        self.assertEqual(stats["histogram"]["3"], 1)
+
+
+class TestCompanyReviewBatchEndpoint(ReviewsAPITestCase):
+    """Tests for the batch review creation endpoint"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Authenticates a regular user"""
+
+        super().setUp()
+        self.company = models.Company.objects.first()
+        self.reviewer = models.Reviewer.objects.filter(is_staff=False).first()
+        self.client.force_authenticate(user=self.reviewer)
+
+    def make_items(self, count):
+        """Makes valid review items"""
+
+        return [
+            {
+                "title": f"Title {index}",
+                "summary": f"Summary {index}",
+                "company": self.company.id,
+                "rating": 1,
+            }
+            for index in range(count)
+        ]
+
+    def test_unauthenticated_access_is_rejected(self):
+        """Tests that unauthenticated access is rejected"""
+
+        self.client.force_authenticate(user=None)
+
+        response = self.client.post(
+            V1_REVIEW_BATCH_URL, self.make_items(1), format="json"
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_each_item_gets_a_result(self):
+        """Tests that valid items are created and invalid ones reported"""
+
+        items = self.make_items(3)
+        items[1]["rating"] = 10
+        items.append({**items[0], "company": 9999})
+        before = models.CompanyReview.objects.count()
+
+        response = self.client.post(
+            V1_REVIEW_BATCH_URL,
+            items,
+            format="json",
+            HTTP_X_FORWARDED_FOR="82.73.64.55, 103.0.123.105",
+        )
+        self.assertEqual(response.status_code, 200)
+
+        results = response.json()
+        statuses = [result["status"] for result in results]
+        self.assertEqual(statuses, [201, 400, 201, 400])
+        self.assertIn("rating", results[1]["errors"])
+        self.assertIn("company", results[3]["errors"])
+
+        for result in (results[0], results[2]):
+            review = models.CompanyReview.objects.get(id=result["data"]["id"])
+            self.assertEqual(review.reviewer, self.reviewer)
+            self.assertEqual(review.ip_address, "82.73.64.55")
+            self.assertEqual(result["data"]["reviewer"], self.reviewer.id)
+
+        self.assertEqual(models.CompanyReview.objects.count(), before + 2)
+        self.assertEqual(
+            models.CompanyRatingStats.objects.get(
+                company=self.company
+            ).review_count,
+            2,
+        )
+
+    def test_out_of_range_companies_are_reported(self):
+        """Tests that a company id overflowing its column fails one item"""
+
+        items = self.make_items(2)
+        items.insert(1, {**items[0], "company": 10**30})
+
+        response = self.client.post(V1_REVIEW_BATCH_URL, items, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        results = response.json()
+        self.assertEqual(
+            [result["status"] for result in results], [201, 400, 201]
+        )
+        self.assertIn("does not exist", results[1]["errors"]["company"][0])
+
+    def test_query_count_does_not_grow_with_items(self):
+        """Tests that a batch costs a constant number of queries"""
+
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(
+                V1_REVIEW_BATCH_URL, self.make_items(2), format="json"
+            )
+
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(
+                V1_REVIEW_BATCH_URL, self.make_items(100), format="json"
+            )
+
+        self.assertEqual(
+            len(small.captured_queries), len(large.captured_queries)
+        )
+
+    def test_invalid_payloads_are_rejected(self):
+        """Tests that non-list and oversized payloads are rejected"""
+
+        response = self.client.post(
+            V1_REVIEW_BATCH_URL, self.make_items(1)[0], format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        with self.settings(REVIEWS_BATCH_MAX_SIZE=2):
+            response = self.client.post(
+                V1_REVIEW_BATCH_URL, self.make_items(3), format="json"
+            )
+        self.assertEqual(response.status_code, 400)
+
+
+class TestCompanyReviewExportEndpoint(ReviewsAPITestCase):
+    """Tests for the streaming review export endpoint"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates reviews to export"""
+
+        super().setUp()
+        self.reviewers = models.Reviewer.objects.filter(is_staff=False)
+        self.admin = models.Reviewer.objects.filter(is_staff=True).first()
+        create_random_reviews(30, self.reviewers)
+
+    def export(self, user, output=None):
+        """Exports reviews as a user and returns the streamed text"""
+
+        self.client.force_authenticate(user=user)
+        params = {"output": output} if output else {}
+        response = self.client.get(V1_REVIEW_EXPORT_URL, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_unauthenticated_access_is_rejected(self):
+        """Tests that unauthenticated access is rejected"""
+
+        response = self.client.get(V1_REVIEW_EXPORT_URL)
+        self.assertEqual(response.status_code, 401)
+
+    def test_ndjson_export_matches_the_serializer(self):
+        """Tests that NDJSON rows match the detail representation"""
+
+        response, content = self.export(self.admin)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), models.CompanyReview.objects.count())
+
+        detail = self.client.get(
+            reverse(V1_REVIEW_DETAIL, kwargs={"pk": rows[0]["id"]}),
+            format="json",
+        )
+        self.assertEqual(rows[0], detail.json())
+
+    def test_csv_export_has_a_header(self):
+        """Tests that the CSV export holds a header and every review"""
+
+        response, content = self.export(self.admin, "csv")
+        self.assertEqual(response["Content-Type"], "text/csv")
+
+        rows = list(csv.DictReader(content.splitlines()))
+        self.assertEqual(len(rows), models.CompanyReview.objects.count())
+        self.assertEqual(
+            sorted(int(row["id"]) for row in rows),
+            sorted(models.CompanyReview.objects.values_list("id", flat=True)),
+        )
+
+    def test_regular_users_only_export_own_reviews(self):
+        """Tests that regular users only export their own reviews"""
+
+        reviewer = self.reviewers.first()
+        _, content = self.export(reviewer)
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(
+            len(rows),
+            models.CompanyReview.objects.filter(reviewer=reviewer).count(),
+        )
+        self.assertTrue(all(row["reviewer"] == reviewer.id for row in rows))
+
+    def test_unknown_output_is_rejected(self):
+        """Tests that an unknown output format is rejected"""
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(V1_REVIEW_EXPORT_URL, {"output": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+
+class TestCompanyReviewSearch(ReviewsAPITestCase):
+    """Tests for full-text search on the review listing endpoint"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates reviews to search"""
+
+        super().setUp()
+        self.admin = models.Reviewer.objects.filter(is_staff=True).first()
+        self.reviewer = models.Reviewer.objects.filter(is_staff=False).first()
+        company = models.Company.objects.first()
+        texts = [
+            ("Friendly staff", "The onboarding was quick"),
+            ("Quick answers", "Support was friendly and helpful"),
+            ("Slow payroll", "Salaries were always late"),
+        ]
+        self.reviews = [
+            models.CompanyReview.objects.create(
+                title=title,
+                summary=summary,
+                company=company,
+                rating=1,
+                reviewer=self.reviewer,
+                ip_address="12.34.56.78",
+            )
+            for title, summary in texts
+        ]
+
+    def search(self, terms, user=None):
+        """Searches reviews and returns the ids of the results"""
+
+        self.client.force_authenticate(user=user or self.admin)
+        response = self.client.get(
+            V1_REVIEW_LIST_URL, {"search": terms}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        return [record["id"] for record in response.json()["results"]]
+
+    def test_results_are_ranked(self):
+        """Tests that title matches rank above summary matches"""
+
+        ids = self.search("friendly")
+
+        self.assertEqual(ids, [self.reviews[0].id, self.reviews[1].id])
+
+    def test_stemmed_words_match(self):
+        """Tests that different forms of a word match"""
+
+        self.assertEqual(self.search("salary"), [self.reviews[2].id])
+
+    def test_index_follows_edits_and_deletions(self):
+        """Tests that the index is updated on edit and deletion"""
+
+        review = self.reviews[2]
+        review.title = "Generous bonuses"
+        review.save()
+
+        self.assertEqual(self.search("payroll"), [])
+        self.assertEqual(self.search("bonuses"), [review.id])
+
+        review.delete()
+
+        self.assertEqual(self.search("bonuses"), [])
+
+    def test_search_keeps_the_regular_user_filter(self):
+        """Tests that regular users only find their own reviews"""
+
+        other = models.Reviewer.objects.filter(is_staff=False).last()
+
+        self.assertEqual(self.search("friendly", other), [])
+        self.assertEqual(len(self.search("friendly", self.reviewer)), 2)
+
+    def test_punctuation_only_terms_match_nothing(self):
+        """Tests that terms without words do not fail"""
+
+        self.assertEqual(self.search('"*'), [])
+
+
+class TestListResponseCache(ReviewsAPITestCase):
+    """Tests for the cache of serialized list pages"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Authenticates an administrator"""
+
+        super().setUp()
+        self.admin = models.Reviewer.objects.filter(is_staff=True).first()
+        self.reviewer = models.Reviewer.objects.filter(is_staff=False).first()
+        self.client.force_authenticate(user=self.admin)
+
+    def get_counters(self):
+        """Gets the cache counters through the API"""
+
+        response = self.client.get(reverse("api-v1-cache-stats-list"))
+        self.assertEqual(response.status_code, 200)
+
+        return response.json()["views"]
+
+    def test_repeated_lists_are_served_from_the_cache(self):
+        """Tests that a repeated list does not query the database"""
+
+        url = reverse("api-v1-company-list")
+        first = self.client.get(url, format="json")
+
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get(url, format="json")
+
+        self.assertEqual(len(context.captured_queries), 0)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(
+            self.get_counters()["companies"], {"hits": 1, "misses": 1}
+        )
+
+    def test_writes_invalidate_cached_pages(self):
+        """Tests that writing a model invalidates the pages depending on it"""
+
+        url = reverse("api-v1-company-list")
+        self.client.get(url, format="json")
+
+        models.Company.objects.create(name="New company")
+
+        content = self.client.get(url, format="json").json()
+        names = [record["name"] for record in content["results"]]
+        self.assertIn("New company", names)
+
+        self.client.get(V1_REVIEW_LIST_URL, format="json")
+        self.client.post(
+            V1_REVIEW_BATCH_URL,
+            [
+                {
+                    "title": "Batched",
+                    "summary": "Summary",
+                    "company": models.Company.objects.first().id,
+                    "rating": 1,
+                }
+            ],
+            format="json",
+        )
+
+        content = self.client.get(V1_REVIEW_LIST_URL, format="json").json()
+        self.assertIn("Batched", [r["title"] for r in content["results"]])
+
+    def test_regular_user_lists_are_not_cached(self):
+        """Tests that only the staff view of the reviews is cached"""
+
+        self.client.force_authenticate(user=self.reviewer)
+        self.client.get(V1_REVIEW_LIST_URL, format="json")
+        self.client.get(V1_REVIEW_LIST_URL, format="json")
+
+        self.client.force_authenticate(user=self.admin)
+        self.assertEqual(
+            self.get_counters()["reviews"], {"hits": 0, "misses": 0}
+        )
+
+
+class TestCachedUserJWTAuthentication(ReviewsAPITestCase):
+    """Tests for the JWT authentication backed by cached user records"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Picks a regular user"""
+
+        super().setUp()
+        self.reviewer = models.Reviewer.objects.filter(is_staff=False).first()
+
+    def authenticate(self, user):
+        """Sends an access token of the user with every request"""
+
+        token = RefreshToken.for_user(user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_repeated_requests_do_not_load_the_user(self):
+        """Tests that a known user is not read from the database again"""
+
+        self.authenticate(self.reviewer)
+        self.client.get(V1_REVIEW_LIST_URL, format="json")
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(V1_REVIEW_LIST_URL, format="json")
+
+        self.assertEqual(response.status_code, 200)
+        user_table = models.Reviewer._meta.db_table
+        self.assertFalse(
+            [
+                query
+                for query in context.captured_queries
+                if f'FROM "{user_table}"' in query["sql"]
+            ]
+        )
+
+    def test_deactivated_users_are_rejected(self):
+        """Tests that deactivating a user revokes their cached record"""
+
+        self.authenticate(self.reviewer)
+        response = self.client.get(V1_REVIEW_LIST_URL, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        self.reviewer.is_active = False
+        self.reviewer.save()
+
+        response = self.client.get(V1_REVIEW_LIST_URL, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    def test_permission_changes_take_effect(self):
+        """Tests that promoting a user to staff is seen immediately"""
+
+        self.authenticate(self.reviewer)
+        content = self.client.get(V1_REVIEW_LIST_URL, format="json").json()
+        self.assertNotEqual(
+            content["count"], models.CompanyReview.objects.count()
+        )
+
+        self.reviewer.is_staff = True
+        self.reviewer.save()
+
+        content = self.client.get(V1_REVIEW_LIST_URL, format="json").json()
+        self.assertEqual(
+            content["count"], models.CompanyReview.objects.count()
+        )
+
+    def test_unknown_users_are_rejected(self):
+        """Tests that tokens of deleted users are rejected"""
+
+        user = models.Reviewer.objects.create(username="ephemeral")
+        self.authenticate(user)
+        user.delete()
+
+        response = self.client.get(V1_REVIEW_LIST_URL, format="json")
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(REVIEWS_AUTH_CACHE_SIZE=2)
+    def test_least_recently_used_records_are_evicted(self):
+        """Tests that the record cache never exceeds its size"""
+
+        records = authentication.UserRecordCache()
+
+        for pk in (1, 2, 3):
+            records.set(pk, 0, {"id": pk})
+
+        self.assertIsNone(records.get(1, 0))
+        self.assertEqual(records.get(3, 0), {"id": 3})
+        self.assertIsNone(records.get(3, 1))
+
+
+class TestAsyncReviewEndpoints(ReviewsAPITestCase):
+    """Tests for the async review list, detail and creation endpoints"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Picks an administrator and a regular user"""
+
+        super().setUp()
+        self.admin = models.Reviewer.objects.filter(is_staff=True).first()
+        self.reviewer = models.Reviewer.objects.get(
+            username=REGULAR_USER_USERNAME
+        )
+        create_random_reviews(6, [self.reviewer])
+        create_random_reviews(6, [self.admin])
+
+    def request(self, method, url, user=None, headers=None, **kwargs):
+        """Sends a request through the async test client"""
+
+        headers = dict(headers or {})
+
+        if user is not None:
+            token = RefreshToken.for_user(user).access_token
+            headers["authorization"] = f"Bearer {token}"
+
+        send = getattr(self.async_client, method)
+
+        return async_to_sync(send)(url, headers=headers, **kwargs)
+
+    def test_views_are_async(self):
+        """Tests that the views run natively under ASGI"""
+
+        self.assertTrue(async_views.AsyncReviewListView.view_is_async)
+        self.assertTrue(async_views.AsyncReviewDetailView.view_is_async)
+
+    def test_unauthenticated_access_is_rejected(self):
+        """Tests that unauthenticated access is rejected"""
+
+        response = self.request("get", V1_ASYNC_REVIEW_LIST_URL)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertIn("WWW-Authenticate", response)
+
+        response = self.request(
+            "get",
+            V1_ASYNC_REVIEW_LIST_URL,
+            headers={"authorization": "Bearer invalid"},
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_list_matches_the_sync_endpoint(self):
+        """Tests that both list endpoints respond with the same pages"""
+
+        self.client.force_authenticate(user=self.admin)
+
+        for query in ("?limit=5&offset=3", "?cursor=&limit=5"):
+            expected = self.client.get(V1_REVIEW_LIST_URL + query).json()
+            response = self.request(
+                "get", V1_ASYNC_REVIEW_LIST_URL + query, self.admin
+            )
+
+            self.assertEqual(response.status_code, 200)
+            content = response.json()
+            self.assertEqual(content["results"], expected["results"])
+            self.assertEqual(content.get("count"), expected.get("count"))
+            self.assertEqual(content["next"] is None, expected["next"] is None)
+
+    def test_regular_users_list_their_own_reviews(self):
+        """Tests that regular users only get their own reviews"""
+
+        content = self.request(
+            "get", V1_ASYNC_REVIEW_LIST_URL, self.reviewer
+        ).json()
+
+        self.assertEqual(
+            content["count"],
+            models.CompanyReview.objects.filter(
+                reviewer=self.reviewer
+            ).count(),
+        )
+        self.assertEqual(
+            {review["reviewer"] for review in content["results"]},
+            {self.reviewer.id},
+        )
+
+    def test_retrieval_is_scoped_to_the_user(self):
+        """Tests that regular users cannot retrieve other users' reviews"""
+
+        own = models.CompanyReview.objects.filter(
+            reviewer=self.reviewer
+        ).first()
+        other = models.CompanyReview.objects.exclude(
+            reviewer=self.reviewer
+        ).first()
+        url = reverse("api-v1-async-review-detail", kwargs={"pk": own.id})
+
+        self.client.force_authenticate(user=self.reviewer)
+        expected = self.client.get(
+            reverse(V1_REVIEW_DETAIL, kwargs={"pk": own.id})
+        ).json()
+
+        response = self.request("get", url, self.reviewer)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), expected)
+
+        url = reverse("api-v1-async-review-detail", kwargs={"pk": other.id})
+        response = self.request("get", url, self.reviewer)
+        self.assertEqual(response.status_code, 404)
+
+    def test_reviews_are_created(self):
+        """Tests that creating a review stores it with its aggregates"""
+
+        company = models.Company.objects.first()
+        previous = models.CompanyRatingStats.objects.filter(
+            company=company
+        ).first()
+        previous_count = previous.review_count if previous else 0
+        data = {
+            "title": "Async",
+            "summary": "Summary",
+            "company": company.id,
+            "rating": 1,
+        }
+
+        response = self.request(
+            "post",
+            V1_ASYNC_REVIEW_LIST_URL,
+            self.reviewer,
+            data=data,
+            content_type="application/json",
+            REMOTE_ADDR="10.0.0.1",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        review = models.CompanyReview.objects.get(id=response.json()["id"])
+        self.assertEqual(review.reviewer, self.reviewer)
+        self.assertEqual(review.title, "Async")
+        stats = models.CompanyRatingStats.objects.get(company=company)
+        self.assertEqual(stats.review_count, previous_count + 1)
+
+    def test_invalid_reviews_are_rejected(self):
+        """Tests that invalid reviews get the same errors as the sync API"""
+
+        data = {"title": "Async", "summary": "Summary", "company": 0}
+
+        self.client.force_authenticate(user=self.reviewer)
+        expected = self.client.post(V1_REVIEW_LIST_URL, data, format="json")
+
+        response = self.request(
+            "post",
+            V1_ASYNC_REVIEW_LIST_URL,
+            self.reviewer,
+            data=data,
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), expected.json())
+
+
+class TestReviewRecords(ReviewsAPITestCase):
+    """Tests for the read path rendering reviews from database rows"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates a page of reviews"""
+
+        super().setUp()
+        self.admin = models.Reviewer.objects.filter(is_staff=True).first()
+        create_random_reviews(99, [self.admin])
+        models.CompanyReview.objects.filter(id__in=[1, 2]).update(
+            title="Çafé “quoted” \\ review", summary="Line\nbreak\ttab"
+        )
+        self.queryset = models.CompanyReview.objects.order_by("-date", "-id")
+
+    def render_serializer(self):
+        """Renders the page through the model serializer"""
+
+        serializer = serializers.CompanyReviewSerializer(
+            list(self.queryset), many=True
+        )
+
+        return JSONRenderer().render(serializer.data)
+
+    def render_records(self):
+        """Renders the page through the row mapper"""
+
+        rows = records.review_rows(self.queryset)
+
+        return JSONRenderer().render(list(records.review_records(rows)))
+
+    def test_records_match_the_serializer(self):
+        """Tests that both paths render byte-identical output"""
+
+        self.assertEqual(self.render_records(), self.render_serializer())
+
+        with timezone.override("America/New_York"):
+            self.assertEqual(self.render_records(), self.render_serializer())
+
+    def test_endpoints_match_the_serializer(self):
+        """Tests that list and retrieve respond with the serializer output"""
+
+        self.client.force_authenticate(user=self.admin)
+        review = self.queryset.first()
+        expected = serializers.CompanyReviewSerializer(review).data
+
+        response = self.client.get(
+            reverse(V1_REVIEW_DETAIL, kwargs={"pk": review.id})
+        )
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+        response = self.client.get(V1_REVIEW_LIST_URL, {"cursor": ""})
+        self.assertEqual(
+            JSONRenderer().render(response.data["results"]),
+            self.render_serializer(),
+        )
+
+    def test_records_are_faster_than_the_serializer(self):
+        """Tests that mapping rows is at least three times faster"""
+
+        instances = list(self.queryset)
+        rows = list(records.review_rows(self.queryset))
+        renderer = JSONRenderer()
+
+        def best(function):
+            """Gets the best wall time of several runs"""
+
+            timings = []
+
+            for _ in range(20):
+                start = time.perf_counter()
+                function()
+                timings.append(time.perf_counter() - start)
+
+            return min(timings)
+
+        serializer_time = best(
+            lambda: renderer.render(
+                serializers.CompanyReviewSerializer(instances, many=True).data
+            )
+        )
+        records_time = best(
+            lambda: renderer.render(list(records.review_records(rows)))
+        )
+
+        self.assertGreaterEqual(serializer_time / records_time, 3)
+
+
+def parse_server_timing(header):
+    """Parses a Server-Timing header into a dict of metric parameters"""
+
+    metrics = {}
+
+    for metric in header.split(","):
+        name, *params = metric.strip().split(";")
+        metrics[name] = dict(param.split("=", 1) for param in params)
+
+    return metrics
+
+
+class TestPerformanceMetrics(ReviewsAPITestCase):
+    """Tests for the request timings and their per-route histograms"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Authenticates as an administrator with fresh metrics"""
+
+        super().setUp()
+        perf.METRICS.clear()
+        self.admin = models.Reviewer.objects.filter(is_staff=True).first()
+        token = RefreshToken.for_user(self.admin).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_responses_carry_server_timing(self):
+        """Tests that the timings and query count are sent in a header"""
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(V1_REVIEW_LIST_URL, format="json")
+
+        metrics = parse_server_timing(response["Server-Timing"])
+
+        self.assertEqual(
+            set(metrics), {"db", "auth", "serialize", "render", "total"}
+        )
+        self.assertEqual(
+            metrics["db"]["desc"], f'"{len(context.captured_queries)} queries"'
+        )
+
+        for name in ("auth", "serialize", "render", "total"):
+            self.assertGreater(float(metrics[name]["dur"]), 0)
+
+    def test_metrics_are_aggregated_per_route(self):
+        """Tests that the metrics endpoint serves histograms per route"""
+
+        for _ in range(3):
+            self.client.get(V1_REVIEW_LIST_URL, format="json")
+
+        self.client.get(
+            reverse(V1_REVIEW_DETAIL, kwargs={"pk": 1}), format="json"
+        )
+
+        response = self.client.get(V1_METRICS_URL, format="json")
+        routes = response.json()["routes"]
+        listing = routes[f"GET {V1_REVIEW_LIST}"]
+
+        self.assertEqual(listing["count"], 3)
+        self.assertEqual(routes[f"GET {V1_REVIEW_DETAIL}"]["count"], 1)
+        self.assertEqual(listing["phases"]["total"]["buckets"]["+Inf"], 3)
+        self.assertGreater(listing["queries"], 0)
+
+    def test_metrics_are_restricted_to_administrators(self):
+        """Tests that regular users cannot read the metrics"""
+
+        reviewer = models.Reviewer.objects.get(username=REGULAR_USER_USERNAME)
+        token = RefreshToken.for_user(reviewer).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        response = self.client.get(V1_METRICS_URL, format="json")
+
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(REVIEWS_PERF_SAMPLE_RATE=0)
+    def test_unsampled_requests_are_not_recorded(self):
+        """Tests that sampling can turn the recording off"""
+
+        response = self.client.get(V1_REVIEW_LIST_URL, format="json")
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(perf.METRICS.snapshot(), {})
+
+    def test_async_views_are_recorded(self):
+        """Tests that async views are timed without leaving the event loop"""
+
+        token = RefreshToken.for_user(self.admin).access_token
+        response = async_to_sync(self.async_client.get)(
+            V1_ASYNC_REVIEW_LIST_URL,
+            headers={"authorization": f"Bearer {token}"},
+        )
+        metrics = parse_server_timing(response["Server-Timing"])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(metrics["db"]["desc"], '"0 queries"')
+        self.assertGreater(float(metrics["render"]["dur"]), 0)
+
+
+class IngestQueueTestMixin:
+    """Writes the ingestion queue to a temporary file"""
+
+    def setUp(self):
+        """Enables the queue without starting its worker thread"""
+
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            REVIEWS_INGEST_QUEUE=True,
+            REVIEWS_INGEST_WORKER=False,
+            REVIEWS_INGEST_PATH=os.path.join(directory.name, "queue.sqlite3"),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.queue = ingest.get_queue()
+        self.addCleanup(self.queue.close)
+
+    def review_data(self, **data):
+        """Gets the data of a valid review"""
+
+        return {
+            "title": "Queued",
+            "summary": "Queued review",
+            "company": models.Company.objects.first().id,
+            "rating": 1,
+            **data,
+        }
+
+
+class TestIngestQueue(IngestQueueTestMixin, ReviewsAPITestCase):
+    """Tests for the write-behind review creation"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Authenticates as a regular user"""
+
+        super().setUp()
+        self.reviewer = models.Reviewer.objects.get(
+            username=REGULAR_USER_USERNAME
+        )
+        self.client.force_authenticate(user=self.reviewer)
+
+    def test_reviews_are_accepted_then_inserted(self):
+        """Tests that a queued review is inserted when the queue drains"""
+
+        count = models.CompanyReview.objects.count()
+        response = self.client.post(
+            V1_REVIEW_LIST_URL, self.review_data(), format="json"
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(models.CompanyReview.objects.count(), count)
+
+        status_url = response["Location"]
+        self.assertEqual(
+            self.client.get(status_url).json()["status"], "pending"
+        )
+
+        self.assertEqual(ingest.drain(self.queue), 1)
+
+        content = self.client.get(status_url).json()
+        review = models.CompanyReview.objects.get(pk=content["review"])
+        self.assertEqual(content["status"], "done")
+        self.assertEqual(review.reviewer, self.reviewer)
+        self.assertEqual(review.title, "Queued")
+        self.assertEqual(str(review.ingest_id), response.json()["tracking_id"])
+        stats = models.CompanyRatingStats.objects.get(company=review.company)
+        self.assertEqual(stats.review_count, 1)
+
+    def test_async_reviews_are_queued(self):
+        """Tests that the async creation queues reviews as the sync one"""
+
+        count = models.CompanyReview.objects.count()
+        token = RefreshToken.for_user(self.reviewer).access_token
+        response = async_to_sync(self.async_client.post)(
+            V1_ASYNC_REVIEW_LIST_URL,
+            self.review_data(),
+            content_type="application/json",
+            headers={"authorization": f"Bearer {token}"},
+        )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["status"], "pending")
+        self.assertEqual(response["Location"], response.json()["url"])
+        self.assertEqual(models.CompanyReview.objects.count(), count)
+        self.assertEqual(ingest.drain(self.queue), 1)
+
+        review = models.CompanyReview.objects.get(
+            ingest_id=response.json()["tracking_id"]
+        )
+        self.assertEqual(review.reviewer, self.reviewer)
+
+    def test_invalid_reviews_are_not_queued(self):
+        """Tests that reviews are validated before they are accepted"""
+
+        response = self.client.post(
+            V1_REVIEW_LIST_URL, self.review_data(rating=9), format="json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.queue.counts()["pending"], 0)
+
+    def test_replayed_entries_are_not_inserted_twice(self):
+        """Tests that a batch inserted before a crash is not duplicated"""
+
+        for _ in range(3):
+            self.client.post(
+                V1_REVIEW_LIST_URL, self.review_data(), format="json"
+            )
+
+        # The worker inserts the batch then dies before marking it as done
+        ingest.store_reviews(self.queue.claim(10))
+        count = models.CompanyReview.objects.count()
+        self.queue.lease = 0
+
+        self.assertEqual(ingest.drain(self.queue), 3)
+        self.assertEqual(models.CompanyReview.objects.count(), count)
+        self.assertEqual(self.queue.counts()["done"], 3)
+
+    def test_reviews_are_dated_when_accepted(self):
+        """Tests that a review inserted late keeps its acceptance time"""
+
+        self.client.post(V1_REVIEW_LIST_URL, self.review_data(), format="json")
+        entries = self.queue.claim(10)
+        accepted_at = time.time() - 3600
+        entries[0][1]["accepted_at"] = accepted_at
+        ingest.store_reviews(entries)
+
+        review = models.CompanyReview.objects.get(ingest_id=entries[0][0])
+        self.assertAlmostEqual(review.date.timestamp(), accepted_at, 3)
+        self.assertTrue(
+            models.DailyRatingChange.objects.filter(
+                company_id=review.company_id,
+                day=timezone.localdate(review.date),
+            ).exists()
+        )
+
+    @override_settings(REVIEWS_INGEST_MAX_PENDING=2)
+    def test_full_queues_refuse_reviews(self):
+        """Tests that the queue pushes back once it is full"""
+
+        statuses = [
+            self.client.post(
+                V1_REVIEW_LIST_URL, self.review_data(), format="json"
+            ).status_code
+            for _ in range(2)
+        ]
+        response = self.client.post(
+            V1_REVIEW_LIST_URL, self.review_data(), format="json"
+        )
+
+        self.assertEqual(statuses, [202, 202])
+        self.assertEqual(response.status_code, 503)
+        self.assertIn("Retry-After", response)
+
+        ingest.drain(self.queue)
+        response = self.client.post(
+            V1_REVIEW_LIST_URL, self.review_data(), format="json"
+        )
+        self.assertEqual(response.status_code, 202)
+
+    def test_status_is_private(self):
+        """Tests that users only follow their own queued reviews"""
+
+        response = self.client.post(
+            V1_REVIEW_LIST_URL, self.review_data(), format="json"
+        )
+        status_url = response["Location"]
+        other = models.Reviewer.objects.exclude(pk=self.reviewer.pk)
+
+        self.client.force_authenticate(user=other.filter(is_staff=False)[0])
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+
+        self.client.force_authenticate(user=other.filter(is_staff=True)[0])
+        self.assertEqual(self.client.get(status_url).status_code, 200)
+        response = self.client.get(reverse("api-v1-review-queue"))
+        self.assertEqual(response.json()["pending"], 1)
+
+
+class TestIngestWorker(IngestQueueTestMixin, TransactionTestCase):
+    """Tests for the thread inserting queued reviews"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def test_stopping_drains_the_queue(self):
+        """Tests that a stopped worker inserts the pending reviews first"""
+
+        reviewer = models.Reviewer.objects.get(username=REGULAR_USER_USERNAME)
+        company = models.Company.objects.first()
+        validated_data = {
+            "company": company,
+            "reviewer": reviewer,
+            "rating": 1,
+            "title": "Queued",
+            "summary": "Queued review",
+            "ip_address": "10.0.0.1",
+        }
+
+        for _ in range(5):
+            self.queue.put(ingest.review_payload(validated_data))
+
+        worker = ingest.IngestWorker(self.queue, batch_size=2)
+        worker.start()
+        worker.stop()
+
+        self.assertEqual(self.queue.counts()["done"], 5)
+        self.assertEqual(
+            models.CompanyReview.objects.filter(title="Queued").count(), 5
+        )
+
+    def test_unexpected_errors_do_not_stop_the_worker(self):
+        """Tests that a failing batch is logged, left pending and retried"""
+
+        self.queue.put(
+            ingest.review_payload(
+                {
+                    "company": models.Company.objects.first(),
+                    "reviewer": models.Reviewer.objects.get(
+                        username=REGULAR_USER_USERNAME
+                    ),
+                    "rating": 1,
+                    "title": "Queued",
+                    "summary": "Queued review",
+                    "ip_address": "10.0.0.1",
+                }
+            )
+        )
+        store_reviews = ingest.store_reviews
+        failed = threading.Event()
+
+        def fail_once(entries):
+            """Fails on the first batch and inserts the next ones"""
+
+            if not failed.is_set():
+                failed.set()
+                raise RuntimeError("Unexpected")
+
+            return store_reviews(entries)
+
+        worker = ingest.IngestWorker(self.queue)
+
+        with patch.object(ingest, "store_reviews", fail_once):
+            with self.assertLogs("reviews.ingest", "ERROR"):
+                worker.start()
+                failed.wait(5)
+                worker.stop()
+
+        self.assertEqual(self.queue.counts()["done"], 1)
+        self.assertTrue(
+            models.CompanyReview.objects.filter(title="Queued").exists()
+        )
+
+    def test_reviews_of_deleted_companies_fail(self):
+        """Tests that a review failing a constraint does not block others"""
+
+        reviewer = models.Reviewer.objects.get(username=REGULAR_USER_USERNAME)
+        companies = [
+            models.Company.objects.create(name="Closed"),
+            models.Company.objects.first(),
+        ]
+
+        for company in companies:
+            self.queue.put(
+                ingest.review_payload(
+                    {
+                        "company": company,
+                        "reviewer": reviewer,
+                        "rating": 1,
+                        "title": "Queued",
+                        "summary": "Queued review",
+                        "ip_address": "10.0.0.1",
+                    }
+                )
+            )
+
+        companies[0].delete()
+        call_command("process_review_queue", "--once", stdout=StringIO())
+
+        counts = self.queue.counts()
+        self.assertEqual((counts["done"], counts["failed"]), (1, 1))
+
+
+class TestCompanyAutocomplete(ReviewsAPITestCase):
+    """Tests for the company name autocomplete endpoint"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates companies and authenticates as a regular user"""
+
+        super().setUp()
+        autocomplete.COMPANY_INDEX.clear()
+        self.addCleanup(autocomplete.COMPANY_INDEX.clear)
+
+        for name in ("Acme Corp", "acme  labs", "Acorn", "Globex", "ACMEX"):
+            models.Company.objects.create(name=name)
+
+        self.client.force_authenticate(
+            user=models.Reviewer.objects.get(username=REGULAR_USER_USERNAME)
+        )
+
+    def names(self, prefix, **params):
+        """Gets the names suggested for a prefix"""
+
+        response = self.client.get(
+            V1_COMPANY_AUTOCOMPLETE_URL, {"q": prefix, **params}
+        )
+        self.assertEqual(response.status_code, 200)
+
+        return [company["name"] for company in response.json()]
+
+    def test_prefixes_match_ignoring_case(self):
+        """Tests that companies are matched by name prefix in name order"""
+
+        self.assertEqual(
+            self.names("ACME"), ["Acme Corp", "acme  labs", "ACMEX"]
+        )
+        self.assertEqual(self.names("acme l"), ["acme  labs"])
+        self.assertEqual(
+            self.names("ac", limit=2), ["Acme Corp", "acme  labs"]
+        )
+        self.assertEqual(self.names("initech"), [])
+
+    def test_changes_are_applied_to_the_index(self):
+        """Tests that created, renamed and deleted companies are seen"""
+
+        self.assertEqual(self.names("glo"), ["Globex"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            company = models.Company.objects.create(name="Globe Inc")
+
+        self.assertEqual(self.names("glo"), ["Globe Inc", "Globex"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            company.name = "Umbrella"
+            company.save()
+
+        self.assertEqual(self.names("glo"), ["Globex"])
+        self.assertEqual(self.names("umb"), ["Umbrella"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            models.Company.objects.filter(name="Globex").delete()
+
+        self.assertEqual(self.names("glo"), [])
+
+    @override_settings(REVIEWS_AUTOCOMPLETE_REFRESH=0)
+    def test_own_changes_do_not_reload_the_index(self):
+        """Tests that only changes made elsewhere trigger a reload"""
+
+        index = autocomplete.COMPANY_INDEX
+        self.assertEqual(self.names("glo"), ["Globex"])
+
+        with patch.object(index, "reload_in_background") as reload:
+            with self.captureOnCommitCallbacks(execute=True):
+                models.Company.objects.create(name="Globe Inc")
+
+            self.assertEqual(self.names("glo"), ["Globe Inc", "Globex"])
+            reload.assert_not_called()
+
+            cache.bump_generation(models.Company._meta.label)
+            self.names("glo")
+            reload.assert_called_once()
+
+    def test_prefix_is_required(self):
+        """Tests that a missing prefix is rejected"""
+
+        response = self.client.get(V1_COMPANY_AUTOCOMPLETE_URL)
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(user=None)
+        response = self.client.get(V1_COMPANY_AUTOCOMPLETE_URL, {"q": "a"})
+        self.assertEqual(response.status_code, 401)
+
+    def test_lookups_are_fast(self):
+        """Tests that a lookup in a million names takes microseconds"""
+
+        index = autocomplete.CompanyIndex()
+        index.keys = [f"company {pk:07d}" for pk in range(1000000)]
+        index.ids = list(range(1000000))
+        index.names = index.keys
+        index.checked_at = time.monotonic()
+
+        start = time.perf_counter()
+
+        for pk in range(0, 1000000, 1000):
+            index.search(f"Company {pk // 10:06d}", 10)
+
+        elapsed = (time.perf_counter() - start) / 1000
+        self.assertLess(elapsed, 0.0005)
+
+
+class TestSparseFieldsets(ReviewsAPITestCase):
+    """Tests for the fields and exclude parameters"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates reviews with long summaries as an administrator"""
+
+        super().setUp()
+        self.admin = models.Reviewer.objects.get(username=ADMIN_USER_USERNAME)
+        self.client.force_authenticate(user=self.admin)
+        company = models.Company.objects.first()
+        models.CompanyReview.objects.bulk_create(
+            models.CompanyReview(
+                title=f"Title {index}",
+                summary="Long summary " * 700,
+                company=company,
+                rating=1,
+                reviewer=self.admin,
+                ip_address="10.0.0.1",
+            )
+            for index in range(20)
+        )
+
+    def get(self, url, **params):
+        """Gets a url and returns the response and the captured queries"""
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params, format="json")
+
+        self.assertEqual(response.status_code, 200)
+
+        return response, [query["sql"] for query in context.captured_queries]
+
+    def test_review_lists_read_the_selected_columns(self):
+        """Tests that left out fields are neither read nor sent"""
+
+        response, queries = self.get(V1_REVIEW_LIST_URL, fields="id,title")
+        results = response.json()["results"]
+
+        self.assertEqual(set(results[0]), {"id", "title"})
+        self.assertFalse([sql for sql in queries if '"summary"' in sql])
+
+        full, _ = self.get(V1_REVIEW_LIST_URL)
+        self.assertGreater(len(full.content), 10 * len(response.content))
+
+    def test_fields_can_be_excluded(self):
+        """Tests that exclude drops fields from lists and details"""
+
+        response, _ = self.get(V1_REVIEW_LIST_URL, exclude="summary")
+        self.assertNotIn("summary", response.json()["results"][0])
+        self.assertIn("title", response.json()["results"][0])
+
+        response, queries = self.get(
+            reverse(V1_REVIEW_DETAIL, kwargs={"pk": 1}),
+            fields="title,summary",
+            exclude="summary",
+        )
+        self.assertEqual(response.json(), {"title": "One sample rating"})
+        self.assertFalse([sql for sql in queries if '"summary"' in sql])
+
+    def test_cursor_pages_without_their_ordering_fields(self):
+        """Tests that cursor links are built when id and date are left out"""
+
+        response, _ = self.get(
+            V1_REVIEW_LIST_URL, cursor="", limit=5, fields="title"
+        )
+        content = response.json()
+
+        self.assertEqual(len(content["results"]), 5)
+        self.assertIsNotNone(content["next"])
+
+    def test_companies_and_reviewers_are_narrowed(self):
+        """Tests that the other endpoints accept fieldsets as well"""
+
+        response, _ = self.get(reverse("api-v1-company-list"), fields="name")
+        self.assertEqual(set(response.json()["results"][0]), {"name"})
+
+        response, queries = self.get(
+            reverse("api-v1-reviewer-list"), exclude="first_name,last_name"
+        )
+        self.assertEqual(set(response.json()["results"][0]), {"id"})
+        self.assertFalse([sql for sql in queries if "last_name" in sql])
+
+    def test_unknown_fields_are_rejected(self):
+        """Tests that misspelled field names are reported"""
+
+        response = self.client.get(
+            V1_REVIEW_LIST_URL, {"fields": "title,summry"}, format="json"
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("summry", response.json()["fields"][0])
+
+
+class TestReviewFilters(ReviewsAPITestCase):
+    """Tests for the filters and ordering of the review list"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates reviews of two companies with various ratings"""
+
+        super().setUp()
+        self.admin = models.Reviewer.objects.get(username=ADMIN_USER_USERNAME)
+        self.reviewer = models.Reviewer.objects.get(
+            username=REGULAR_USER_USERNAME
+        )
+        self.companies = [
+            models.Company.objects.first(),
+            models.Company.objects.create(name="Other"),
+        ]
+        now = timezone.now()
+
+        for index in range(10):
+            models.CompanyReview.objects.create(
+                title=f"Filtered {index}",
+                summary="Summary",
+                company=self.companies[index % 2],
+                rating=index % 5 + 1,
+                reviewer=(self.admin, self.reviewer)[index % 3 == 0],
+                ip_address="10.0.0.1",
+            )
+
+        # Spread the reviews over ten days, newest last
+        for index in range(10):
+            models.CompanyReview.objects.filter(
+                title=f"Filtered {index}"
+            ).update(date=now - timezone.timedelta(days=10 - index))
+
+        self.client.force_authenticate(user=self.admin)
+
+    def titles(self, **params):
+        """Gets the titles of the reviews listed with filters"""
+
+        response = self.client.get(V1_REVIEW_LIST_URL, params, format="json")
+        self.assertEqual(response.status_code, 200)
+
+        return [
+            review["title"]
+            for review in response.json()["results"]
+            if review["title"].startswith("Filtered")
+        ]
+
+    def test_reviews_are_filtered(self):
+        """Tests the company, rating, reviewer and date filters"""
+
+        company = self.companies[1].pk
+        since = timezone.now() - timezone.timedelta(days=5, hours=12)
+
+        self.assertEqual(len(self.titles(company=company)), 5)
+        self.assertEqual(
+            self.titles(company=company, rating_min=2, rating_max=3),
+            ["Filtered 1", "Filtered 7"],
+        )
+        self.assertEqual(
+            self.titles(reviewer=self.reviewer.pk),
+            ["Filtered 0", "Filtered 3", "Filtered 6", "Filtered 9"],
+        )
+        self.assertEqual(
+            self.titles(date_after=since.isoformat(), rating_min=4),
+            ["Filtered 8", "Filtered 9"],
+        )
+
+    def test_reviews_are_ordered(self):
+        """Tests that ordering breaks ties by date then id"""
+
+        self.assertEqual(
+            self.titles(ordering="-rating", rating_min=4),
+            ["Filtered 9", "Filtered 4", "Filtered 8", "Filtered 3"],
+        )
+        self.assertEqual(
+            self.titles(ordering="date", company=self.companies[1].pk),
+            [f"Filtered {index}" for index in (1, 3, 5, 7, 9)],
+        )
+
+    def test_async_list_accepts_the_filters(self):
+        """Tests that the async list filters and orders the same way"""
+
+        params = {"company": self.companies[1].pk, "ordering": "-rating"}
+        token = RefreshToken.for_user(self.admin).access_token
+        response = async_to_sync(self.async_client.get)(
+            V1_ASYNC_REVIEW_LIST_URL,
+            params,
+            headers={"authorization": f"Bearer {token}"},
+        )
+
+        self.assertEqual(
+            [review["title"] for review in response.json()["results"]],
+            self.titles(**params),
+        )
+
+    def test_reviewer_filter_is_for_staff(self):
+        """Tests that regular users cannot filter by reviewer"""
+
+        self.client.force_authenticate(user=self.reviewer)
+
+        self.assertEqual(
+            self.titles(reviewer=self.admin.pk),
+            ["Filtered 0", "Filtered 3", "Filtered 6", "Filtered 9"],
+        )
+
+    def test_invalid_filters_are_rejected(self):
+        """Tests that malformed filter values are reported"""
+
+        for params in ({"rating_min": "high"}, {"date_after": "yesterday"}):
+            response = self.client.get(
+                V1_REVIEW_LIST_URL, params, format="json"
+            )
+            self.assertEqual(response.status_code, 400)
+
+    def test_filters_use_indexes(self):
+        """Tests that every filter combination avoids a full table scan"""
+
+        since = (timezone.now() - timezone.timedelta(days=3)).isoformat()
+        company = self.companies[0].pk
+        combinations = [
+            {"company": company},
+            {"company": company, "rating_min": 2, "rating_max": 4},
+            {"company": company, "date_after": since},
+            {"company": company, "ordering": "-rating"},
+            {"rating_min": 4},
+            {"rating_min": 4, "ordering": "-rating"},
+            {"reviewer": self.reviewer.pk},
+            {"reviewer": self.reviewer.pk, "date_after": since},
+            {"date_after": since, "date_before": timezone.now().isoformat()},
+        ]
+        table = models.CompanyReview._meta.db_table
+
+        for params in combinations:
+            for mode in ({}, {"cursor": ""}):
+                with CaptureQueriesContext(connection) as context:
+                    self.client.get(
+                        V1_REVIEW_LIST_URL, {**params, **mode}, format="json"
+                    )
+
+                for query in context.captured_queries:
+                    if f'FROM "{table}"' not in query["sql"]:
+                        continue
+
+                    plan = self.explain(query["sql"])
+                    self.assertFalse(
+                        self.is_full_scan(plan, table), (params, plan)
+                    )
+
+    def explain(self, sql):
+        """Gets the query plan of a SQL statement"""
+
+        with connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                # Small tables are scanned whatever the indexes
+                cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute(f"EXPLAIN {sql}")
+
+            else:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+
+            return "\n".join(str(row[-1]) for row in cursor.fetchall())
+
+    def is_full_scan(self, plan, table):
+        """Tells whether a plan reads a whole table"""
+
+        if connection.vendor == "postgresql":
+            return f"Seq Scan on {table}" in plan
+
+        return any(
+            line.startswith(f"SCAN {table}") and "USING" not in line
+            for line in plan.splitlines()
+        )
+
+
+class TestReviewNetworkFilter(ReviewsAPITestCase):
+    """Tests for the address range filter of the review list"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates reviews from IPv4 and IPv6 addresses"""
+
+        super().setUp()
+        self.admin = models.Reviewer.objects.get(username=ADMIN_USER_USERNAME)
+        self.addresses = [
+            "203.0.113.7",
+            "203.0.113.250",
+            "203.0.114.1",
+            "2001:db8:1::1",
+            "2001:db8:1:ffff::2",
+            "2001:db8:2::1",
+        ]
+
+        for address in self.addresses:
+            models.CompanyReview.objects.create(
+                title=address,
+                summary="Summary",
+                company=models.Company.objects.first(),
+                rating=1,
+                reviewer=self.admin,
+                ip_address=address,
+            )
+
+        self.client.force_authenticate(user=self.admin)
+
+    def titles(self, network):
+        """Gets the titles of the reviews listed from a network"""
+
+        response = self.client.get(
+            V1_REVIEW_LIST_URL, {"network": network}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        return sorted(review["title"] for review in response.json()["results"])
+
+    def test_addresses_are_packed_in_order(self):
+        """Tests that packed addresses sort like the addresses"""
+
+        packed = [addresses.pack(address) for address in self.addresses]
+
+        self.assertEqual(packed, sorted(packed))
+        self.assertEqual(len(packed[0]), 16)
+        self.assertEqual(packed[0], addresses.pack("::ffff:203.0.113.7"))
+        self.assertIsNone(addresses.pack("12:34:56:78"))
+        self.assertEqual(
+            bytes(
+                models.CompanyReview.objects.get(title="203.0.113.7").ip_packed
+            ),
+            packed[0],
+        )
+
+    def test_reviews_are_filtered_by_network(self):
+        """Tests IPv4 and IPv6 networks and single addresses"""
+
+        self.assertEqual(
+            self.titles("203.0.113.0/24"), ["203.0.113.250", "203.0.113.7"]
+        )
+        self.assertEqual(
+            self.titles("2001:db8:1::/48"),
+            ["2001:db8:1::1", "2001:db8:1:ffff::2"],
+        )
+        self.assertEqual(self.titles("203.0.114.1"), ["203.0.114.1"])
+        self.assertEqual(
+            self.titles("::ffff:203.0.113.0/120"),
+            ["203.0.113.250", "203.0.113.7"],
+        )
+
+    def test_submitted_addresses_are_packed(self):
+        """Tests that created and batched reviews store a packed address"""
+
+        review = {
+            "title": "Packed",
+            "summary": "Summary",
+            "company": models.Company.objects.first().id,
+            "rating": 1,
+        }
+        self.client.post(
+            V1_REVIEW_LIST_URL,
+            review,
+            format="json",
+            REMOTE_ADDR="198.51.100.1",
+        )
+        self.client.post(
+            V1_REVIEW_BATCH_URL,
+            [review],
+            format="json",
+            REMOTE_ADDR="198.51.100.2",
+        )
+
+        self.assertEqual(len(self.titles("198.51.100.0/24")), 2)
+
+    def test_invalid_networks_are_rejected(self):
+        """Tests that malformed networks are reported"""
+
+        for network in ("203.0.113.0/33", "not an address"):
+            response = self.client.get(
+                V1_REVIEW_LIST_URL, {"network": network}, format="json"
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertIn("network", response.json())
+
+    def test_network_filter_is_for_staff(self):
+        """Tests that regular users cannot filter by address"""
+
+        self.client.force_authenticate(
+            user=models.Reviewer.objects.get(username=REGULAR_USER_USERNAME)
+        )
+        response = self.client.get(
+            V1_REVIEW_LIST_URL, {"network": "not an address"}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_network_filter_uses_the_index(self):
+        """Tests that a network is read with an index range scan"""
+
+        queryset = models.CompanyReview.objects.filter(
+            ip_packed__range=addresses.network_range("2001:db8:1::/48")
+        )
+
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+        self.assertIn("review_ip_packed_idx", queryset.explain())
+
+
+@override_settings(REVIEWS_ROLLUP_SETTLE=0)
+class TestCompanyDailyRatings(ReviewsAPITestCase):
+    """Tests for the daily rating rollup and its time series endpoint"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates reviews over a few days"""
+
+        super().setUp()
+        models.CompanyReview.objects.all().delete()
+        self.admin = models.Reviewer.objects.get(username=ADMIN_USER_USERNAME)
+        self.company = models.Company.objects.first()
+        self.other = models.Company.objects.create(name="Other")
+        self.now = timezone.now()
+        self.reviews = [
+            self.create_review(self.company, rating, days)
+            for rating, days in ((5, 3), (3, 3), (4, 1), (2, 40))
+        ]
+        self.create_review(self.other, 1, 3)
+        self.client.force_authenticate(user=self.admin)
+
+    def create_review(self, company, rating, days):
+        """Creates a review dated some days ago, or now"""
+
+        review = models.CompanyReview.objects.create(
+            title="Dated",
+            summary="Dated review",
+            company=company,
+            rating=rating,
+            reviewer=self.admin,
+            ip_address="10.0.0.1",
+        )
+
+        if days:
+            review.date = self.now - timedelta(days=days)
+            review.save(update_fields=["date"])
+
+        return review
+
+    def refresh(self, *args):
+        """Refreshes the rollup and gets the command output"""
+
+        output = StringIO()
+        call_command("refresh_daily_ratings", *args, stdout=output)
+
+        return output.getvalue()
+
+    def rollup(self):
+        """Gets the stored rollup rows"""
+
+        return {
+            (row.company_id, row.day): tuple(
+                getattr(row, field)
+                for field in models.CompanyDailyRating.FIELDS
+            )
+            for row in models.CompanyDailyRating.objects.all()
+        }
+
+    def expected_rollup(self):
+        """Gets the rollup rows computed from every review"""
+
+        rows = models.CompanyDailyRating.objects.aggregate(
+            models.CompanyReview.objects.all()
+        )
+
+        return {
+            (row["company_id"], row["day"]): tuple(
+                row[field] for field in models.CompanyDailyRating.FIELDS
+            )
+            for row in rows
+        }
+
+    def get_ratings(self, **params):
+        """Requests the daily ratings of the company"""
+
+        return self.client.get(
+            reverse(V1_COMPANY_RATINGS, kwargs={"pk": self.company.pk}),
+            params,
+        )
+
+    def test_series_is_read_from_the_rollup(self):
+        """Tests that the series holds one entry per day with reviews"""
+
+        self.refresh()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.get_ratings()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["end"], timezone.localdate())
+        self.assertIsNotNone(response.data["refreshed_until"])
+
+        days = response.data["days"]
+        self.assertEqual([day["review_count"] for day in days], [1, 2, 1])
+        self.assertEqual(days[1]["average_rating"], 4)
+        self.assertEqual(
+            days[1]["histogram"], {"1": 0, "2": 0, "3": 1, "4": 0, "5": 1}
+        )
+        self.assertFalse(
+            any("reviews_companyreview" in query["sql"] for query in queries)
+        )
+
+        start = timezone.localdate(self.now - timedelta(days=3))
+        response = self.get_ratings(start=start.isoformat())
+        self.assertEqual(
+            [day["day"] for day in response.data["days"]],
+            [start.isoformat(), (start + timedelta(days=2)).isoformat()],
+        )
+
+    def test_refresh_recomputes_changed_days(self):
+        """Tests that updates, deletions and new reviews are rolled up"""
+
+        self.assertIn("Refreshed 4 company days", self.refresh())
+        self.assertEqual(self.rollup(), self.expected_rollup())
+
+        self.reviews[0].rating = 1
+        self.reviews[0].save()
+        self.reviews[3].delete()
+        self.create_review(self.other, 4, 0)
+
+        self.assertIn("Refreshed 3 company days", self.refresh())
+        self.assertEqual(self.rollup(), self.expected_rollup())
+        self.assertFalse(models.DailyRatingChange.objects.exists())
+        self.assertIn("Refreshed 0 company days", self.refresh())
+
+    def test_changes_are_found_without_reading_the_review(self):
+        """Tests that saving a loaded review compares its tracked fields"""
+
+        self.refresh()
+        review = models.CompanyReview.objects.get(pk=self.reviews[0].pk)
+
+        with CaptureQueriesContext(connection) as queries:
+            review.title = "Renamed"
+            review.save()
+
+        self.assertFalse(
+            any(query["sql"].startswith("SELECT") for query in queries)
+        )
+        self.assertFalse(models.DailyRatingChange.objects.exists())
+
+        review.rating = 1
+        review.save()
+        self.assertEqual(
+            list(
+                models.DailyRatingChange.objects.values_list(
+                    "company_id", "day"
+                )
+            ),
+            [(self.company.pk, timezone.localdate(review.date))],
+        )
+
+    def test_reviews_moved_to_another_company_are_rolled_up(self):
+        """Tests that both companies of a moved review are recomputed"""
+
+        self.refresh()
+        self.reviews[2].company = self.other
+        self.reviews[2].save()
+        self.refresh()
+
+        self.assertEqual(self.rollup(), self.expected_rollup())
+
+    def test_invalid_ranges_are_rejected(self):
+        """Tests the validation of the requested days"""
+
+        today = timezone.localdate()
+
+        for params in (
+            {"start": "yesterday"},
+            {"end": "2020-02-30"},
+            {"start": today.isoformat(), "end": "2000-01-01"},
+            {"start": (today - timedelta(days=366)).isoformat()},
+        ):
+            with self.subTest(params=params):
+                response = self.get_ratings(**params)
+                self.assertEqual(response.status_code, 400)
+
+        response = self.get_ratings(
+            start=(today - timedelta(days=365)).isoformat()
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class TestListCounts(ReviewsAPITestCase):
+    """Tests for the cached, estimated and omitted counts of the lists"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates reviews of a regular user and of an administrator"""
+
+        super().setUp()
+        self.admin = models.Reviewer.objects.get(username=ADMIN_USER_USERNAME)
+        self.reviewer = models.Reviewer.objects.get(
+            username=REGULAR_USER_USERNAME
+        )
+        create_random_reviews(4, [self.reviewer])
+        create_random_reviews(3, [self.admin])
+
+    def list(self, user, url=V1_REVIEW_LIST_URL, **params):
+        """Lists a page and tells whether the rows were counted"""
+
+        self.client.force_authenticate(user=user)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+
+        self.assertEqual(response.status_code, 200)
+        counted = any("COUNT(" in query["sql"] for query in queries)
+
+        return response.json(), counted
+
+    def test_unfiltered_lists_are_counted_once_per_scope(self):
+        """Tests that the counters of each scope are cached"""
+
+        total = models.CompanyReview.objects.count()
+        own = models.CompanyReview.objects.filter(
+            reviewer=self.reviewer
+        ).count()
+
+        for user, expected in ((self.reviewer, own), (self.admin, total)):
+            data, counted = self.list(user, limit=2)
+            self.assertEqual(data["count"], expected)
+            self.assertTrue(counted)
+
+            data, counted = self.list(user, limit=3, offset=2)
+            self.assertEqual(data["count"], expected)
+            self.assertFalse(counted)
+
+        data, counted = self.list(self.admin, V1_COMPANY_LIST_URL)
+        self.assertEqual(data["count"], models.Company.objects.count())
+        data, counted = self.list(self.admin, V1_COMPANY_LIST_URL, limit=1)
+        self.assertFalse(counted)
+
+    def test_counters_follow_writes(self):
+        """Tests that created, batched and deleted reviews are counted"""
+
+        self.list(self.reviewer)
+        self.list(self.admin, limit=1)
+        review = {
+            "title": "Counted",
+            "summary": "Counted review",
+            "company": models.Company.objects.first().id,
+            "rating": 1,
+        }
+        self.client.force_authenticate(user=self.reviewer)
+        self.client.post(V1_REVIEW_LIST_URL, review, format="json")
+        self.client.post(V1_REVIEW_BATCH_URL, [review] * 2, format="json")
+        models.CompanyReview.objects.filter(
+            reviewer=self.reviewer
+        ).first().delete()
+
+        own = models.CompanyReview.objects.filter(reviewer=self.reviewer)
+        data, counted = self.list(self.reviewer)
+        self.assertEqual(data["count"], own.count())
+        self.assertFalse(counted)
+
+        data, counted = self.list(self.admin, limit=1)
+        self.assertEqual(data["count"], models.CompanyReview.objects.count())
+        self.assertFalse(counted)
+
+        # Writes sending no signal discard the counters
+        cache.drop_counts(models.CompanyReview._meta.label)
+        data, counted = self.list(self.admin, limit=2)
+        self.assertTrue(counted)
+
+    def test_filtered_lists_are_counted(self):
+        """Tests that filtered lists do not use the counters"""
+
+        self.list(self.admin)
+        models.CompanyReview.objects.filter(reviewer=self.admin).update(
+            rating=5
+        )
+
+        for params in ({"rating_min": 5}, {"search": "Title"}):
+            data, counted = self.list(self.admin, **params)
+            self.assertTrue(counted)
+            self.assertEqual(data["count"], len(data["results"]))
+
+        self.assertEqual(
+            self.list(self.admin, rating_min=5)[0]["count"],
+            models.CompanyReview.objects.filter(rating=5).count(),
+        )
+
+    def test_count_can_be_left_out(self):
+        """Tests that count=false skips the count and keeps the links"""
+
+        own = models.CompanyReview.objects.filter(reviewer=self.reviewer)
+        data, counted = self.list(self.reviewer, count="false", limit=2)
+
+        self.assertFalse(counted)
+        self.assertIsNone(data["count"])
+        self.assertEqual(len(data["results"]), 2)
+        self.assertIn("offset=2", data["next"])
+
+        data, counted = self.list(
+            self.reviewer, count="false", limit=2, offset=own.count() - 2
+        )
+        self.assertEqual(len(data["results"]), 2)
+        self.assertIsNone(data["next"])
+        self.assertIsNotNone(data["previous"])
+
+        token = RefreshToken.for_user(self.reviewer).access_token
+        response = async_to_sync(self.async_client.get)(
+            V1_ASYNC_REVIEW_LIST_URL,
+            {"count": "false", "limit": 2},
+            headers={"authorization": f"Bearer {token}"},
+        )
+        self.assertIsNone(response.json()["count"])
+        self.assertIn("offset=2", response.json()["next"])
+
+    @skipUnless(connection.vendor == "postgresql", "Uses planner estimates")
+    @override_settings(REVIEWS_COUNT_ESTIMATE_THRESHOLD=1)
+    def test_large_filtered_lists_are_estimated(self):
+        """Tests that filtered lists report the planner estimate"""
+
+        data, counted = self.list(self.admin, rating_min=1)
+
+        self.assertFalse(counted)
+        self.assertTrue(data["count_estimated"])
+        self.assertGreater(data["count"], 0)
+
+
+class TestResponseEncoding(ReviewsAPITestCase):
+    """Tests for the JSON renderer and the compression of responses"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates reviews with long summaries"""
+
+        super().setUp()
+        self.admin = models.Reviewer.objects.get(username=ADMIN_USER_USERNAME)
+        create_random_reviews(20, [self.admin])
+        models.CompanyReview.objects.update(
+            summary=CAMPAIGN_SUMMARY * 20 + " \u2028 caf\xe9"
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def test_fast_renderer_matches_the_json_renderer(self):
+        """Tests that orjson and the json module write the same bytes"""
+
+        response = self.client.get(V1_REVIEW_LIST_URL)
+        data = dict(
+            response.data,
+            extra=[timezone.now(), 2**70, {1: "key"}, None, 1.5],
+        )
+
+        for value in (data, response.data["results"][0], []):
+            self.assertEqual(
+                renderers.FastJSONRenderer().render(value),
+                JSONRenderer().render(value),
+            )
+
+        self.assertIn(b"\\u2028", response.content)
+
+    def test_responses_are_compressed_as_accepted(self):
+        """Tests the negotiation of gzip and brotli"""
+
+        plain = self.client.get(V1_REVIEW_LIST_URL)
+        self.assertNotIn("Content-Encoding", plain)
+        self.assertEqual(plain["Vary"].split(", ")[-1], "Accept-Encoding")
+
+        response = self.client.get(
+            V1_REVIEW_LIST_URL, HTTP_ACCEPT_ENCODING="gzip, deflate, br;q=0"
+        )
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            int(response["Content-Length"]), len(response.content)
+        )
+        self.assertLess(len(response.content), len(plain.content) / 4)
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        response = self.client.get(
+            reverse(
+                V1_REVIEW_DETAIL, kwargs={"pk": plain.data["results"][0]["id"]}
+            ),
+            {"fields": "id"},
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertNotIn("Content-Encoding", response)
+
+    @skipUnless(compression.brotli, "Needs the brotli package")
+    def test_brotli_is_preferred(self):
+        """Tests that brotli is chosen when both encodings are accepted"""
+
+        plain = self.client.get(V1_REVIEW_LIST_URL)
+        response = self.client.get(
+            V1_REVIEW_LIST_URL, HTTP_ACCEPT_ENCODING="gzip, br"
+        )
+
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(
+            compression.brotli.decompress(response.content), plain.content
+        )
+
+    def test_streamed_responses_are_compressed(self):
+        """Tests that the export is compressed chunk by chunk"""
+
+        url = V1_REVIEW_EXPORT_URL
+        plain = b"".join(self.client.get(url).streaming_content)
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)), plain
+        )
+
+    @override_settings(REVIEWS_COMPRESSION_MIN_SIZE=0)
+    def test_html_pages_are_not_compressed(self):
+        """Tests that pages carrying a CSRF token are sent uncompressed"""
+
+        response = self.client.get(
+            reverse("login"), HTTP_ACCEPT_ENCODING="gzip, br"
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "csrfmiddlewaretoken")
+        self.assertNotIn("Content-Encoding", response)
+
+    def test_encodings_are_negotiated(self):
+        """Tests the parsing of Accept-Encoding headers"""
+
+        preferred = compression.get_encodings()[0]
+
+        for header, expected in (
+            ("", None),
+            ("identity", None),
+            ("gzip;q=0.5, br;q=0", "gzip"),
+            ("GZIP", "gzip"),
+            ("*", preferred),
+            ("*, gzip;q=0", "br" if compression.brotli else None),
+            ("gzip;q=invalid", None),
+            ("gzip;q=0.4, br;q=0.8", preferred),
+        ):
+            with self.subTest(header=header):
+                self.assertEqual(compression.choose_encoding(header), expected)
+
+    @override_settings(REVIEWS_COMPRESSION=False)
+    def test_compression_can_be_disabled(self):
+        """Tests that responses are sent as rendered when disabled"""
+
+        response = self.client.get(
+            V1_REVIEW_LIST_URL, HTTP_ACCEPT_ENCODING="gzip"
+        )
+
+        self.assertNotIn("Content-Encoding", response)
+
+
+@override_settings(REVIEWS_ROLLUP_SETTLE=0)
+class TestReviewArchive(ReviewsAPITestCase):
+    """Tests for the reads and aggregates of archived reviews"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Creates reviews of a year ago and archives them"""
+
+        super().setUp()
+        models.CompanyReview.objects.all().delete()
+        self.admin = models.Reviewer.objects.get(username=ADMIN_USER_USERNAME)
+        self.reviewer = models.Reviewer.objects.get(
+            username=REGULAR_USER_USERNAME
+        )
+        self.company = models.Company.objects.first()
+        create_random_reviews(3, [self.reviewer], [self.company])
+        create_random_reviews(2, [self.admin], [self.company])
+        self.old = list(
+            models.CompanyReview.objects.filter(reviewer=self.reviewer)
+            .order_by("id")
+            .values_list("id", flat=True)[:2]
+        )
+        models.CompanyReview.objects.filter(id__in=self.old).update(
+            date=timezone.now() - timedelta(days=365), rating=5
+        )
+        call_command(
+            "rebuild_company_stats", stdout=StringIO(), stderr=StringIO()
+        )
+        duplicates.index_reviews(
+            models.CompanyReview.objects.filter(id__in=self.old)
+        )
+        call_command("archive_reviews", older_than=30, stdout=StringIO())
+
+    def get_review(self, user, review_id, url_name=V1_REVIEW_DETAIL):
+        """Requests a review by id"""
+
+        self.client.force_authenticate(user=user)
+
+        return self.client.get(reverse(url_name, kwargs={"pk": review_id}))
+
+    def test_archived_reviews_leave_the_review_table(self):
+        """Tests that old reviews are moved with their ids"""
+
+        self.assertEqual(
+            sorted(models.ArchivedReview.objects.values_list("id", flat=True)),
+            self.old,
+        )
+        self.assertFalse(
+            models.CompanyReview.objects.filter(id__in=self.old).exists()
+        )
+        self.assertFalse(
+            models.ReviewSignature.objects.filter(
+                review_id__in=self.old
+            ).exists()
+        )
+        self.assertFalse(
+            models.ReviewBucket.objects.filter(review_id__in=self.old).exists()
+        )
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(V1_REVIEW_LIST_URL)
+        self.assertEqual(response.json()["count"], 3)
+
+    def test_archived_reviews_are_retrieved_by_id(self):
+        """Tests that archived reviews stay readable by their reviewer"""
+
+        for user in (self.admin, self.reviewer):
+            response = self.get_review(user, self.old[0])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["id"], self.old[0])
+            self.assertEqual(response.json()["rating"], 5)
+
+        other = models.Reviewer.objects.create_user(username="other")
+        self.assertEqual(self.get_review(other, self.old[0]).status_code, 404)
+
+        token = RefreshToken.for_user(self.reviewer).access_token
+        url = reverse("api-v1-async-review-detail", kwargs={"pk": self.old[1]})
+        response = async_to_sync(self.async_client.get)(
+            url, headers={"authorization": f"Bearer {token}"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["id"], self.old[1])
+
+    def test_archived_reviews_are_aggregated(self):
+        """Tests that the stats and the rollup count archived reviews"""
+
+        output = {"stdout": StringIO(), "stderr": StringIO()}
+        call_command("rebuild_company_stats", verify=True, **output)
+
+        stats = models.CompanyRatingStats.objects.get(company=self.company)
+        self.assertEqual(stats.review_count, 5)
+        self.assertEqual(stats.rating_sum, 13)
+
+        call_command("refresh_daily_ratings", "--full", stdout=StringIO())
+        days = models.CompanyDailyRating.objects.filter(company=self.company)
+        self.assertEqual(sum(day.review_count for day in days), 5)
+        self.assertEqual(sum(day.rating_sum for day in days), 13)
+
+
+@override_settings(
+    REVIEWS_THROTTLE_RATES={"reviewer": "3/min", "address": "5/min"}
+)
+class TestReviewThrottling(ReviewsAPITestCase):
+    """Tests for the sliding window limits on review submissions"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Freezes the clock of the throttles at the start of a window"""
+
+        super().setUp()
+        self.clock = 600.0
+        timer = patch.object(
+            throttling.SlidingWindowThrottle,
+            "timer",
+            staticmethod(lambda: self.clock),
+        )
+        timer.start()
+        self.addCleanup(timer.stop)
+        self.reviewers = list(models.Reviewer.objects.order_by("id"))
+
+    def submit(self, reviewer, address="10.0.0.1"):
+        """Submits a review from a client address"""
+
+        self.client.force_authenticate(user=reviewer)
+
+        return self.client.post(
+            V1_REVIEW_LIST_URL,
+            {
+                "title": "Throttled",
+                "summary": "Throttled review",
+                "company": models.Company.objects.first().id,
+                "rating": 1,
+            },
+            format="json",
+            REMOTE_ADDR=address,
+        )
+
+    def test_reviewers_are_limited(self):
+        """Tests that a reviewer over the limit gets a Retry-After"""
+
+        for _ in range(3):
+            self.assertEqual(self.submit(self.reviewers[1]).status_code, 201)
+
+        response = self.submit(self.reviewers[1])
+        self.assertEqual(response.status_code, 429)
+        # The window must fade until it holds fewer than 3 submissions
+        self.assertEqual(response["Retry-After"], "80")
+
+        self.assertEqual(self.submit(self.reviewers[2]).status_code, 201)
+
+        self.clock += 30
+        self.assertEqual(self.submit(self.reviewers[1]).status_code, 429)
+        self.clock += 50
+        self.assertEqual(self.submit(self.reviewers[1]).status_code, 201)
+
+    def test_addresses_are_limited(self):
+        """Tests that reviewers sharing an address share its limit"""
+
+        for index in range(5):
+            reviewer = self.reviewers[index % 3]
+            self.assertEqual(self.submit(reviewer).status_code, 201)
+
+        self.assertEqual(self.submit(self.reviewers[2]).status_code, 429)
+        self.assertEqual(
+            self.submit(self.reviewers[2], "10.0.0.2").status_code, 201
+        )
+
+    def test_forged_addresses_share_the_peer_limit(self):
+        """Tests that forwarded addresses are ignored without proxies"""
+
+        for index in range(5):
+            self.client.force_authenticate(user=self.reviewers[index % 3])
+            response = self.client.post(
+                V1_REVIEW_LIST_URL,
+                {
+                    "title": "Throttled",
+                    "summary": "Throttled review",
+                    "company": models.Company.objects.first().id,
+                    "rating": 1,
+                },
+                format="json",
+                REMOTE_ADDR="10.0.0.1",
+                HTTP_X_FORWARDED_FOR=f"203.0.113.{index}",
+            )
+            self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.submit(self.reviewers[2]).status_code, 429)
+        self.assertEqual(
+            self.submit(self.reviewers[1], "10.0.0.2").status_code, 201
+        )
+
+    @override_settings(
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 1}
+    )
+    def test_trusted_proxies_forward_the_address(self):
+        """Tests that the address added by a trusted proxy is limited"""
+
+        for index in range(5):
+            self.client.force_authenticate(user=self.reviewers[index % 3])
+            response = self.client.post(
+                V1_REVIEW_LIST_URL,
+                {
+                    "title": "Throttled",
+                    "summary": "Throttled review",
+                    "company": models.Company.objects.first().id,
+                    "rating": 1,
+                },
+                format="json",
+                REMOTE_ADDR="10.0.0.1",
+                HTTP_X_FORWARDED_FOR=f"203.0.113.{index}, 198.51.100.1",
+            )
+            self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.submit(self.reviewers[2]).status_code, 201)
+
+    def test_batches_count_each_review(self):
+        """Tests that a batch is charged once per review it holds"""
+
+        self.client.force_authenticate(user=self.reviewers[1])
+        items = [
+            {
+                "title": "Throttled",
+                "summary": "Throttled review",
+                "company": models.Company.objects.first().id,
+                "rating": 1,
+            }
+        ] * 3
+
+        response = self.client.post(V1_REVIEW_BATCH_URL, items, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.submit(self.reviewers[1]).status_code, 429)
+
+    def test_batches_are_limited(self):
+        """Tests that batches count as submissions and reads do not"""
+
+        self.client.force_authenticate(user=self.reviewers[1])
+
+        for _ in range(3):
+            response = self.client.post(V1_REVIEW_BATCH_URL, [], format="json")
+            self.assertNotEqual(response.status_code, 429)
+
+        response = self.client.post(V1_REVIEW_BATCH_URL, [], format="json")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(self.client.get(V1_REVIEW_LIST_URL).status_code, 200)
+
+    def test_async_submissions_are_limited(self):
+        """Tests that the async creation shares the limits of the sync one"""
+
+        token = RefreshToken.for_user(self.reviewers[1]).access_token
+        review = {
+            "title": "Throttled",
+            "summary": "Throttled review",
+            "company": models.Company.objects.first().id,
+            "rating": 1,
+        }
+
+        def submit():
+            return async_to_sync(self.async_client.post)(
+                V1_ASYNC_REVIEW_LIST_URL,
+                review,
+                content_type="application/json",
+                headers={"authorization": f"Bearer {token}"},
+            )
+
+        self.assertEqual(self.submit(self.reviewers[1]).status_code, 201)
+
+        for _ in range(2):
+            self.assertEqual(submit().status_code, 201)
+
+        response = submit()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "80")
+        self.assertIn("detail", response.json())
+
+        response = async_to_sync(self.async_client.get)(
+            V1_ASYNC_REVIEW_LIST_URL,
+            headers={"authorization": f"Bearer {token}"},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(REVIEWS_THROTTLE_RATES={})
+    def test_limits_can_be_lifted(self):
+        """Tests that scopes without a rate are not limited"""
+
+        for _ in range(10):
+            self.assertEqual(self.submit(self.reviewers[1]).status_code, 201)
+
+
+CAMPAIGN_SUMMARY = (
+    "The management team is supportive and the salary is above average, "
+    "the office is bright and the projects are interesting, I would "
+    "recommend this company to anyone looking for a friendly place to work"
+)
+
+
+class TestReviewDuplicates(ReviewsAPITestCase):
+    """Tests for the near-duplicate detection of review summaries"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Authenticates a regular user"""
+
+        super().setUp()
+        self.company = models.Company.objects.first()
+        self.reviewer = models.Reviewer.objects.filter(is_staff=False).first()
+        self.client.force_authenticate(user=self.reviewer)
+
+    def submit(self, summary):
+        """Submits a review with a summary"""
+
+        return self.client.post(
+            V1_REVIEW_LIST_URL,
+            {
+                "title": "Campaign",
+                "summary": summary,
+                "company": self.company.id,
+                "rating": 1,
+            },
+            format="json",
+        )
+
+    def test_similarity_estimates_shared_shingles(self):
+        """Tests that signatures estimate the similarity of summaries"""
+
+        reworded = CAMPAIGN_SUMMARY.replace("bright", "sunny")
+        first, second, other = duplicates.signatures(
+            [
+                CAMPAIGN_SUMMARY,
+                reworded,
+                "A completely different review of "
+                "another company with nothing in common at all",
+            ]
+        )
+
+        self.assertEqual(duplicates.similarity(first, first), 1)
+        self.assertGreater(duplicates.similarity(first, second), 0.7)
+        self.assertLess(duplicates.similarity(first, other), 0.2)
+        self.assertEqual(duplicates.unpack(duplicates.pack(first)), first)
+        self.assertEqual(duplicates.signatures(["Too short"]), [None])
+
+    def test_near_duplicates_are_flagged(self):
+        """Tests that a reworded summary is flagged on creation"""
+
+        original = self.submit(CAMPAIGN_SUMMARY).data["id"]
+        response = self.submit(CAMPAIGN_SUMMARY.replace("bright", "sunny"))
+        self.assertEqual(response.status_code, 201)
+
+        signature = models.ReviewSignature.objects.get(
+            review_id=response.data["id"]
+        )
+        self.assertEqual(signature.duplicate_of_id, original)
+        self.assertGreaterEqual(signature.similarity, 0.8)
+        self.assertEqual(
+            models.ReviewBucket.objects.filter(review_id=original).count(),
+            duplicates.BANDS,
+        )
+
+        response = self.submit(
+            "An honest review about long hours, poor pay and a manager who "
+            "never listens to anyone"
+        )
+        signature = models.ReviewSignature.objects.get(
+            review_id=response.data["id"]
+        )
+        self.assertIsNone(signature.duplicate_of_id)
+
+    def test_near_duplicates_in_a_batch_are_flagged(self):
+        """Tests that copies posted in one batch are flagged"""
+
+        items = [
+            {
+                "title": f"Campaign {index}",
+                "summary": CAMPAIGN_SUMMARY + f" {index}",
+                "company": self.company.id,
+                "rating": 1,
+            }
+            for index in range(3)
+        ]
+        response = self.client.post(V1_REVIEW_BATCH_URL, items, format="json")
+        ids = [result["data"]["id"] for result in response.data]
+
+        flagged = dict(
+            models.ReviewSignature.objects.filter(
+                review_id__in=ids
+            ).values_list("review_id", "duplicate_of_id")
+        )
+        self.assertIsNone(flagged[ids[0]])
+        self.assertEqual(flagged[ids[1]], ids[0])
+        self.assertIn(flagged[ids[2]], ids[:2])
+        self.assertEqual(duplicates.find_clusters(), [ids])
+
+    @override_settings(REVIEWS_DUPLICATE_ACTION="reject")
+    def test_near_duplicates_can_be_rejected(self):
+        """Tests that reworded summaries are rejected if configured"""
+
+        review_id = self.submit(CAMPAIGN_SUMMARY).data["id"]
+        response = self.submit(CAMPAIGN_SUMMARY.replace("bright", "sunny"))
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("summary", response.data)
+
+        # A review does not duplicate itself when updated
+        self.client.force_authenticate(
+            user=models.Reviewer.objects.get(username=ADMIN_USER_USERNAME)
+        )
+        response = self.client.patch(
+            reverse(V1_REVIEW_DETAIL, kwargs={"pk": review_id}),
+            {"summary": CAMPAIGN_SUMMARY + " indeed"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(REVIEWS_DUPLICATE_MAX_CANDIDATES=2)
+    def test_crowded_buckets_are_read_partially(self):
+        """Tests that only the oldest members of a bucket are loaded"""
+
+        ids = [self.submit(CAMPAIGN_SUMMARY).data["id"] for _ in range(5)]
+
+        with CaptureQueriesContext(connection) as context:
+            match = duplicates.find_duplicate(CAMPAIGN_SUMMARY)
+
+        self.assertEqual(match, (ids[0], 1))
+        self.assertIn("ROW_NUMBER", context.captured_queries[0]["sql"])
+        self.assertEqual(
+            duplicates.find_duplicate(CAMPAIGN_SUMMARY, exclude=ids[:3]),
+            (ids[3], 1),
+        )
+
+    @override_settings(REVIEWS_DUPLICATE_ACTION="")
+    def test_detection_can_be_disabled(self):
+        """Tests that no signature is stored when detection is off"""
+
+        self.submit(CAMPAIGN_SUMMARY)
+        self.assertFalse(models.ReviewSignature.objects.exists())
+
+
+REPLICA = "replica"
+
+
+class ReplicaTestMixin:
+    """Reads from a replica database which is not replicated
+
+    Rows written to one database only show which of them served a read. The
+    replica is declared and created for the test class, then dropped, so
+    that the test runner and the other tests never see it.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        """Declares and creates the replica database"""
+
+        default = connections.databases["default"]
+        connections.databases[REPLICA] = {
+            **default,
+            "NAME": f"{default['NAME']}_replica",
+            "TEST": {**default["TEST"], "NAME": None, "MIRROR": None},
+        }
+        cls.addClassCleanup(connections.databases.pop, REPLICA)
+        name = connections[REPLICA].creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        cls.addClassCleanup(cls.drop_replica, name)
+        cls.databases = {"default", REPLICA}
+        super().setUpClass()
+
+    @classmethod
+    def drop_replica(cls, name):
+        """Destroys the replica database and forgets its connection"""
+
+        connections[REPLICA].creation.destroy_test_db(name, verbosity=0)
+        del connections[REPLICA]
+
+    def setUp(self):
+        """Reads from the replica, forgetting previous pins and checks"""
+
+        super().setUp()
+        cache.get_cache().clear()
+        authentication.USER_RECORDS.clear()
+        routers.REPLICAS.clear()
+        settings = override_settings(REVIEWS_READ_REPLICAS=[REPLICA])
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.admin = models.Reviewer.objects.get(username=ADMIN_USER_USERNAME)
+
+    def create_replica_review(self, title):
+        """Creates a review on the replica only"""
+
+        return models.CompanyReview.objects.using(REPLICA).create(
+            title=title,
+            summary="Replicated review",
+            company=models.Company.objects.using(REPLICA).first(),
+            rating=5,
+            reviewer=models.Reviewer.objects.using(REPLICA).get(
+                pk=self.admin.pk
+            ),
+            ip_address="10.0.0.1",
+        )
+
+
+class TestReadReplicaRouting(ReplicaTestMixin, TransactionTestCase):
+    """Tests for the routing of safe API reads to a read replica"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+    client_class = APIClient
+
+    def setUp(self):
+        """Authenticates as an administrator"""
+
+        super().setUp()
+        self.client.force_authenticate(user=self.admin)
+
+    def company_names(self):
+        """Gets the names of the listed companies"""
+
+        response = self.client.get(V1_COMPANY_LIST_URL)
+        self.assertEqual(response.status_code, 200)
+
+        return {company["name"] for company in response.data["results"]}
+
+    def test_safe_reads_use_the_replica(self):
+        """Tests that listing and retrieving read from the replica"""
+
+        models.Company.objects.using(REPLICA).create(name="Replicated")
+        review = self.create_replica_review("Replicated")
+
+        self.assertIn("Replicated", self.company_names())
+
+        response = self.client.get(
+            reverse(V1_REVIEW_DETAIL, kwargs={"pk": review.pk})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["title"], "Replicated")
+        self.assertFalse(
+            models.CompanyReview.objects.filter(title="Replicated").exists()
+        )
+
+    def test_writes_pin_reads_to_the_primary(self):
+        """Tests that the writer reads its writes until the pin expires"""
+
+        response = self.client.post(
+            V1_REVIEW_LIST_URL,
+            {
+                "title": "Written",
+                "summary": "Written review",
+                "company": models.Company.objects.first().id,
+                "rating": 1,
+            },
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(
+            models.CompanyReview.objects.using(REPLICA)
+            .filter(title="Written")
+            .exists()
+        )
+
+        response = self.client.get(V1_REVIEW_LIST_URL)
+        titles = [review["title"] for review in response.data["results"]]
+        self.assertIn("Written", titles)
+
+        # Expires the pin along with the page cached from the primary
+        cache.get_cache().clear()
+        response = self.client.get(V1_REVIEW_LIST_URL)
+        titles = [review["title"] for review in response.data["results"]]
+        self.assertNotIn("Written", titles)
+
+    def test_exports_stream_from_the_replica(self):
+        """Tests that the export is read from the replica of the request"""
+
+        self.create_replica_review("Replicated")
+
+        response = self.client.get(V1_REVIEW_EXPORT_URL)
+        self.assertEqual(response.status_code, 200)
+
+        content = b"".join(response.streaming_content).decode()
+        titles = [json.loads(line)["title"] for line in content.splitlines()]
+        self.assertIn("Replicated", titles)
+
+    def test_failed_writes_do_not_pin(self):
+        """Tests that a refused write keeps reading from the replica"""
+
+        response = self.client.post(V1_REVIEW_LIST_URL, {"rating": 9})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(routers.is_pinned(self.admin))
+
+    @override_settings(REVIEWS_REPLICA_CHECK_INTERVAL=0)
+    def test_unhealthy_replicas_are_skipped(self):
+        """Tests that reads fall back to the primary while a replica fails"""
+
+        models.Company.objects.using(REPLICA).create(name="Replicated")
+        replica = connections[REPLICA]
+
+        with patch.object(
+            replica, "ensure_connection", side_effect=OperationalError
+        ):
+            self.assertNotIn("Replicated", self.company_names())
+
+        cache.get_cache().clear()
+        self.assertIn("Replicated", self.company_names())
+
+    def test_unsafe_requests_read_from_the_primary(self):
+        """Tests that the reads of a write are never sent to a replica"""
+
+        models.Company.objects.using(REPLICA).create(name="Replicated")
+        company = models.Company.objects.using(REPLICA).get(name="Replicated")
+
+        response = self.client.patch(
+            reverse("api-v1-company-detail", kwargs={"pk": company.pk}),
+            {"name": "Renamed"},
+        )
+        self.assertEqual(response.status_code, 404)
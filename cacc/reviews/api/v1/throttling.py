@@ -0,0 +1,150 @@
+"""Sliding window rate limits on review submissions
+
+Each limit keeps two counters in the cache, for the current and the
+previous fixed window. The rate over the last period is estimated by
+weighting the previous count with the share of the period it still
+overlaps, so a check costs one read and one increment whatever the rate,
+instead of a list of timestamps as with DRF's throttles. A batch counts as
+many submissions as the reviews it holds.
+"""
+
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+from ... import addresses, cache
+
+COUNTER_KEY = "reviews:{}:{}"
+
+
+class SlidingWindowThrottle(SimpleRateThrottle):
+    """Throttle counting requests over a sliding window
+
+    Counters are incremented without a lock, concurrent requests may
+    overshoot a limit by the number of requests checked at the same time.
+    """
+
+    timer = time.time
+
+    def get_rate(self):
+        """Gets the rate of the scope from REVIEWS_THROTTLE_RATES"""
+
+        return settings.REVIEWS_THROTTLE_RATES.get(self.scope) or None
+
+    def allow_request(self, request, view):
+        """Counts the request unless the window is full"""
+
+        if self.rate is None:
+            return True
+
+        ident = self.get_cache_key(request, view)
+
+        if ident is None:
+            return True
+
+        self.now = self.timer()
+        window = int(self.now // self.duration)
+        keys = [
+            COUNTER_KEY.format(ident, index) for index in (window - 1, window)
+        ]
+        backend = cache.get_cache()
+        counts = backend.get_many(keys)
+        self.previous = counts.get(keys[0], 0)
+        self.current = counts.get(keys[1], 0)
+        self.elapsed = self.now - window * self.duration
+
+        if self.estimate(self.elapsed) >= self.num_requests:
+            return False
+
+        # Counters outlive their window to weigh the next one
+        backend.add(keys[1], 0, 2 * self.duration)
+        backend.incr(keys[1], self.get_cost(request, view))
+
+        return True
+
+    def get_cost(self, request, view):
+        """Gets the number of submissions a request counts for
+
+        A batch may overdraw the window, the following submissions then
+        wait until it fades enough.
+        """
+
+        if getattr(view, "action", None) == "batch" and isinstance(
+            request.data, list
+        ):
+            return min(
+                max(len(request.data), 1), settings.REVIEWS_BATCH_MAX_SIZE
+            )
+
+        return 1
+
+    def estimate(self, elapsed):
+        """Gets the number of requests over the period ending at elapsed"""
+
+        overlap = max(0, 1 - elapsed / self.duration)
+
+        return self.previous * overlap + self.current
+
+    def wait(self):
+        """Gets the seconds until the next request would be allowed"""
+
+        limit = self.num_requests - 1
+
+        if self.current <= limit:
+            # The previous window has to fade until the current one fits
+            faded = self.previous + self.current - limit
+            return max(0, self.duration * faded / self.previous - self.elapsed)
+
+        # Only the next window can fit, once the current one fades enough
+        faded = 2 * self.current - limit
+
+        return self.duration * faded / self.current - self.elapsed
+
+
+class ReviewerRateThrottle(SlidingWindowThrottle):
+    """Limits the rate of the submissions of each reviewer"""
+
+    scope = "reviewer"
+
+    def get_cache_key(self, request, view):
+        """Identifies authenticated users by their id"""
+
+        if not request.user.is_authenticated:
+            return None
+
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": request.user.pk,
+        }
+
+
+class AddressRateThrottle(SlidingWindowThrottle):
+    """Limits the rate of the submissions from each client address"""
+
+    scope = "address"
+
+    def get_cache_key(self, request, view):
+        """Identifies clients by the address of the connecting peer
+
+        X-Forwarded-For is only trusted behind the number of proxies set in
+        NUM_PROXIES, the address added by the outermost of them being used,
+        so that clients cannot open new counters with forged headers.
+        """
+
+        packed = None
+
+        if api_settings.NUM_PROXIES:
+            packed = addresses.pack(self.get_ident(request))
+
+        if packed is None:
+            packed = addresses.pack(request.META.get("REMOTE_ADDR"))
+
+        if packed is None:
+            return None
+
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": packed.hex(),
+        }
@@ -1,6 +1,7 @@
+from django.urls import path
 from rest_framework import routers
 
-from . import views
+from . import async_views, views
 
 router = routers.DefaultRouter()
 
@@ -13,5 +14,22 @@ router.register(
 router.register(
     "reviewers", views.ReviewerViewSet, basename="api-v1-reviewer",
 )
+router.register(
+    "cache-stats", views.CacheStatsViewSet, basename="api-v1-cache-stats",
+)
+router.register(
+    "metrics", views.MetricsViewSet, basename="api-v1-metrics",
+)
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path(
+        "async/reviews/",
+        async_views.AsyncReviewListView.as_view(),
+        name="api-v1-async-review-list",
+    ),
+    path(
+        "async/reviews/<int:pk>/",
+        async_views.AsyncReviewDetailView.as_view(),
+        name="api-v1-async-review-detail",
+    ),
+]
@@ -1,34 +1,245 @@
-from rest_framework import permissions, viewsets
+from contextlib import suppress
+from datetime import timedelta
 
-from ... import models
-from . import serializers
+from django.conf import settings
+from django.db import router, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework import permissions, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import APIException, NotFound, ValidationError
+from rest_framework.response import Response
+from rest_framework.reverse import reverse
 
+from ... import (
+    autocomplete,
+    cache,
+    duplicates,
+    ingest,
+    models,
+    perf,
+    routers,
+)
+from . import (
+    access,
+    caching,
+    export,
+    fieldsets,
+    filters,
+    pagination,
+    records,
+    serializers,
+    throttling,
+)
 
-class ReviewerViewSet(viewsets.ReadOnlyModelViewSet):
+
+class IngestQueueFull(APIException):
+    """Raised when the ingestion queue refuses new reviews"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many reviews are waiting, retry later."
+    default_code = "queue_full"
+    # Seconds sent in the Retry-After header
+    wait = 5
+
+
+def queue_review(request, serializer):
+    """Queues a validated review and gets the data acknowledging it"""
+
+    try:
+        tracking_id = ingest.enqueue(
+            serializer.add_submission_data(dict(serializer.validated_data))
+        )
+
+    except ingest.QueueFull:
+        raise IngestQueueFull()
+
+    url = reverse(
+        "api-v1-review-queue-status",
+        kwargs={"tracking_id": tracking_id},
+        request=request,
+    )
+
+    return {"tracking_id": tracking_id, "status": ingest.PENDING, "url": url}
+
+
+class ReviewerViewSet(
+    routers.ReplicaReadsMixin,
+    caching.CachedListMixin,
+    fieldsets.SparseFieldsetMixin,
+    viewsets.ReadOnlyModelViewSet,
+):
     """Responds to requests for Company objects"""
 
     queryset = models.Reviewer.objects.all()
     serializer_class = serializers.ReviewerSerializer
+    cache_name = "reviewers"
+    cache_models = (models.Reviewer,)
+
+    def get_count_scope(self):
+        """Counts the list from the counter of every reviewer"""
+
+        return cache.ALL_SCOPE
 
 
-class CompanyViewSet(viewsets.ModelViewSet):
+class CompanyViewSet(
+    routers.ReplicaReadsMixin,
+    caching.CachedListMixin,
+    fieldsets.SparseFieldsetMixin,
+    viewsets.ModelViewSet,
+):
     """Responds to requests for Company objects"""
 
     queryset = models.Company.objects.all()
     serializer_class = serializers.CompanySerializer
+    cache_name = "companies"
+    cache_models = (models.Company,)
+
+    def get_count_scope(self):
+        """Counts the list from the counter of every company"""
+
+        return cache.ALL_SCOPE
+
+    @action(detail=False, permission_classes=[permissions.IsAuthenticated])
+    def autocomplete(self, request):
+        """Lists the first companies whose name starts with ``q``
+
+        Up to ``limit`` companies are returned in name order, matching
+        ignores case and repeated spaces.
+        """
+
+        prefix = request.query_params.get("q", "")
+
+        if not prefix.strip():
+            raise ValidationError({"q": ["This parameter is required."]})
+
+        try:
+            limit = int(request.query_params.get("limit", 10))
+
+        except ValueError:
+            raise ValidationError({"limit": ["A valid integer is required."]})
+
+        limit = max(1, min(limit, settings.REVIEWS_AUTOCOMPLETE_MAX_LIMIT))
+        matches = autocomplete.COMPANY_INDEX.search(prefix, limit)
+
+        return Response([{"id": pk, "name": name} for pk, name in matches])
+
+    @action(detail=True)
+    def stats(self, request, pk=None):
+        """Responds with the rating aggregates of a company"""
 
+        company = self.get_object()
+        stats = models.CompanyRatingStats.objects.filter(
+            company=company
+        ).first()
 
-class CompanyReviewViewSet(viewsets.ModelViewSet):
+        if stats is None:
+            stats = models.CompanyRatingStats(company=company)
+
+        serializer = serializers.CompanyRatingStatsSerializer(stats)
+
+        return Response(serializer.data)
+
+    @action(detail=True)
+    def ratings(self, request, pk=None):
+        """Responds with the daily rating aggregates of a company
+
+        Days run from ``start`` to ``end`` included, the last year by
+        default, and days without reviews are left out. The series is read
+        from the rollup refreshed by ``refresh_daily_ratings``.
+        """
+
+        company = self.get_object()
+        end = self.get_day_param("end", timezone.localdate())
+        start = self.get_day_param("start", end - timedelta(days=364))
+        span = (end - start).days + 1
+
+        if span < 1:
+            raise ValidationError({"start": ["Must not be after end."]})
+
+        if span > settings.REVIEWS_ROLLUP_MAX_DAYS:
+            raise ValidationError(
+                {
+                    "start": [
+                        f"At most {settings.REVIEWS_ROLLUP_MAX_DAYS} days "
+                        "can be requested."
+                    ]
+                }
+            )
+
+        days = models.CompanyDailyRating.objects.filter(
+            company=company, day__range=(start, end)
+        ).order_by("day")
+        watermark = models.RollupWatermark.objects.filter(
+            name=models.CompanyDailyRating.objects.WATERMARK
+        ).first()
+        serializer = serializers.CompanyDailyRatingSerializer(days, many=True)
+
+        return Response(
+            {
+                "company": company.pk,
+                "start": start,
+                "end": end,
+                "refreshed_until": watermark and watermark.value,
+                "days": serializer.data,
+            }
+        )
+
+    def get_day_param(self, name, default):
+        """Gets a day from the query parameters"""
+
+        value = self.request.query_params.get(name)
+
+        if value is None:
+            return default
+
+        try:
+            day = parse_date(value)
+
+        except ValueError:
+            day = None
+
+        if day is None:
+            raise ValidationError({name: ["Enter a date as YYYY-MM-DD."]})
+
+        return day
+
+
+class CompanyReviewViewSet(
+    routers.ReplicaReadsMixin,
+    caching.CachedListMixin,
+    fieldsets.SparseFieldsetMixin,
+    records.ReviewRecordsMixin,
+    access.ReviewAccessMixin,
+    viewsets.ModelViewSet,
+):
     """Responds to requests for CompanyReview objects"""
 
     queryset = models.CompanyReview.objects.all()
     serializer_class = serializers.CompanyReviewSerializer
+    pagination_class = pagination.ReviewPagination
+    filter_backends = [
+        filters.ReviewFilterBackend,
+        filters.ReviewSearchFilter,
+        filters.ReviewOrderingFilter,
+    ]
+    ordering_fields = ("date", "rating", "id")
+    cache_name = "reviews"
+    cache_models = (models.CompanyReview,)
 
     def get_permissions(self):
         """Gets the permissions for this class"""
         permission_classes = []
 
-        if self.action in ["list", "create", "retrieve"]:
+        if self.action in [
+            "list",
+            "create",
+            "retrieve",
+            "batch",
+            "export",
+            "queue_status",
+        ]:
             permission_classes = [permissions.IsAuthenticated]
 
         else:
@@ -36,14 +247,231 @@ class CompanyReviewViewSet(viewsets.ModelViewSet):
 
         return [permission_class() for permission_class in permission_classes]
 
-    def get_queryset(self):
-        """Filters the query based on the current user"""
+    def get_throttles(self):
+        """Limits the rate of submissions by reviewer and client address"""
+
+        if self.action in ("create", "batch"):
+            return [
+                throttling.ReviewerRateThrottle(),
+                throttling.AddressRateThrottle(),
+            ]
+
+        return super().get_throttles()
+
+    def get_cache_scope(self):
+        """Caches the staff view of the list only"""
+
+        if self.request.user.is_staff:
+            return "staff"
+
+        return None
+
+    def create(self, request, *args, **kwargs):
+        """Creates a review, or queues it when ingestion is write-behind
+
+        Queued reviews are acknowledged with 202 and a tracking id, their
+        status is polled from the ``queue_status`` action.
+        """
+
+        if not settings.REVIEWS_INGEST_QUEUE:
+            return super().create(request, *args, **kwargs)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = queue_review(request, serializer)
+
+        return Response(
+            data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={"Location": data["url"]},
+        )
+
+    @action(detail=False)
+    def queue(self, request):
+        """Responds with the number of queued reviews in each state"""
+
+        return Response(ingest.get_queue().counts())
+
+    @action(
+        detail=False,
+        url_path=r"queue/(?P<tracking_id>[0-9a-f-]+)",
+        url_name="queue-status",
+    )
+    def queue_status(self, request, tracking_id=None):
+        """Responds with the state of a queued review"""
+
+        entry = ingest.get_queue().get(tracking_id)
+        user = request.user
+
+        # Regular users can follow their own reviews only
+        if entry is None or not (
+            user.is_staff or entry["reviewer_id"] == user.pk
+        ):
+            raise NotFound()
+
+        return Response(
+            {
+                "tracking_id": entry["tracking_id"],
+                "status": entry["status"],
+                "review": entry["review_id"],
+                "error": entry["error"],
+            }
+        )
+
+    @action(detail=False, methods=["post"])
+    def batch(self, request):
+        """Creates a list of reviews with one bulk insert per chunk
+
+        Every item is validated on its own and gets a result holding its
+        status and either the created review or the validation errors.
+        """
+
+        items = request.data
+
+        if not isinstance(items, list):
+            raise ValidationError(
+                {"non_field_errors": ["Expected a list of reviews."]}
+            )
+
+        if len(items) > settings.REVIEWS_BATCH_MAX_SIZE:
+            raise ValidationError(
+                {
+                    "non_field_errors": [
+                        "Ensure this list has no more than "
+                        f"{settings.REVIEWS_BATCH_MAX_SIZE} reviews."
+                    ]
+                }
+            )
+
+        company_ids = set()
+
+        for item in items:
+            if isinstance(item, dict):
+                with suppress(TypeError, ValueError):
+                    company_ids.add(int(item.get("company")))
+
+        context = self.get_serializer_context()
+        context["preloaded"] = {
+            "company": models.Company.objects.in_bulk(
+                serializers.pks_in_range(models.Company, company_ids)
+            )
+        }
+
+        # A single serializer validates every item so that its fields are
+        # only built once, as a ListSerializer does with its child
+        serializer = self.get_serializer_class()(context=context)
+        results = []
+        valid = []
+
+        for index, item in enumerate(items):
+            try:
+                validated_data = serializer.run_validation(item)
+
+            except ValidationError as error:
+                results.append({"status": 400, "errors": error.detail})
+
+            else:
+                valid.append((index, validated_data))
+                results.append(None)
+
+        chunk_size = settings.REVIEWS_BATCH_CHUNK_SIZE
+
+        for start in range(0, len(valid), chunk_size):
+            chunk = valid[start : start + chunk_size]
+            reviews = [
+                models.CompanyReview(
+                    **serializer.add_submission_data(validated_data)
+                )
+                for _, validated_data in chunk
+            ]
+
+            with transaction.atomic():
+                models.CompanyReview.objects.bulk_create(reviews)
+                models.CompanyRatingStats.objects.record(
+                    (review.company_id, review.rating, 1) for review in reviews
+                )
+
+                if duplicates.is_enabled():
+                    duplicates.index_reviews(reviews)
+
+                # bulk_create does not send post_save signals
+                cache.invalidate(models.CompanyReview._meta.label)
+                cache.count_objects(
+                    models.CompanyReview._meta.label, reviews, 1
+                )
+
+            for (index, _), review in zip(chunk, reviews):
+                results[index] = {
+                    "status": 201,
+                    "data": serializer.to_representation(review),
+                }
+
+        return Response(results)
+
+    @action(detail=False)
+    def export(self, request):
+        """Streams every visible review as NDJSON or CSV
+
+        The format is chosen with the ``output`` query parameter and
+        defaults to NDJSON.
+        """
+
+        output = request.query_params.get("output", "ndjson")
+
+        if output not in export.ENCODERS:
+            raise ValidationError(
+                {"output": [f"Choose one of {', '.join(export.ENCODERS)}."]}
+            )
+
+        # The stream is consumed after the response is finalized, when the
+        # reads of the request are no longer routed to its replica
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.using(router.db_for_read(queryset.model))
+
+        rows = export.review_rows(queryset, settings.REVIEWS_EXPORT_CHUNK_SIZE)
+        response = StreamingHttpResponse(
+            export.buffered(export.ENCODERS[output](rows)),
+            content_type=export.EXPORT_FORMATS[output],
+        )
+        response["Content-Disposition"] = (
+            f'attachment; filename="reviews.{output}"'
+        )
+
+        return response
+
+    def perform_destroy(self, instance):
+        """Deletes a review and removes it from its company's aggregates"""
+
+        with transaction.atomic():
+            models.CompanyRatingStats.objects.record(
+                [(instance.company_id, instance.rating, -1)]
+            )
+            instance.delete()
+
+
+class CacheStatsViewSet(viewsets.ViewSet):
+    """Responds with the hit and miss counters of the cached lists"""
+
+    def list(self, request):
+        """Lists the counters of every cached view"""
+
+        return Response(
+            {
+                "ttl": settings.REVIEWS_CACHE_TTL,
+                "views": cache.get_counters(),
+            }
+        )
+
 
-        user = self.request.user
-        queryset = super().get_queryset()
+class MetricsViewSet(viewsets.ViewSet):
+    """Responds with the timing histograms of the recorded requests"""
 
-        # Make sure regular users can access their own reviews only
-        if not user.is_staff:
-            queryset = queryset.filter(reviewer=user)
+    def list(self, request):
+        """Lists the metrics of every route served by this process"""
 
-        return queryset
+        return Response(
+            {
+                "sample_rate": settings.REVIEWS_PERF_SAMPLE_RATE,
+                "routes": perf.METRICS.snapshot(),
+            }
+        )
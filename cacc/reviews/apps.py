@@ -1,5 +1,53 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (
+    post_delete,
+    post_init,
+    post_migrate,
+    post_save,
+    pre_save,
+)
 
 
 class ReviewsConfig(AppConfig):
     name = "reviews"
+
+    def ready(self):
+        """Connects the signal handlers of this app"""
+
+        from . import models, signals
+
+        post_migrate.connect(signals.repair_search_index, sender=self)
+        connection_created.connect(signals.record_queries)
+
+        for model in (models.Company, models.Reviewer, models.CompanyReview):
+            post_save.connect(signals.invalidate_cached_pages, sender=model)
+            post_delete.connect(signals.invalidate_cached_pages, sender=model)
+            post_save.connect(signals.count_saved_object, sender=model)
+            post_delete.connect(signals.uncount_deleted_object, sender=model)
+
+        post_save.connect(
+            signals.invalidate_user_record, sender=models.Reviewer
+        )
+        post_delete.connect(
+            signals.invalidate_user_record, sender=models.Reviewer
+        )
+
+        post_save.connect(signals.index_company, sender=models.Company)
+        post_delete.connect(signals.unindex_company, sender=models.Company)
+
+        post_init.connect(
+            signals.track_review_rollup, sender=models.CompanyReview
+        )
+        post_save.connect(
+            signals.track_review_rollup, sender=models.CompanyReview
+        )
+        pre_save.connect(
+            signals.mark_changed_review, sender=models.CompanyReview
+        )
+        pre_save.connect(
+            signals.pack_review_address, sender=models.CompanyReview
+        )
+        post_delete.connect(
+            signals.mark_deleted_review, sender=models.CompanyReview
+        )
@@ -0,0 +1,150 @@
+"""Archival of old reviews out of the hot CompanyReview table
+
+Reviews older than a cutoff are copied to ArchivedReview with their id and
+deleted from CompanyReview, so the lists, filters and indexes of the hot
+table only cover recent reviews. Reviews are archived by whole days of the
+current time zone, which keeps every day of the rating rollup in one table.
+
+On PostgreSQL the archive is declaratively partitioned by year of the review
+date, with a partition created for each year before its reviews are copied.
+Elsewhere it is a plain table. Archived reviews leave the search and
+near-duplicate indexes, and their rating aggregates are kept.
+"""
+
+from datetime import datetime, time
+from datetime import timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import cache, models
+
+PARTITION_NAME = "{table}_y{year}"
+
+
+def get_cutoff(before):
+    """Gets the midnight starting the day of a date or datetime"""
+
+    if isinstance(before, datetime):
+        before = timezone.localdate(before)
+
+    return timezone.make_aware(datetime.combine(before, time.min))
+
+
+def partition_table(schema_editor, model):
+    """Replaces the archive table by a table partitioned by date on PostgreSQL
+
+    The primary key of a partitioned table must hold the partition key, the
+    archive is keyed by (id, date) in the database and by id in Django.
+    """
+
+    connection = schema_editor.connection
+
+    if connection.vendor != "postgresql":
+        return
+
+    quote = schema_editor.quote_name
+    table = model._meta.db_table
+    date = quote(model._meta.get_field("date").column)
+    columns = [
+        f"{quote(field.column)} {field.db_type(connection)}"
+        + ("" if field.null else " NOT NULL")
+        for field in model._meta.concrete_fields
+    ]
+    columns.append(f"PRIMARY KEY ({quote(model._meta.pk.column)}, {date})")
+    schema_editor.delete_model(model)
+    schema_editor.execute(
+        f"CREATE TABLE {quote(table)} ({', '.join(columns)}) "
+        f"PARTITION BY RANGE ({date})"
+    )
+
+    for field in model._meta.concrete_fields:
+        if field.remote_field is None:
+            continue
+
+        target = field.target_field
+        schema_editor.execute(
+            f"ALTER TABLE {quote(table)} ADD CONSTRAINT "
+            f"{quote(f'{table}_{field.column}_fk')} "
+            f"FOREIGN KEY ({quote(field.column)}) REFERENCES "
+            f"{quote(target.model._meta.db_table)} ({quote(target.column)}) "
+            "DEFERRABLE INITIALLY DEFERRED"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {quote(f'{table}_{field.column}_idx')} "
+            f"ON {quote(table)} ({quote(field.column)})"
+        )
+
+    for index in model._meta.indexes:
+        schema_editor.add_index(model, index)
+
+
+def create_partitions(start, end):
+    """Creates the yearly archive partitions of the dates from start to end"""
+
+    if connection.vendor != "postgresql":
+        return
+
+    table = models.ArchivedReview._meta.db_table
+    quote = connection.ops.quote_name
+
+    with connection.cursor() as cursor:
+        for year in range(start.year, end.year + 1):
+            lower = datetime(year, 1, 1, tzinfo=dt_timezone.utc)
+            upper = datetime(year + 1, 1, 1, tzinfo=dt_timezone.utc)
+            name = PARTITION_NAME.format(table=table, year=year)
+            cursor.execute(
+                f"CREATE TABLE IF NOT EXISTS {quote(name)} PARTITION OF "
+                f"{quote(table)} FOR VALUES FROM ('{lower.isoformat()}') "
+                f"TO ('{upper.isoformat()}')"
+            )
+
+
+def archive_batch(cutoff, batch_size):
+    """Moves the oldest reviews dated before cutoff to the archive
+
+    Returns the number of reviews moved.
+    """
+
+    reviews = models.CompanyReview.objects
+
+    with transaction.atomic():
+        ids = list(
+            reviews.select_for_update()
+            .filter(date__lt=cutoff)
+            .order_by("date", "id")
+            .values_list("id", flat=True)[:batch_size]
+        )
+
+        if not ids:
+            return 0
+
+        rows = list(
+            reviews.filter(id__in=ids).values(
+                *models.ArchivedReview.field_names()
+            )
+        )
+        dates = [row["date"] for row in rows]
+        create_partitions(min(dates), max(dates))
+        archived = [models.ArchivedReview(**row) for row in rows]
+        models.ArchivedReview.objects.bulk_create(archived)
+
+        # The rows referencing the reviews go, the delete sends no signal
+        # as archived reviews still count in the aggregates and the rollup
+        models.ReviewSignature.objects.filter(duplicate_of_id__in=ids).update(
+            duplicate_of=None, similarity=None
+        )
+        models.ReviewBucket.objects.filter(review_id__in=ids).delete()
+        models.ReviewSignature.objects.filter(review_id__in=ids).delete()
+        table = connection.ops.quote_name(reviews.model._meta.db_table)
+        placeholders = ", ".join(["%s"] * len(ids))
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE id IN ({placeholders})", ids
+            )
+
+        cache.invalidate(models.CompanyReview._meta.label)
+        cache.count_objects(models.CompanyReview._meta.label, archived, -1)
+
+    return len(ids)
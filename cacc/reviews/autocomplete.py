@@ -0,0 +1,229 @@
+"""In-process prefix index of company names
+
+Names are kept normalized in a sorted list, the companies matching a prefix
+are a contiguous run found by binary search, so a lookup costs a few dozen
+comparisons whatever the number of companies.
+
+The index is loaded on the first lookup. Changes made by this process are
+applied as soon as their transaction commits. Changes made by other
+processes bump the Company generation in the shared cache, which is checked
+every few seconds and triggers a reload in the background while lookups keep
+using the current index. The generations bumped by this process's own
+changes are recorded and do not trigger a reload.
+"""
+
+import bisect
+import threading
+import time
+from array import array
+
+from django.conf import settings
+from django.db import connection
+
+from . import cache, models
+
+
+def normalize(name):
+    """Gets the form of a name or prefix used for matching"""
+
+    return " ".join(name.casefold().split())
+
+
+class CompanyIndex:
+    """Sorted array of the normalized names of every company"""
+
+    def __init__(self):
+        """Initializes an index loaded on first use"""
+
+        self.keys = None
+        self.ids = None
+        self.names = None
+        # Key of each indexed company, to find it again by binary search
+        self.key_of = None
+        self.generation = None
+        self.own_generations = set()
+        self.checked_at = 0
+        self.reloading = None
+        self.lock = threading.Lock()
+
+    def build(self):
+        """Reads every company and returns the sorted index columns"""
+
+        rows = sorted(
+            (normalize(name), pk, name)
+            for pk, name in models.Company.objects.values_list(
+                "id", "name"
+            ).iterator(chunk_size=10000)
+        )
+        keys = [key for key, _, _ in rows]
+        ids = array("q", (pk for _, pk, _ in rows))
+        # Names that are already normalized share the key's string
+        names = [key if key == name else name for key, _, name in rows]
+        key_of = {pk: key for key, pk, _ in rows}
+
+        return keys, ids, names, key_of
+
+    def load(self):
+        """Loads the whole index, replaying the changes made meanwhile"""
+
+        (generation,) = cache.get_generations([models.Company._meta.label])
+
+        with self.lock:
+            self.reloading = []
+
+        try:
+            keys, ids, names, key_of = self.build()
+
+        finally:
+            with self.lock:
+                changes, self.reloading = self.reloading, None
+
+        with self.lock:
+            self.keys, self.ids, self.names = keys, ids, names
+            self.key_of = key_of
+            self.generation = generation
+            self.checked_at = time.monotonic()
+            self.own_generations = {
+                own for own in self.own_generations if own > generation
+            }
+
+            for change in changes:
+                self.apply(*change)
+
+    def reload_in_background(self):
+        """Reloads the index without blocking lookups"""
+
+        def run():
+            """Loads the index from a thread with its own connection"""
+
+            try:
+                self.load()
+
+            finally:
+                connection.close()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def refresh(self):
+        """Loads the index, or reloads it if the companies changed elsewhere"""
+
+        if self.keys is None:
+            self.load()
+            return
+
+        now = time.monotonic()
+
+        if now - self.checked_at < settings.REVIEWS_AUTOCOMPLETE_REFRESH:
+            return
+
+        self.checked_at = now
+        (generation,) = cache.get_generations([models.Company._meta.label])
+
+        if generation == self.generation or self.reloading is not None:
+            return
+
+        with self.lock:
+            own = self.is_own(generation)
+
+            if own:
+                self.generation = generation
+                self.own_generations = {
+                    own for own in self.own_generations if own > generation
+                }
+
+        if not own:
+            self.reload_in_background()
+
+    def is_own(self, generation):
+        """Tells whether this process bumped every generation up to one
+
+        Must be called with the lock held.
+        """
+
+        if generation <= self.generation:
+            return False
+
+        bumped = range(self.generation + 1, generation + 1)
+
+        return len(bumped) <= len(self.own_generations) and all(
+            number in self.own_generations for number in bumped
+        )
+
+    def record_generation(self, generation):
+        """Records a Company generation bumped by this process"""
+
+        with self.lock:
+            self.own_generations.add(generation)
+
+    def search(self, prefix, limit):
+        """Gets the (id, name) of the first companies matching a prefix"""
+
+        self.refresh()
+        prefix = normalize(prefix)
+
+        with self.lock:
+            keys = self.keys
+            start = bisect.bisect_left(keys, prefix)
+            end = min(start + limit, len(keys))
+            matches = []
+
+            for index in range(start, end):
+                if not keys[index].startswith(prefix):
+                    break
+
+                matches.append((self.ids[index], self.names[index]))
+
+            return matches
+
+    def apply(self, pk, name):
+        """Stores the name of a company, or removes it if name is None
+
+        Must be called with the lock held.
+        """
+
+        if self.reloading is not None:
+            self.reloading.append((pk, name))
+
+        if self.keys is None:
+            return
+
+        key = self.key_of.pop(pk, None)
+
+        if key is not None:
+            index = bisect.bisect_left(self.keys, key)
+
+            # Companies sharing a name have the same key
+            while self.ids[index] != pk:
+                index += 1
+
+            del self.keys[index], self.ids[index], self.names[index]
+
+        if name is not None:
+            key = normalize(name)
+            index = bisect.bisect_right(self.keys, key)
+            self.keys.insert(index, key)
+            self.ids.insert(index, pk)
+            self.names.insert(index, key if key == name else name)
+            self.key_of[pk] = key
+
+    def update(self, pk, name):
+        """Stores the new name of a company"""
+
+        with self.lock:
+            self.apply(pk, name)
+
+    def remove(self, pk):
+        """Removes a deleted company"""
+
+        with self.lock:
+            self.apply(pk, None)
+
+    def clear(self):
+        """Drops the index, which is loaded again on the next lookup"""
+
+        with self.lock:
+            self.keys = self.ids = self.names = self.key_of = None
+            self.own_generations = set()
+
+
+COMPANY_INDEX = CompanyIndex()
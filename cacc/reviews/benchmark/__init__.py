@@ -0,0 +1,7 @@
+"""Synthetic data generation and request replay for benchmarks
+
+``data`` fills a database with companies, reviewers and reviews following a
+realistic skew. ``mix`` describes which requests to send and ``replay`` sends
+them through the Django test client or to a running server, reporting
+latencies, throughput and query counts as JSON.
+"""
@@ -0,0 +1,274 @@
+"""Synthetic companies, reviewers and reviews for benchmarks
+
+Reviews are spread over companies and reviewers with Zipf distributions, so
+a few companies hold most of the reviews and a few reviewers write most of
+them, as on real review sites.
+"""
+
+import datetime
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .. import cache, models, search
+
+STAFF_USERNAME = "bench_staff"
+REGULAR_USERNAME = "bench_regular"
+PASSWORD = "benchmark"
+
+WORDS = (
+    "great place to work with friendly people and good benefits but the "
+    "management could communicate better about salary growth remote work "
+    "office culture training career hours team projects customers support "
+    "terrible awful excellent average fair flexible stressful rewarding"
+).split()
+
+TEXT_POOL_SIZE = 10000
+ADDRESS_POOL_SIZE = 100000
+
+# Share of each rating among the reviews, from 1 to 5 stars
+RATING_WEIGHTS = (0.12, 0.08, 0.15, 0.3, 0.35)
+
+
+def zipf_weights(count, exponent):
+    """Gets the cumulative weights of ranks following a Zipf law"""
+
+    return list(
+        itertools.accumulate(
+            pow(rank, -exponent) for rank in range(1, count + 1)
+        )
+    )
+
+
+def new_ids(model, start):
+    """Gets the ids of the rows inserted after a previous maximum id"""
+
+    return list(
+        model.objects.filter(id__gt=start)
+        .order_by("id")
+        .values_list("id", flat=True)
+    )
+
+
+def max_id(model):
+    """Gets the largest id of a table"""
+
+    return model.objects.aggregate(Max("id"))["id__max"] or 0
+
+
+def create_companies(count, batch_size):
+    """Inserts companies and returns their ids"""
+
+    start = max_id(models.Company)
+
+    for offset in range(0, count, batch_size):
+        models.Company.objects.bulk_create(
+            models.Company(name=f"Company {start + index + 1}")
+            for index in range(offset, min(offset + batch_size, count))
+        )
+
+    return new_ids(models.Company, start)
+
+
+def create_reviewers(count, batch_size):
+    """Inserts reviewers without a usable password and returns their ids"""
+
+    start = max_id(models.Reviewer)
+    password = make_password(None)
+
+    for offset in range(0, count, batch_size):
+        models.Reviewer.objects.bulk_create(
+            models.Reviewer(
+                username=f"bench_reviewer_{start + index + 1}",
+                password=password,
+            )
+            for index in range(offset, min(offset + batch_size, count))
+        )
+
+    return new_ids(models.Reviewer, start)
+
+
+def create_benchmark_users():
+    """Creates the staff and regular users the request replay logs in as"""
+
+    for username, is_staff in (
+        (STAFF_USERNAME, True),
+        (REGULAR_USERNAME, False),
+    ):
+        user, created = models.Reviewer.objects.get_or_create(
+            username=username, defaults={"is_staff": is_staff}
+        )
+
+        if created:
+            user.set_password(PASSWORD)
+            user.save()
+
+
+def review_batches(count, company_ids, reviewer_ids, options, rng):
+    """Yields batches of random review rows following the configured skew
+
+    Every column of a batch is drawn with a single call, which is several
+    times faster than drawing row by row.
+    """
+
+    company_weights = zipf_weights(len(company_ids), options["skew"])
+    reviewer_weights = zipf_weights(
+        len(reviewer_ids), options["reviewer_skew"]
+    )
+    ratings = list(itertools.accumulate(RATING_WEIGHTS))
+    now = timezone.now()
+    span = options["days"] * 86400
+    adapt_date = connection.ops.adapt_datetimefield_value
+
+    # Ranks are shuffled so the busiest companies are not the oldest ones
+    company_ids = rng.sample(company_ids, len(company_ids))
+    reviewer_ids = rng.sample(reviewer_ids, len(reviewer_ids))
+
+    # Texts are drawn from a pool, building one per review is slower than
+    # inserting it
+    texts = []
+
+    for _ in range(TEXT_POOL_SIZE):
+        words = rng.choices(WORDS, k=rng.randint(8, 60))
+        texts.append(
+            (
+                " ".join(words[:5]).capitalize(),
+                " ".join(words).capitalize() + ".",
+            )
+        )
+
+    addresses = [
+        f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+        for _ in range(ADDRESS_POOL_SIZE)
+    ]
+
+    for offset in range(0, count, options["batch_size"]):
+        size = min(options["batch_size"], count - offset)
+        columns = zip(
+            rng.choices(reviewer_ids, cum_weights=reviewer_weights, k=size),
+            rng.choices(company_ids, cum_weights=company_weights, k=size),
+            rng.choices(range(1, 6), cum_weights=ratings, k=size),
+            rng.choices(texts, k=size),
+            rng.choices(addresses, k=size),
+        )
+        yield [
+            (
+                reviewer_id,
+                company_id,
+                rating,
+                title,
+                summary,
+                address,
+                adapt_date(
+                    now - datetime.timedelta(seconds=rng.random() * span)
+                ),
+            )
+            for reviewer_id, company_id, rating, (title, summary), address in (
+                columns
+            )
+        ]
+
+
+def insert_reviews(batches):
+    """Inserts batches of review rows with one executemany per batch
+
+    The submission date is automatically set on save, which bulk_create
+    would do as well, so the rows are inserted with plain SQL to keep the
+    generated dates. The search index is dropped during the load and rebuilt
+    once at the end, which is much faster than updating it row by row.
+    """
+
+    quote = connection.ops.quote_name
+    names = (
+        "reviewer",
+        "company",
+        "rating",
+        "title",
+        "summary",
+        "ip_address",
+        "date",
+    )
+    fields = [models.CompanyReview._meta.get_field(name) for name in names]
+    sql = (
+        f"INSERT INTO {quote(models.CompanyReview._meta.db_table)} "
+        f"({', '.join(quote(field.column) for field in fields)}) "
+        f"VALUES ({', '.join(['%s'] * len(fields))})"
+    )
+    inserted = 0
+    search.uninstall(connection)
+
+    try:
+        for batch in batches:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.executemany(sql, batch)
+
+            inserted += len(batch)
+
+    finally:
+        search.install(connection)
+
+    return inserted
+
+
+def create_stats(company_ids, batch_size):
+    """Computes the rating aggregates of new companies"""
+
+    manager = models.CompanyRatingStats.objects
+
+    for offset in range(0, len(company_ids), batch_size):
+        computed = manager.compute(company_ids[offset : offset + batch_size])
+        manager.bulk_create(
+            stats for stats in computed.values() if stats.review_count
+        )
+
+
+def generate(companies, reviewers, reviews, **options):
+    """Fills a database with synthetic data and returns the row counts
+
+    Options are ``skew`` and ``reviewer_skew``, the Zipf exponents of the
+    company and reviewer distributions, ``days``, the span of the review
+    dates, ``seed`` and ``batch_size``.
+    """
+
+    options.setdefault("skew", 1.1)
+    options.setdefault("reviewer_skew", 0.8)
+    options.setdefault("days", 365)
+    options.setdefault("batch_size", 5000)
+    rng = random.Random(options.get("seed", 0))
+    batch_size = options["batch_size"]
+
+    create_benchmark_users()
+    company_ids = create_companies(companies, batch_size)
+    reviewer_ids = create_reviewers(reviewers, batch_size)
+
+    if reviews and not (company_ids and reviewer_ids):
+        raise ValueError("Reviews need at least one company and reviewer")
+
+    inserted = 0
+
+    if reviews:
+        inserted = insert_reviews(
+            review_batches(reviews, company_ids, reviewer_ids, options, rng)
+        )
+
+    # Raw inserts bypass the signals maintaining aggregates and caches
+    create_stats(company_ids, batch_size)
+
+    # Reviews are backdated, the next refresh rebuilds the whole rollup
+    if inserted:
+        models.CompanyDailyRating.objects.invalidate()
+
+    for model in (models.Company, models.Reviewer, models.CompanyReview):
+        cache.invalidate(model._meta.label)
+        cache.drop_counts(model._meta.label)
+
+    return {
+        "companies": len(company_ids),
+        "reviewers": len(reviewer_ids),
+        "reviews": inserted,
+    }
@@ -0,0 +1,310 @@
+"""Request mixes replayed by benchmarks
+
+A mix is a list of request templates. Each template has a ``name``, a
+``method``, a ``path``, a relative ``weight``, the ``user`` sending it
+(``staff``, ``regular`` or ``anonymous``) and optionally a JSON ``body``.
+
+Paths and bodies may hold placeholders filled for every request: ``{company}``,
+``{review}``, ``{reviewer}``, ``{word}``, ``{username}``, ``{password}``,
+``{access}`` and ``{refresh}``. A string made of a single placeholder is
+replaced by the raw value, so ``"{company}"`` becomes a number.
+"""
+
+import json
+import random
+import re
+
+from django.db.models import Max, Min
+
+from .. import models
+from . import data
+
+REVIEW_BODY = {
+    "title": "Benchmark {word}",
+    "summary": "Benchmark review about {word}",
+    "company": "{company}",
+    "rating": 1,
+}
+
+# Covers every route of reviews/urls.py and reviews/api/v1/urls.py. Routes
+# that log out or delete data have no weight unless a mix asks for them.
+DEFAULT_MIX = [
+    {"name": "html-review-list", "path": "/", "weight": 5},
+    {"name": "html-review-search", "path": "/?search={word}", "weight": 2},
+    {"name": "html-review-page", "path": "/?page=20", "weight": 2},
+    {
+        "name": "html-reviewer-reviews",
+        "path": "/reviewer/{reviewer}",
+        "weight": 2,
+    },
+    {"name": "html-review-detail", "path": "/review/{review}", "weight": 3},
+    {
+        "name": "html-login-form",
+        "path": "/login",
+        "user": "anonymous",
+        "weight": 1,
+    },
+    {
+        "name": "html-logout",
+        "method": "POST",
+        "path": "/logout",
+        "weight": 0,
+    },
+    {
+        "name": "token-obtain",
+        "method": "POST",
+        "path": "/api/token/",
+        "user": "anonymous",
+        "body": {"username": "{username}", "password": "{password}"},
+        "weight": 1,
+    },
+    {
+        "name": "token-refresh",
+        "method": "POST",
+        "path": "/api/token/refresh/",
+        "user": "anonymous",
+        "body": {"refresh": "{refresh}"},
+        "weight": 1,
+    },
+    {
+        "name": "token-verify",
+        "method": "POST",
+        "path": "/api/token/verify/",
+        "user": "anonymous",
+        "body": {"token": "{access}"},
+        "weight": 1,
+    },
+    {"name": "api-root", "path": "/api/v1/", "weight": 1},
+    {"name": "api-company-list", "path": "/api/v1/companies/", "weight": 3},
+    {
+        "name": "api-company-detail",
+        "path": "/api/v1/companies/{company}/",
+        "weight": 2,
+    },
+    {
+        "name": "api-company-autocomplete",
+        "path": "/api/v1/companies/autocomplete/?q={word}",
+        "user": "regular",
+        "weight": 3,
+    },
+    {
+        "name": "api-company-stats",
+        "path": "/api/v1/companies/{company}/stats/",
+        "weight": 3,
+    },
+    {
+        "name": "api-company-create",
+        "method": "POST",
+        "path": "/api/v1/companies/",
+        "body": {"name": "Benchmark {word}"},
+        "weight": 1,
+    },
+    {
+        "name": "api-company-update",
+        "method": "PATCH",
+        "path": "/api/v1/companies/{company}/",
+        "body": {"name": "Benchmark {word}"},
+        "weight": 0,
+    },
+    {
+        "name": "api-company-delete",
+        "method": "DELETE",
+        "path": "/api/v1/companies/{company}/",
+        "weight": 0,
+    },
+    {"name": "api-review-list", "path": "/api/v1/reviews/", "weight": 10},
+    {
+        "name": "api-review-list-regular",
+        "path": "/api/v1/reviews/",
+        "user": "regular",
+        "weight": 5,
+    },
+    {
+        "name": "api-review-list-deep",
+        "path": "/api/v1/reviews/?offset=10000",
+        "weight": 2,
+    },
+    {
+        "name": "api-review-list-cursor",
+        "path": "/api/v1/reviews/?cursor=&limit=100",
+        "weight": 5,
+    },
+    {
+        "name": "api-review-search",
+        "path": "/api/v1/reviews/?search={word}",
+        "weight": 3,
+    },
+    {
+        "name": "api-review-detail",
+        "path": "/api/v1/reviews/{review}/",
+        "weight": 5,
+    },
+    {
+        "name": "api-review-create",
+        "method": "POST",
+        "path": "/api/v1/reviews/",
+        "user": "regular",
+        "body": REVIEW_BODY,
+        "weight": 2,
+    },
+    {
+        "name": "api-review-batch",
+        "method": "POST",
+        "path": "/api/v1/reviews/batch/",
+        "user": "regular",
+        "body": [REVIEW_BODY] * 20,
+        "weight": 1,
+    },
+    {
+        "name": "api-review-export",
+        "path": "/api/v1/reviews/export/?search={word}",
+        "user": "regular",
+        "weight": 1,
+    },
+    {
+        "name": "api-review-update",
+        "method": "PATCH",
+        "path": "/api/v1/reviews/{review}/",
+        "body": {"rating": 1},
+        "weight": 1,
+    },
+    {
+        "name": "api-review-delete",
+        "method": "DELETE",
+        "path": "/api/v1/reviews/{review}/",
+        "weight": 0,
+    },
+    {"name": "api-reviewer-list", "path": "/api/v1/reviewers/", "weight": 2},
+    {
+        "name": "api-reviewer-detail",
+        "path": "/api/v1/reviewers/{reviewer}/",
+        "weight": 1,
+    },
+    {"name": "api-cache-stats", "path": "/api/v1/cache-stats/", "weight": 1},
+    {
+        "name": "api-async-review-list",
+        "path": "/api/v1/async/reviews/",
+        "weight": 2,
+    },
+    {
+        "name": "api-async-review-detail",
+        "path": "/api/v1/async/reviews/{review}/",
+        "weight": 2,
+    },
+    {
+        "name": "api-async-review-create",
+        "method": "POST",
+        "path": "/api/v1/async/reviews/",
+        "user": "regular",
+        "body": REVIEW_BODY,
+        "weight": 1,
+    },
+]
+
+PLACEHOLDER = re.compile(r"^\{(\w+)\}$")
+
+
+def load_mix(path=None):
+    """Loads a mix from a JSON file, or the default mix"""
+
+    if path is None:
+        entries = DEFAULT_MIX
+
+    else:
+        with open(path) as mix_file:
+            entries = json.load(mix_file)
+
+    mix = []
+
+    for entry in entries:
+        if "name" not in entry or "path" not in entry:
+            raise ValueError(f"Mix entries need a name and a path: {entry}")
+
+        entry = {"method": "GET", "user": "staff", "weight": 1, **entry}
+
+        if entry["user"] not in ("staff", "regular", "anonymous"):
+            raise ValueError(f"Unknown user in mix entry: {entry}")
+
+        if entry["weight"] > 0:
+            mix.append(entry)
+
+    if not mix:
+        raise ValueError("The mix has no weighted entry")
+
+    return mix
+
+
+def fill(template, values):
+    """Replaces the placeholders of a path or body"""
+
+    if isinstance(template, dict):
+        return {key: fill(value, values) for key, value in template.items()}
+
+    if isinstance(template, list):
+        return [fill(value, values) for value in template]
+
+    if isinstance(template, str):
+        match = PLACEHOLDER.match(template)
+
+        if match:
+            return values[match.group(1)]
+
+        return template.format(**values)
+
+    return template
+
+
+class Sampler:
+    """Draws requests from a mix with random placeholder values"""
+
+    def __init__(self, mix, tokens, seed=0):
+        """Reads the id ranges the placeholders are drawn from"""
+
+        self.mix = mix
+        self.tokens = tokens
+        self.rng = random.Random(seed)
+        self.weights = [entry["weight"] for entry in mix]
+        self.ranges = {
+            name: model.objects.aggregate(low=Min("id"), high=Max("id"))
+            for name, model in (
+                ("company", models.Company),
+                ("review", models.CompanyReview),
+                ("reviewer", models.Reviewer),
+            )
+        }
+
+    def draw_id(self, name):
+        """Draws an id, ids of deleted rows are drawn as well"""
+
+        bounds = self.ranges[name]
+
+        if bounds["low"] is None:
+            return 0
+
+        return self.rng.randint(bounds["low"], bounds["high"])
+
+    def values(self):
+        """Draws the values of every placeholder"""
+
+        return {
+            "company": self.draw_id("company"),
+            "review": self.draw_id("review"),
+            "reviewer": self.draw_id("reviewer"),
+            "word": self.rng.choice(data.WORDS),
+            "username": data.STAFF_USERNAME,
+            "password": data.PASSWORD,
+            "access": self.tokens["access"],
+            "refresh": self.tokens["refresh"],
+        }
+
+    def draw(self):
+        """Draws a request as a (entry, path, body) tuple"""
+
+        entry = self.rng.choices(self.mix, weights=self.weights)[0]
+        values = self.values()
+        body = entry.get("body")
+
+        if body is not None:
+            body = fill(body, values)
+
+        return entry, fill(entry["path"], values), body
@@ -0,0 +1,290 @@
+"""Replays a request mix and reports latencies, throughput and queries
+
+Requests go through the Django test client, which also counts the queries
+of every request, or to a running server over HTTP.
+"""
+
+import http.client
+import json
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .. import models
+from . import data
+
+# Query count of the db metric of a Server-Timing header
+SERVER_TIMING_QUERIES = re.compile(r'(?:^|,)\s*db;[^,]*desc="(\d+) queries"')
+
+
+def percentile(values, fraction):
+    """Gets the nearest-rank percentile of sorted values"""
+
+    if not values:
+        return 0.0
+
+    index = max(0, min(len(values) - 1, round(fraction * len(values)) - 1))
+
+    return values[index]
+
+
+def get_users():
+    """Gets the users sending the requests of each kind"""
+
+    users = {
+        "staff": models.Reviewer.objects.filter(
+            username=data.STAFF_USERNAME
+        ).first(),
+        "regular": models.Reviewer.objects.filter(
+            username=data.REGULAR_USERNAME
+        ).first(),
+    }
+
+    if None in users.values():
+        raise ValueError(
+            "Benchmark users are missing, run generate_benchmark_data first"
+        )
+
+    return users
+
+
+def get_tokens(user):
+    """Gets a pair of JWTs for a user"""
+
+    refresh = RefreshToken.for_user(user)
+
+    return {"access": str(refresh.access_token), "refresh": str(refresh)}
+
+
+def client_host():
+    """Gets a host name the test client may send requests to"""
+
+    allowed = settings.ALLOWED_HOSTS
+
+    if not allowed or "*" in allowed or "testserver" in allowed:
+        return "testserver"
+
+    return allowed[0].lstrip(".")
+
+
+class ClientTransport:
+    """Sends requests through the Django test client"""
+
+    name = "client"
+
+    def __init__(self, users):
+        """Logs a test client in for each kind of user"""
+
+        host = client_host()
+        self.target = host
+        self.clients = {"anonymous": Client(HTTP_HOST=host)}
+
+        for kind, user in users.items():
+            token = get_tokens(user)["access"]
+            client = Client(
+                HTTP_HOST=host, HTTP_AUTHORIZATION=f"Bearer {token}"
+            )
+            client.force_login(user)
+            self.clients[kind] = client
+
+    def send(self, entry, path, body):
+        """Sends a request and returns its status, duration and queries"""
+
+        client = self.clients[entry["user"]]
+        kwargs = {}
+
+        if body is not None:
+            kwargs = {
+                "data": json.dumps(body),
+                "content_type": "application/json",
+            }
+
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.generic(entry["method"], path, **kwargs)
+
+            # Streamed bodies are produced while they are read
+            if response.streaming:
+                for _ in response.streaming_content:
+                    pass
+
+            elapsed = time.perf_counter() - start
+
+        return response.status_code, elapsed, len(queries)
+
+
+class ServerTransport:
+    """Sends requests to a running server over HTTP
+
+    Every thread keeps its own keep-alive connection. Query counts are read
+    from the Server-Timing header of the responses and are reported as
+    missing for requests the server did not sample.
+    """
+
+    name = "server"
+
+    def __init__(self, url, users):
+        """Prepares the credentials of each kind of user"""
+
+        parts = urlsplit(url)
+
+        if parts.scheme != "http":
+            raise ValueError(f"Only plain HTTP URLs are supported: {url}")
+
+        self.target = url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.local = threading.local()
+        self.headers = {"anonymous": {}}
+
+        for kind, user in users.items():
+            # Sessions are stored in the database the server uses as well
+            client = Client()
+            client.force_login(user)
+            session = client.cookies[settings.SESSION_COOKIE_NAME].value
+            token = get_tokens(user)["access"]
+            self.headers[kind] = {
+                "Authorization": f"Bearer {token}",
+                "Cookie": f"{settings.SESSION_COOKIE_NAME}={session}",
+            }
+
+    def get_connection(self):
+        """Gets the connection of the current thread"""
+
+        if getattr(self.local, "connection", None) is None:
+            self.local.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=60
+            )
+
+        return self.local.connection
+
+    def send(self, entry, path, body):
+        """Sends a request and returns its status, duration and queries"""
+
+        headers = dict(self.headers[entry["user"]])
+        payload = None
+
+        if body is not None:
+            payload = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        server = self.get_connection()
+        start = time.perf_counter()
+
+        try:
+            server.request(
+                entry["method"],
+                self.prefix + path,
+                body=payload,
+                headers=headers,
+            )
+            response = server.getresponse()
+            response.read()
+
+        except (OSError, http.client.HTTPException):
+            server.close()
+            self.local.connection = None
+            return None, time.perf_counter() - start, None
+
+        elapsed = time.perf_counter() - start
+        match = SERVER_TIMING_QUERIES.search(
+            response.getheader("Server-Timing", "")
+        )
+        queries = int(match.group(1)) if match else None
+
+        return response.status, elapsed, queries
+
+
+def summarize(results):
+    """Summarizes the (status, seconds, queries) results of requests"""
+
+    latencies = sorted(seconds * 1000 for _, seconds, _ in results)
+    queries = [count for _, _, count in results if count is not None]
+    statuses = {}
+
+    for status, _, _ in results:
+        key = str(status) if status is not None else "failed"
+        statuses[key] = statuses.get(key, 0) + 1
+
+    summary = {
+        "count": len(results),
+        "errors": sum(
+            1 for status, _, _ in results if status is None or status >= 500
+        ),
+        "statuses": dict(sorted(statuses.items())),
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 3),
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p95": round(percentile(latencies, 0.95), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(latencies[-1], 3),
+        },
+        "queries": None,
+    }
+
+    if queries:
+        summary["queries"] = {
+            "mean": round(sum(queries) / len(queries), 3),
+            "max": max(queries),
+            "total": sum(queries),
+        }
+
+    return summary
+
+
+def replay(transport, sampler, requests, concurrency=1, warmup=0):
+    """Sends requests drawn from a mix and returns the report
+
+    Requests are drawn before the clock starts so that sampling is not
+    timed and the same seed replays the same requests.
+    """
+
+    for _ in range(warmup):
+        transport.send(*sampler.draw())
+
+    draws = [sampler.draw() for _ in range(requests)]
+
+    def send(draw):
+        """Sends a drawn request"""
+
+        entry, path, body = draw
+
+        return entry["name"], transport.send(entry, path, body)
+
+    start = time.perf_counter()
+
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(send, draws))
+
+    else:
+        results = [send(draw) for draw in draws]
+
+    duration = time.perf_counter() - start
+    routes = {}
+
+    for name, result in results:
+        routes.setdefault(name, []).append(result)
+
+    return {
+        "transport": transport.name,
+        "target": transport.target,
+        "requests": requests,
+        "concurrency": concurrency,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(requests / duration, 3) if duration else 0,
+        "overall": summarize([result for _, result in results]),
+        "routes": {
+            name: summarize(route_results)
+            for name, route_results in sorted(routes.items())
+        },
+    }
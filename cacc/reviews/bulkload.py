@@ -0,0 +1,471 @@
+"""Streaming bulk loader for companies, reviewers and reviews
+
+Records are read one at a time from JSON fixtures, NDJSON or CSV files and
+inserted in batches, with COPY on PostgreSQL and one executemany per batch
+elsewhere. Model instances, signals and validation are skipped, which is
+what makes the loader fast, so the input is trusted to hold valid rows. The
+data maintained by signals is rebuilt once the records are loaded.
+"""
+
+import contextlib
+import csv
+import io
+import json
+import os
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.models import (
+    CharField,
+    DateTimeField,
+    ForeignKey,
+    IntegerField,
+    TextField,
+)
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import addresses, cache, models, search
+
+FORMATS = {
+    ".json": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+}
+
+MODELS = {
+    "company": models.Company,
+    "reviewer": models.Reviewer,
+    "review": models.CompanyReview,
+}
+
+# Fields computed from another field of the same record, which signals fill
+# in for saved objects
+DERIVED = {
+    models.CompanyReview: {"ip_packed": ("ip_address", addresses.pack)},
+}
+
+# Characters read from a JSON file at a time
+READ_SIZE = 64 * 1024
+
+MISSING = object()
+
+
+class BulkLoadError(ValueError):
+    """Raised when the input cannot be loaded"""
+
+
+def get_format(path):
+    """Gets the format of a file from its extension"""
+
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension not in FORMATS:
+        raise BulkLoadError(
+            f"Cannot tell the format of {path}, choose one of "
+            f"{', '.join(sorted(set(FORMATS.values())))}"
+        )
+
+    return FORMATS[extension]
+
+
+def get_model(name):
+    """Gets a loadable model from its short name or its label"""
+
+    for short_name, model in MODELS.items():
+        if name.lower() in (short_name, model._meta.label_lower):
+            return model
+
+    raise BulkLoadError(
+        f"Cannot load {name} records, choose one of {', '.join(MODELS)}"
+    )
+
+
+def json_items(stream):
+    """Yields the items of a JSON array without reading it whole"""
+
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    opened = False
+
+    while True:
+        while position < len(buffer) and buffer[position].isspace():
+            position += 1
+
+        if position < len(buffer):
+            char = buffer[position]
+
+            if not opened:
+                if char != "[":
+                    raise BulkLoadError("A JSON file must hold an array")
+
+                opened = True
+                position += 1
+                continue
+
+            if char == "]":
+                return
+
+            if char == ",":
+                position += 1
+                continue
+
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+
+            except json.JSONDecodeError:
+                # The item may be cut at the end of the buffer
+                pass
+
+            else:
+                yield item
+                continue
+
+        chunk = stream.read(READ_SIZE)
+
+        if not chunk:
+            raise BulkLoadError("The JSON array is invalid or truncated")
+
+        buffer = buffer[position:] + chunk
+        position = 0
+
+
+def read_records(stream, file_format):
+    """Yields the records of a stream, as dicts"""
+
+    if file_format == "json":
+        yield from json_items(stream)
+
+    elif file_format == "ndjson":
+        for number, line in enumerate(stream, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+
+                except ValueError as error:
+                    raise BulkLoadError(f"Line {number}: {error}")
+
+    else:
+        yield from csv.DictReader(stream)
+
+
+def record_values(record, model):
+    """Gets the model and field values of a fixture or flat record
+
+    Fixtures records look like ``{"model": ..., "pk": ..., "fields": ...}``,
+    other records map field names to values and need a model.
+    """
+
+    if "model" in record and "fields" in record:
+        values = dict(record["fields"])
+
+        if record.get("pk") is not None:
+            values["pk"] = record["pk"]
+
+        return get_model(record["model"]), values
+
+    if model is None:
+        raise BulkLoadError("Records without a model need --model")
+
+    values = dict(record)
+
+    if "id" in values:
+        values["pk"] = values.pop("id")
+
+    return model, values
+
+
+def text_value(value):
+    """Converts a text value without going through the field"""
+
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+def integer_value(value):
+    """Converts an integer or foreign key value"""
+
+    return value if value is None else int(value)
+
+
+class Table:
+    """Insert statement and value converters of a model"""
+
+    def __init__(self, model, connection, with_pk):
+        """Plans the columns written for the model"""
+
+        self.model = model
+        self.connection = connection
+        self.with_pk = with_pk
+        self.fields = [
+            field
+            for field in model._meta.concrete_fields
+            if with_pk or not field.primary_key
+        ]
+        quote = connection.ops.quote_name
+        self.name = quote(model._meta.db_table)
+        self.columns = ", ".join(quote(field.column) for field in self.fields)
+        self.converters = [self.converter(field) for field in self.fields]
+        self.defaults = [self.default(field) for field in self.fields]
+        names = [field.name for field in self.fields]
+        self.derived = [
+            (names.index(name), names.index(source), function)
+            for name, (source, function) in DERIVED.get(model, {}).items()
+        ]
+
+    def converter(self, field):
+        """Gets the function converting values to database values"""
+
+        if isinstance(field, (IntegerField, ForeignKey)):
+            return integer_value
+
+        if type(field) in (CharField, TextField):
+            return text_value
+
+        if isinstance(field, DateTimeField):
+            zone = timezone.get_current_timezone()
+            adapt = self.connection.ops.adapt_datetimefield_value
+
+            def convert_datetime(value):
+                """Converts a datetime, naive ones are in the current zone"""
+
+                if isinstance(value, str):
+                    value = parse_datetime(value) or field.to_python(value)
+
+                if value is not None and timezone.is_naive(value):
+                    value = timezone.make_aware(value, zone)
+
+                return adapt(value)
+
+            return convert_datetime
+
+        def convert(value):
+            """Converts a value through the field"""
+
+            return field.get_db_prep_save(
+                field.to_python(value), self.connection
+            )
+
+        return convert
+
+    def default(self, field):
+        """Gets the database value of a field missing from a record"""
+
+        if getattr(field, "auto_now_add", False):
+            return self.converter(field)(timezone.now())
+
+        # Loaded users cannot log in until they set a password
+        if self.model is models.Reviewer and field.name == "password":
+            return make_password(None)
+
+        value = field.get_default()
+
+        return None if value is None else self.converter(field)(value)
+
+    def row(self, values):
+        """Gets the database row of the field values of a record"""
+
+        row = []
+
+        for field, convert, default in zip(
+            self.fields, self.converters, self.defaults
+        ):
+            if field.primary_key:
+                value = values.get("pk", MISSING)
+
+            else:
+                value = values.get(field.name, MISSING)
+
+                if value is MISSING:
+                    value = values.get(field.attname, MISSING)
+
+            # Empty CSV cells of non-text fields are null or missing
+            if value == "" and not field.empty_strings_allowed:
+                value = None if field.null else MISSING
+
+            if value is MISSING:
+                row.append(default)
+
+            else:
+                row.append(convert(value))
+
+        for index, source, function in self.derived:
+            if row[source] is not None:
+                row[index] = function(row[source])
+
+        return row
+
+    def insert(self, rows):
+        """Inserts rows, with COPY on PostgreSQL"""
+
+        with self.connection.cursor() as cursor:
+            if self.connection.vendor == "postgresql":
+                self.copy(cursor, rows)
+
+            else:
+                placeholders = ", ".join(["%s"] * len(self.fields))
+                cursor.executemany(
+                    f"INSERT INTO {self.name} ({self.columns}) "
+                    f"VALUES ({placeholders})",
+                    rows,
+                )
+
+    def copy(self, cursor, rows):
+        """Streams rows to COPY in its text format"""
+
+        data = io.StringIO()
+
+        for row in rows:
+            data.write("\t".join(copy_value(value) for value in row))
+            data.write("\n")
+
+        data.seek(0)
+        sql = f"COPY {self.name} ({self.columns}) FROM STDIN"
+
+        # psycopg2 and psycopg 3 expose COPY differently
+        if hasattr(cursor, "copy_expert"):
+            cursor.copy_expert(sql, data)
+
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(data.getvalue())
+
+
+def copy_value(value):
+    """Encodes a value for the COPY text format"""
+
+    if value is None:
+        return "\\N"
+
+    if isinstance(value, bool):
+        return "t" if value else "f"
+
+    # Escaped once more for the text format
+    if isinstance(value, (bytes, memoryview)):
+        return "\\\\x" + bytes(value).hex()
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class Loader:
+    """Inserts records in batches and fixes up the derived data"""
+
+    def __init__(self, connection, batch_size):
+        """Initializes a loader writing to a connection"""
+
+        # The connection itself, going through django.db.connection costs a
+        # lookup of the current connection for every attribute
+        self.connection = connections[connection.alias]
+        self.batch_size = batch_size
+        self.tables = {}
+        self.counts = dict.fromkeys(MODELS.values(), 0)
+        self.company_ids = set()
+
+    def load(self, records, model=None):
+        """Inserts records, grouping consecutive records of a model"""
+
+        batch = []
+        table = None
+
+        for record in records:
+            record_model, values = record_values(record, model)
+            record_table = self.get_table(record_model, "pk" in values)
+
+            if record_table is not table or len(batch) == self.batch_size:
+                self.flush(table, batch)
+                table = record_table
+                batch = []
+
+            batch.append(table.row(values))
+
+        self.flush(table, batch)
+
+    def get_table(self, model, with_pk):
+        """Gets the table of a model, the first record sets its columns"""
+
+        table = self.tables.get(model)
+
+        if table is None:
+            table = self.tables[model] = Table(model, self.connection, with_pk)
+
+        elif table.with_pk != with_pk:
+            raise BulkLoadError(
+                f"Either every or no {model._meta.label} record has an id"
+            )
+
+        return table
+
+    def flush(self, table, rows):
+        """Inserts a batch of rows in its own transaction"""
+
+        if not rows:
+            return
+
+        with transaction.atomic(using=self.connection.alias):
+            table.insert(rows)
+
+        self.counts[table.model] += len(rows)
+
+        if table.model is models.CompanyReview:
+            index = table.fields.index(table.model._meta.get_field("company"))
+            self.company_ids.update(row[index] for row in rows)
+
+    def finish(self):
+        """Rebuilds the data that signals would have maintained"""
+
+        with_pk = [
+            table.model for table in self.tables.values() if table.with_pk
+        ]
+
+        if with_pk:
+            statements = self.connection.ops.sequence_reset_sql(
+                no_style(), with_pk
+            )
+
+            with self.connection.cursor() as cursor:
+                for statement in statements:
+                    cursor.execute(statement)
+
+        if self.company_ids:
+            models.CompanyRatingStats.objects.db_manager(
+                self.connection.alias
+            ).rebuild(self.company_ids, self.batch_size)
+            models.CompanyDailyRating.objects.invalidate()
+
+        for model, count in self.counts.items():
+            if count:
+                cache.invalidate(model._meta.label)
+                cache.drop_counts(model._meta.label)
+
+
+@contextlib.contextmanager
+def indexes_dropped(connection):
+    """Drops the review indexes and the search index, rebuilt at the end
+
+    Building an index once is much faster than updating it for every row.
+    """
+
+    model = models.CompanyReview
+    search.uninstall(connection)
+
+    with connection.schema_editor() as editor:
+        for index in model._meta.indexes:
+            editor.remove_index(model, index)
+
+    try:
+        yield
+
+    finally:
+        with connection.schema_editor() as editor:
+            for index in model._meta.indexes:
+                editor.add_index(model, index)
+
+        search.install(connection)
@@ -0,0 +1,224 @@
+import hashlib
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+GENERATION_KEY = "reviews:generation:{}"
+COUNTER_KEY = "reviews:cache:{}:{}"
+PAGE_KEY = "reviews:page:{}:{}:{}:{}"
+COUNT_KEY = "reviews:count:{}:{}:{}"
+# Generation of the counts of a model, bumped by writes sending no signals
+COUNTS_LABEL = "{}:counts"
+
+# Scope of the counts of every object of a model
+ALL_SCOPE = "all"
+
+# Names of the views caching their pages, used to report their counters
+CACHED_VIEWS = set()
+
+
+def get_cache():
+    """Gets the cache backend used by the reviews app"""
+
+    return caches[settings.REVIEWS_CACHE_ALIAS]
+
+
+def get_generations(labels):
+    """Gets the current generation of each model label
+
+    A missing generation, for example after an eviction, starts from the
+    current time so that it never repeats a generation used before.
+    """
+
+    cache = get_cache()
+    keys = [GENERATION_KEY.format(label) for label in labels]
+    generations = cache.get_many(keys)
+
+    for key in keys:
+        if key not in generations:
+            cache.add(key, int(time.time() * 1000), None)
+            generations[key] = cache.get(key)
+
+    return [generations[key] for key in keys]
+
+
+async def aget_generations(labels):
+    """Gets the current generation of each model label from async code"""
+
+    cache = get_cache()
+    keys = [GENERATION_KEY.format(label) for label in labels]
+    generations = await cache.aget_many(keys)
+
+    for key in keys:
+        if key not in generations:
+            await cache.aadd(key, int(time.time() * 1000), None)
+            generations[key] = await cache.aget(key)
+
+    return [generations[key] for key in keys]
+
+
+def bump_generation(label):
+    """Invalidates every cached entry depending on a model label
+
+    Returns the new generation.
+    """
+
+    cache = get_cache()
+    key = GENERATION_KEY.format(label)
+
+    try:
+        return cache.incr(key)
+
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), None)
+
+        return cache.get(key)
+
+
+def invalidate(label, on_bump=None):
+    """Bumps a generation now and again once the transaction commits
+
+    The second bump discards pages cached by concurrent requests that read
+    the data before the transaction committed. ``on_bump`` is called with
+    each new generation.
+    """
+
+    def bump():
+        """Bumps the generation and reports it"""
+
+        generation = bump_generation(label)
+
+        if on_bump is not None:
+            on_bump(generation)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def count(view_name, outcome):
+    """Increments the hit or miss counter of a view"""
+
+    cache = get_cache()
+    key = COUNTER_KEY.format(view_name, outcome)
+
+    try:
+        cache.incr(key)
+
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_counters():
+    """Gets the hit and miss counters of every cached view"""
+
+    cache = get_cache()
+    keys = {
+        (name, outcome): COUNTER_KEY.format(name, outcome)
+        for name in CACHED_VIEWS
+        for outcome in ("hits", "misses")
+    }
+    values = cache.get_many(keys.values())
+    counters = {}
+
+    for (name, outcome), key in sorted(keys.items()):
+        counters.setdefault(name, {})[outcome] = values.get(key, 0)
+
+    return counters
+
+
+def page_key(view_name, scope, generations, url):
+    """Builds the key of a cached page"""
+
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    generation = ".".join(str(value) for value in generations)
+
+    return PAGE_KEY.format(view_name, scope, generation, digest)
+
+
+def reviewer_scope(reviewer_id):
+    """Gets the scope of the counts of the objects of a reviewer"""
+
+    return f"reviewer:{reviewer_id}"
+
+
+def count_scopes(instance):
+    """Gets the scopes of the counts an object is counted in"""
+
+    scopes = [ALL_SCOPE]
+    reviewer_id = getattr(instance, "reviewer_id", None)
+
+    if reviewer_id is not None:
+        scopes.append(reviewer_scope(reviewer_id))
+
+    return scopes
+
+
+def get_count(label, scope, compute):
+    """Gets the cached number of objects of a scope
+
+    A missing count is computed by ``compute`` and kept for
+    ``REVIEWS_COUNT_TTL`` seconds, which bounds the drift of counts adjusted
+    by transactions rolled back afterwards.
+    """
+
+    cache = get_cache()
+    (generation,) = get_generations([COUNTS_LABEL.format(label)])
+    key = COUNT_KEY.format(label, generation, scope)
+    value = cache.get(key)
+
+    if value is None:
+        value = compute()
+        cache.add(key, value, settings.REVIEWS_COUNT_TTL)
+
+    return value
+
+
+async def aget_count(label, scope, compute):
+    """Gets the cached number of objects of a scope from async code"""
+
+    cache = get_cache()
+    (generation,) = await aget_generations([COUNTS_LABEL.format(label)])
+    key = COUNT_KEY.format(label, generation, scope)
+    value = await cache.aget(key)
+
+    if value is None:
+        value = await compute()
+        await cache.aadd(key, value, settings.REVIEWS_COUNT_TTL)
+
+    return value
+
+
+def count_objects(label, instances, delta):
+    """Adds delta to the cached counts of the scopes of some objects
+
+    Counts not cached are left to be computed when they are next read.
+    """
+
+    scopes = Counter(
+        scope for instance in instances for scope in count_scopes(instance)
+    )
+
+    if not scopes:
+        return
+
+    cache = get_cache()
+    (generation,) = get_generations([COUNTS_LABEL.format(label)])
+
+    for scope, objects in scopes.items():
+        try:
+            cache.incr(
+                COUNT_KEY.format(label, generation, scope), delta * objects
+            )
+
+        except ValueError:
+            pass
+
+
+def drop_counts(label):
+    """Discards every cached count of a model, after writes sending no signal"""
+
+    bump_generation(COUNTS_LABEL.format(label))
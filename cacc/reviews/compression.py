@@ -0,0 +1,150 @@
+"""Compression of responses negotiated from Accept-Encoding
+
+Responses are compressed with brotli when the ``brotli`` package is installed
+and the client accepts it, and with gzip otherwise. Streamed responses are
+compressed chunk by chunk, each chunk being flushed so that clients receive
+it without waiting for the end of the stream.
+"""
+
+import zlib
+
+from django.conf import settings
+
+try:
+    import brotli
+
+except ImportError:
+    brotli = None
+
+BROTLI = "br"
+GZIP = "gzip"
+
+# zlib window bits writing a gzip header and trailer
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+# Media types compressed, which excludes HTML pages: compressing their CSRF
+# token next to reflected input would expose it to BREACH
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson")
+
+
+def get_encodings():
+    """Gets the supported encodings, preferred first"""
+
+    if brotli is None:
+        return (GZIP,)
+
+    return (BROTLI, GZIP)
+
+
+def parse_accept_encoding(header):
+    """Gets the quality of each coding of an Accept-Encoding header"""
+
+    qualities = {}
+
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+
+        if not coding:
+            continue
+
+        quality = 1.0
+        name, _, value = params.partition("=")
+
+        if name.strip().lower() == "q":
+            try:
+                quality = float(value)
+
+            except ValueError:
+                quality = 0.0
+
+        qualities[coding] = quality
+
+    return qualities
+
+
+def choose_encoding(header):
+    """Gets the preferred supported encoding of a client, or None"""
+
+    qualities = parse_accept_encoding(header)
+    any_quality = qualities.get("*", 0.0)
+    best = None
+
+    for encoding in get_encodings():
+        quality = qualities.get(encoding, any_quality)
+
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+
+    return best and best[0]
+
+
+def is_compressible(content_type):
+    """Tells whether responses of a media type are compressed"""
+
+    media_type = content_type.partition(";")[0].strip().lower()
+
+    return media_type in COMPRESSIBLE_TYPES
+
+
+def compressor(encoding, level=None):
+    """Gets the compress, flush and finish functions of a new compressor
+
+    ``level`` defaults to ``REVIEWS_BROTLI_QUALITY`` or
+    ``REVIEWS_GZIP_LEVEL``.
+    """
+
+    if encoding == BROTLI:
+        if level is None:
+            level = settings.REVIEWS_BROTLI_QUALITY
+
+        stream = brotli.Compressor(quality=level)
+
+        return stream.process, stream.flush, stream.finish
+
+    if level is None:
+        level = settings.REVIEWS_GZIP_LEVEL
+
+    stream = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+
+    return (
+        stream.compress,
+        lambda: stream.flush(zlib.Z_SYNC_FLUSH),
+        stream.flush,
+    )
+
+
+def compress(content, encoding, level=None):
+    """Compresses a whole response body"""
+
+    process, _, finish = compressor(encoding, level)
+
+    return process(content) + finish()
+
+
+def compress_chunks(chunks, encoding):
+    """Compresses the chunks of a streamed response as they come"""
+
+    process, flush, finish = compressor(encoding)
+
+    for chunk in chunks:
+        data = process(chunk) + flush()
+
+        if data:
+            yield data
+
+    yield finish()
+
+
+async def acompress_chunks(chunks, encoding):
+    """Compresses the chunks of an async streamed response as they come"""
+
+    process, flush, finish = compressor(encoding)
+
+    async for chunk in chunks:
+        data = process(chunk) + flush()
+
+        if data:
+            yield data
+
+    yield finish()
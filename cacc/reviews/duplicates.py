@@ -0,0 +1,351 @@
+"""Near-duplicate detection of review summaries with MinHash and LSH
+
+A summary is reduced to the set of its word triples, its shingles. For each
+of NUM_HASHES hash functions, the signature of the summary keeps the
+smallest hash of its shingles. Two signatures agree on a position with a
+probability equal to the Jaccard similarity of the shingle sets, so the
+share of agreeing positions estimates the similarity of two summaries.
+
+Signatures are cut in BANDS bands of ROWS hashes, each band is hashed to a
+bucket stored in an indexed column. The reviews sharing a bucket with a
+summary are its only candidates, so a lookup costs a few index probes
+whatever the number of reviews. Summaries with a similarity of 0.8 share a
+bucket with a probability over 99.9%, summaries with a similarity of 0.3
+with a probability of about 12%.
+"""
+
+import hashlib
+import operator
+import re
+import sys
+from array import array
+
+from django.conf import settings
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+
+from . import models
+
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+SHINGLE_SIZE = 3
+
+# Summaries with fewer shingles are too common to tell a campaign from a
+# coincidence, they are not compared
+MIN_SHINGLES = 5
+
+FLAG = "flag"
+REJECT = "reject"
+
+# Buckets or reviews looked up per query
+LOOKUP_SIZE = 500
+
+WORDS = re.compile(r"\w+")
+
+
+def is_enabled():
+    """Tells whether the summaries of new reviews are compared"""
+
+    return bool(settings.REVIEWS_DUPLICATE_ACTION)
+
+
+def shingles(text):
+    """Gets the word triples of a text, as bytes"""
+
+    words = WORDS.findall(text.casefold())
+
+    return {
+        " ".join(words[index : index + SHINGLE_SIZE]).encode()
+        for index in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def hash_shingle(shingle):
+    """Gets the NUM_HASHES hashes of a shingle
+
+    Every 4 bytes of an extendable output function act as an independent
+    hash function, so all of them are computed with a single call.
+    """
+
+    return unpack(hashlib.shake_128(shingle).digest(4 * NUM_HASHES))
+
+
+def pack(signature):
+    """Gets the stored form of a signature, little endian"""
+
+    if sys.byteorder == "big":
+        signature = array("I", signature)
+        signature.byteswap()
+
+    return signature.tobytes()
+
+
+def unpack(data):
+    """Gets a signature from its stored form"""
+
+    signature = array("I", bytes(data))
+
+    if sys.byteorder == "big":
+        signature.byteswap()
+
+    return signature
+
+
+def signatures(texts):
+    """Gets the signatures of texts, None for the ones too short to compare
+
+    The hashes of a shingle are computed once per call, and the minimums are
+    taken position by position with map and zip over the hash arrays, which
+    keeps the inner loops out of the interpreter.
+    """
+
+    hashes = {}
+    result = []
+
+    for text in texts:
+        found = shingles(text)
+
+        if len(found) < MIN_SHINGLES:
+            result.append(None)
+            continue
+
+        arrays = []
+
+        for shingle in found:
+            values = hashes.get(shingle)
+
+            if values is None:
+                values = hashes[shingle] = hash_shingle(shingle)
+
+            arrays.append(values)
+
+        result.append(array("I", map(min, zip(*arrays))))
+
+    return result
+
+
+def get_buckets(signature):
+    """Gets the bucket of each band of a signature"""
+
+    data = pack(signature)
+    size = 4 * ROWS
+
+    return [
+        int.from_bytes(
+            hashlib.blake2b(
+                data[band * size : (band + 1) * size],
+                digest_size=8,
+                person=bytes([band]),
+            ).digest(),
+            "little",
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first, second):
+    """Estimates the similarity of the summaries of two signatures"""
+
+    return sum(map(operator.eq, first, second)) / NUM_HASHES
+
+
+def chunks(values, size=LOOKUP_SIZE):
+    """Splits a list of values in chunks of a given size"""
+
+    for start in range(0, len(values), size):
+        yield values[start : start + size]
+
+
+def best_match(signature, candidates):
+    """Gets the most similar of (review_id, signature) candidates
+
+    Returns a (review_id, similarity) tuple, or None when no candidate
+    reaches REVIEWS_DUPLICATE_THRESHOLD. Ties go to the oldest review.
+    """
+
+    match = None
+
+    for review_id, other in candidates:
+        score = similarity(signature, other)
+
+        if score < settings.REVIEWS_DUPLICATE_THRESHOLD:
+            continue
+
+        if match is None or (-score, review_id) < (-match[1], match[0]):
+            match = (review_id, score)
+
+    return match
+
+
+def find_matches(signatures, exclude=()):
+    """Gets the best stored match of each signature, or None
+
+    Each signature is compared with at most REVIEWS_DUPLICATE_MAX_CANDIDATES
+    of the oldest reviews sharing one of its buckets. Only as many of the
+    oldest members of each bucket are read, however crowded the bucket.
+    """
+
+    bucket_lists = [
+        get_buckets(signature) if signature is not None else []
+        for signature in signatures
+    ]
+    members = {}
+    keys = sorted({bucket for buckets in bucket_lists for bucket in buckets})
+    limit = settings.REVIEWS_DUPLICATE_MAX_CANDIDATES
+    # Excluded reviews are filtered out afterwards, they may take some of
+    # the first rows of a bucket
+    per_bucket = limit + len(exclude)
+
+    for chunk in chunks(keys):
+        rows = (
+            models.ReviewBucket.objects.filter(bucket__in=chunk)
+            .annotate(
+                position=Window(
+                    RowNumber(),
+                    partition_by=F("bucket"),
+                    order_by=F("review_id").asc(),
+                )
+            )
+            .filter(position__lte=per_bucket)
+        )
+
+        for bucket, review_id in rows.values_list("bucket", "review_id"):
+            if review_id not in exclude:
+                members.setdefault(bucket, set()).add(review_id)
+
+    candidate_lists = []
+
+    for buckets in bucket_lists:
+        candidates = set()
+
+        for bucket in buckets:
+            candidates.update(members.get(bucket, ()))
+
+        candidate_lists.append(sorted(candidates)[:limit])
+
+    stored = {}
+    ids = sorted({pk for candidates in candidate_lists for pk in candidates})
+
+    for chunk in chunks(ids):
+        rows = models.ReviewSignature.objects.filter(review_id__in=chunk)
+
+        for review_id, data in rows.values_list("review_id", "signature"):
+            stored[review_id] = unpack(data)
+
+    matches = []
+
+    for signature, candidates in zip(signatures, candidate_lists):
+        matches.append(
+            best_match(
+                signature,
+                ((pk, stored[pk]) for pk in candidates if pk in stored),
+            )
+        )
+
+    return matches
+
+
+def find_duplicate(text, exclude=()):
+    """Gets the (review_id, similarity) of a stored near-duplicate, or None"""
+
+    return find_matches(signatures([text]), exclude)[0]
+
+
+def index_reviews(reviews, replace=False):
+    """Stores the signatures of saved reviews and flags near-duplicates
+
+    Each review is compared with the stored reviews and with the reviews
+    before it in the list, so a campaign posted in one batch is caught as
+    well. ``replace`` drops the signatures stored earlier for the reviews.
+    Returns the number of reviews flagged.
+    """
+
+    reviews = list(reviews)
+    ids = {review.pk for review in reviews}
+
+    if replace:
+        models.ReviewSignature.objects.filter(review_id__in=ids).delete()
+        models.ReviewBucket.objects.filter(review_id__in=ids).delete()
+
+    computed = signatures(review.summary for review in reviews)
+    matches = find_matches(computed, ids)
+    listed = {}
+    stored = []
+    buckets = []
+
+    for review, signature, match in zip(reviews, computed, matches):
+        row = models.ReviewSignature(review=review)
+        stored.append(row)
+
+        if signature is None:
+            row.signature = b""
+            continue
+
+        row.signature = pack(signature)
+        review_buckets = get_buckets(signature)
+        earlier = {}
+
+        for bucket in review_buckets:
+            for review_id, other in listed.get(bucket, ()):
+                earlier[review_id] = other
+
+        for candidate in (match, best_match(signature, earlier.items())):
+            if candidate is not None and (
+                row.similarity is None or candidate[1] > row.similarity
+            ):
+                row.duplicate_of_id, row.similarity = candidate
+
+        for bucket in review_buckets:
+            listed.setdefault(bucket, []).append((review.pk, signature))
+            buckets.append(models.ReviewBucket(review=review, bucket=bucket))
+
+    models.ReviewSignature.objects.bulk_create(stored)
+    models.ReviewBucket.objects.bulk_create(buckets, batch_size=LOOKUP_SIZE)
+
+    return sum(row.duplicate_of_id is not None for row in stored)
+
+
+def find_clusters(min_size=2):
+    """Groups the flagged reviews with the reviews they duplicate
+
+    Returns the clusters of at least ``min_size`` reviews as sorted lists of
+    review ids, largest first.
+    """
+
+    parents = {}
+
+    def find(review_id):
+        """Gets the root of the cluster of a review"""
+
+        root = parents.setdefault(review_id, review_id)
+
+        while parents[root] != root:
+            root = parents[root]
+
+        # Shortens the path for the next lookups
+        while parents[review_id] != root:
+            parents[review_id], review_id = root, parents[review_id]
+
+        return root
+
+    pairs = models.ReviewSignature.objects.filter(
+        duplicate_of__isnull=False
+    ).values_list("review_id", "duplicate_of_id")
+
+    for review_id, duplicate_of_id in pairs.iterator(chunk_size=LOOKUP_SIZE):
+        parents[find(review_id)] = find(duplicate_of_id)
+
+    clusters = {}
+
+    for review_id in parents:
+        clusters.setdefault(find(review_id), []).append(review_id)
+
+    found = [
+        sorted(members)
+        for members in clusters.values()
+        if len(members) >= min_size
+    ]
+
+    return sorted(found, key=lambda members: (-len(members), members[0]))
@@ -0,0 +1,541 @@
+"""Write-behind ingestion of reviews
+
+Accepted reviews are appended to a durable queue, a local SQLite file, and
+inserted later by a worker with one ``bulk_create`` per batch. A review is
+committed to the queue before its submission is acknowledged, and only
+leaves the pending state once it is committed to the database, so a crash
+at any point leaves it pending and it is inserted on the next run.
+
+Every review carries its tracking id in ``CompanyReview.ingest_id``. Replaying
+an entry that was inserted but not yet marked as done finds the existing
+review instead of inserting it twice. Reviews are dated when they were
+accepted, not when the worker inserted them.
+"""
+
+import atexit
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import addresses, cache, duplicates, models
+
+PENDING = "pending"
+CLAIMED = "claimed"
+DONE = "done"
+FAILED = "failed"
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS entries (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        tracking_id TEXT NOT NULL UNIQUE,
+        reviewer_id INTEGER NOT NULL,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL,
+        review_id INTEGER,
+        error TEXT,
+        accepted_at REAL NOT NULL,
+        claimed_at REAL,
+        finished_at REAL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS entries_status ON entries (status, seq)",
+)
+
+# Fields of a validated review stored in the queue
+PAYLOAD_FIELDS = (
+    "company_id",
+    "reviewer_id",
+    "rating",
+    "title",
+    "summary",
+    "ip_address",
+)
+
+
+class QueueFull(Exception):
+    """Raised when the queue holds as many pending reviews as allowed"""
+
+
+class ReviewQueue:
+    """Durable FIFO of accepted reviews stored in a SQLite file
+
+    Several processes may share the file, entries are claimed within
+    immediate transactions so that a single worker processes each of them.
+    A claim expires after ``lease`` seconds, which hands the entries of a
+    crashed worker over to the others.
+    """
+
+    def __init__(self, path, max_pending, lease):
+        """Opens the queue, creating its file if needed"""
+
+        self.path = path
+        self.max_pending = max_pending
+        self.lease = lease
+        self.local = threading.local()
+
+        with self.transaction() as db:
+            for statement in SCHEMA:
+                db.execute(statement)
+
+    def connect(self):
+        """Gets the connection of the current thread"""
+
+        db = getattr(self.local, "db", None)
+
+        if db is None:
+            db = sqlite3.connect(self.path, isolation_level=None, timeout=30)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            # Acknowledged entries must survive a power loss
+            db.execute("PRAGMA synchronous=FULL")
+            self.local.db = db
+
+        return db
+
+    def close(self):
+        """Closes the connection of the current thread"""
+
+        db = getattr(self.local, "db", None)
+
+        if db is not None:
+            db.close()
+            self.local.db = None
+
+    def transaction(self):
+        """Opens a write transaction on the connection of this thread"""
+
+        return QueueTransaction(self.connect())
+
+    def put(self, payload):
+        """Appends a review and returns its tracking id
+
+        Raises ``QueueFull`` instead when too many reviews are pending.
+        """
+
+        tracking_id = str(uuid.uuid4())
+
+        with self.transaction() as db:
+            (pending,) = db.execute(
+                "SELECT COUNT(*) FROM entries WHERE status IN (?, ?)",
+                (PENDING, CLAIMED),
+            ).fetchone()
+
+            if pending >= self.max_pending:
+                raise QueueFull()
+
+            db.execute(
+                "INSERT INTO entries (tracking_id, reviewer_id, payload, "
+                "status, accepted_at) VALUES (?, ?, ?, ?, ?)",
+                (
+                    tracking_id,
+                    payload["reviewer_id"],
+                    json.dumps(payload),
+                    PENDING,
+                    time.time(),
+                ),
+            )
+
+        return tracking_id
+
+    def claim(self, limit):
+        """Claims the oldest pending entries as (tracking_id, payload)
+
+        Payloads hold the time their review was accepted in ``accepted_at``.
+        """
+
+        now = time.time()
+
+        with self.transaction() as db:
+            rows = db.execute(
+                "SELECT seq, tracking_id, payload, accepted_at FROM entries "
+                "WHERE status = ? OR (status = ? AND claimed_at < ?) "
+                "ORDER BY seq LIMIT ?",
+                (PENDING, CLAIMED, now - self.lease, limit),
+            ).fetchall()
+            db.executemany(
+                "UPDATE entries SET status = ?, claimed_at = ? WHERE seq = ?",
+                [(CLAIMED, now, row["seq"]) for row in rows],
+            )
+
+        return [
+            (
+                row["tracking_id"],
+                {
+                    **json.loads(row["payload"]),
+                    "accepted_at": row["accepted_at"],
+                },
+            )
+            for row in rows
+        ]
+
+    def finish(self, results):
+        """Records the outcome of claimed entries
+
+        ``results`` maps tracking ids to a (review_id, error) tuple.
+        """
+
+        now = time.time()
+
+        with self.transaction() as db:
+            db.executemany(
+                "UPDATE entries SET status = ?, review_id = ?, error = ?, "
+                "finished_at = ? WHERE tracking_id = ?",
+                [
+                    (FAILED if error else DONE, review_id, error, now, key)
+                    for key, (review_id, error) in results.items()
+                ],
+            )
+
+    def release(self, tracking_ids):
+        """Returns claimed entries to the pending state"""
+
+        with self.transaction() as db:
+            db.executemany(
+                "UPDATE entries SET status = ?, claimed_at = NULL "
+                "WHERE tracking_id = ? AND status = ?",
+                [(PENDING, key, CLAIMED) for key in tracking_ids],
+            )
+
+    def get(self, tracking_id):
+        """Gets an entry as a dict, or None"""
+
+        row = (
+            self.connect()
+            .execute(
+                "SELECT tracking_id, reviewer_id, status, review_id, error, "
+                "accepted_at, finished_at FROM entries WHERE tracking_id = ?",
+                (tracking_id,),
+            )
+            .fetchone()
+        )
+
+        return dict(row) if row is not None else None
+
+    def counts(self):
+        """Counts the entries in each state"""
+
+        rows = self.connect().execute(
+            "SELECT status, COUNT(*) FROM entries GROUP BY status"
+        )
+        counts = dict.fromkeys((PENDING, CLAIMED, DONE, FAILED), 0)
+        counts.update(rows.fetchall())
+
+        return counts
+
+    def purge(self, older_than):
+        """Deletes the entries done more than some seconds ago
+
+        Failed entries are kept until someone looks into them.
+        """
+
+        with self.transaction() as db:
+            return db.execute(
+                "DELETE FROM entries WHERE status = ? AND finished_at < ?",
+                (DONE, time.time() - older_than),
+            ).rowcount
+
+
+class QueueTransaction:
+    """Context manager wrapping a block in an immediate transaction"""
+
+    def __init__(self, db):
+        """Keeps the connection the transaction is opened on"""
+
+        self.db = db
+
+    def __enter__(self):
+        """Begins the transaction, taking the write lock right away"""
+
+        self.db.execute("BEGIN IMMEDIATE")
+
+        return self.db
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Commits the transaction, or rolls it back on errors"""
+
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    """Gets the queue of this process, opening it on first use"""
+
+    global _queue
+
+    with _queue_lock:
+        if _queue is None or _queue.path != settings.REVIEWS_INGEST_PATH:
+            _queue = ReviewQueue(
+                settings.REVIEWS_INGEST_PATH,
+                settings.REVIEWS_INGEST_MAX_PENDING,
+                settings.REVIEWS_INGEST_LEASE,
+            )
+
+        _queue.max_pending = settings.REVIEWS_INGEST_MAX_PENDING
+
+        return _queue
+
+
+def review_payload(validated_data):
+    """Gets the queued representation of validated review data"""
+
+    return {
+        "company_id": validated_data["company"].pk,
+        "reviewer_id": validated_data["reviewer"].pk,
+        "rating": validated_data["rating"],
+        "title": validated_data["title"],
+        "summary": validated_data["summary"],
+        "ip_address": validated_data["ip_address"],
+    }
+
+
+def enqueue(validated_data):
+    """Queues a validated review and returns its tracking id"""
+
+    tracking_id = get_queue().put(review_payload(validated_data))
+
+    if settings.REVIEWS_INGEST_WORKER:
+        start_worker()
+
+    return tracking_id
+
+
+def store_reviews(entries):
+    """Inserts queued reviews and maps their tracking ids to review ids
+
+    Reviews inserted by an earlier attempt are found by their tracking id
+    and not inserted again. Reviews accepted before the rollup settle delay
+    have their day journaled, a refresh may have passed their date already.
+    """
+
+    keys = {uuid.UUID(tracking_id): tracking_id for tracking_id, _ in entries}
+    reviews = models.CompanyReview.objects
+
+    with transaction.atomic():
+        existing = set(
+            reviews.filter(ingest_id__in=keys).values_list(
+                "ingest_id", flat=True
+            )
+        )
+        new = [
+            models.CompanyReview(
+                ingest_id=uuid.UUID(tracking_id),
+                ip_packed=addresses.pack(payload["ip_address"]),
+                **{field: payload[field] for field in PAYLOAD_FIELDS},
+            )
+            for tracking_id, payload in entries
+            if uuid.UUID(tracking_id) not in existing
+        ]
+        reviews.bulk_create(new)
+
+        # The date is set on insert, it is replaced by the acceptance time
+        accepted = {
+            tracking_id: datetime.fromtimestamp(
+                payload["accepted_at"], dt_timezone.utc
+            )
+            for tracking_id, payload in entries
+        }
+
+        for review in new:
+            review.date = accepted[str(review.ingest_id)]
+
+        reviews.bulk_update(new, ["date"])
+        settled = timezone.now() - timedelta(
+            seconds=settings.REVIEWS_ROLLUP_SETTLE
+        )
+        models.DailyRatingChange.mark(
+            *(
+                (review.company_id, review.date)
+                for review in new
+                if review.date < settled
+            )
+        )
+        models.CompanyRatingStats.objects.record(
+            (review.company_id, review.rating, 1) for review in new
+        )
+
+        if duplicates.is_enabled():
+            duplicates.index_reviews(new)
+
+        # bulk_create does not send post_save signals
+        cache.invalidate(models.CompanyReview._meta.label)
+        cache.count_objects(models.CompanyReview._meta.label, new, 1)
+        stored = reviews.filter(ingest_id__in=keys).values_list(
+            "ingest_id", "id"
+        )
+
+        return {keys[key]: (review_id, None) for key, review_id in stored}
+
+
+def process_batch(queue, batch_size):
+    """Inserts a batch of queued reviews and returns how many were claimed
+
+    A batch failing on a constraint, for example because a company was
+    deleted after the review was accepted, is retried review by review and
+    the offending reviews are marked as failed. Other errors leave the whole
+    batch pending.
+    """
+
+    entries = queue.claim(batch_size)
+
+    if not entries:
+        return 0
+
+    try:
+        try:
+            results = store_reviews(entries)
+
+        except IntegrityError:
+            results = {}
+
+            for entry in entries:
+                try:
+                    results.update(store_reviews([entry]))
+
+                except IntegrityError as error:
+                    results[entry[0]] = (None, str(error))
+
+    except Exception:
+        queue.release([tracking_id for tracking_id, _ in entries])
+        raise
+
+    queue.finish(results)
+
+    return len(entries)
+
+
+def drain(queue=None, batch_size=None, timeout=None):
+    """Processes pending reviews until none is left or the time is up"""
+
+    queue = queue or get_queue()
+    batch_size = batch_size or settings.REVIEWS_INGEST_BATCH_SIZE
+    deadline = None if timeout is None else time.monotonic() + timeout
+    processed = 0
+
+    while deadline is None or time.monotonic() < deadline:
+        claimed = process_batch(queue, batch_size)
+
+        if not claimed:
+            break
+
+        processed += claimed
+
+    return processed
+
+
+class IngestWorker(threading.Thread):
+    """Background thread inserting queued reviews
+
+    Stopping the worker drains the queue for at most the configured drain
+    timeout, whatever is left stays queued for the next worker.
+    """
+
+    def __init__(self, queue, batch_size=None):
+        """Prepares a worker for a queue"""
+
+        super().__init__(name="review-ingest", daemon=True)
+        self.queue = queue
+        self.batch_size = batch_size or settings.REVIEWS_INGEST_BATCH_SIZE
+        self.stopping = threading.Event()
+        self.wakeup = threading.Event()
+        self.last_purge = 0
+
+    def run(self):
+        """Processes batches until stopped"""
+
+        try:
+            while not self.stopping.is_set():
+                close_old_connections()
+
+                try:
+                    claimed = process_batch(self.queue, self.batch_size)
+
+                except Exception:
+                    # The batch stays pending, it is retried after the poll
+                    # interval, for example once the database is back
+                    logger.exception("Could not insert queued reviews")
+                    claimed = 0
+
+                if not claimed:
+                    self.purge()
+                    self.wakeup.wait(settings.REVIEWS_INGEST_POLL_INTERVAL)
+                    self.wakeup.clear()
+
+            drain(
+                self.queue,
+                self.batch_size,
+                settings.REVIEWS_INGEST_DRAIN_TIMEOUT,
+            )
+
+        finally:
+            connection.close()
+            self.queue.close()
+
+    def purge(self):
+        """Deletes old finished entries every few minutes"""
+
+        if time.monotonic() - self.last_purge > 300:
+            self.queue.purge(settings.REVIEWS_INGEST_RETENTION)
+            self.last_purge = time.monotonic()
+
+    def notify(self):
+        """Wakes the worker up after reviews were queued"""
+
+        self.wakeup.set()
+
+    def stop(self, timeout=None):
+        """Stops the worker once it drained the queue"""
+
+        self.stopping.set()
+        self.wakeup.set()
+        self.join(timeout)
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def start_worker():
+    """Starts the worker of this process if it is not running"""
+
+    global _worker
+
+    queue = get_queue()
+
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = IngestWorker(queue)
+            _worker.start()
+
+        _worker.notify()
+
+
+def stop_worker():
+    """Stops the worker of this process, draining the queue first"""
+
+    global _worker
+
+    with _worker_lock:
+        worker, _worker = _worker, None
+
+    if worker is not None and worker.is_alive():
+        worker.stop(settings.REVIEWS_INGEST_DRAIN_TIMEOUT + 5)
+
+
+# Runs when the server process exits, after its request threads finished
+atexit.register(stop_worker)
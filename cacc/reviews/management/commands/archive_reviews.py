@@ -0,0 +1,67 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from ... import archive
+
+
+class Command(BaseCommand):
+    """Moves old reviews to the archive"""
+
+    help = (
+        "Moves the reviews older than a cutoff out of the review table into "
+        "the archive, in batches, where they stay readable by id"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        cutoff = parser.add_mutually_exclusive_group(required=True)
+        cutoff.add_argument(
+            "--before",
+            help="Archive the reviews of the days before this ISO date",
+        )
+        cutoff.add_argument(
+            "--older-than",
+            type=int,
+            metavar="DAYS",
+            help="Archive the reviews of the days before this many days ago",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Moves the reviews a batch at a time, oldest first"""
+
+        if options["before"] is not None:
+            try:
+                before = parse_date(options["before"])
+
+            except ValueError:
+                before = None
+
+            if before is None:
+                raise CommandError("--before must be a date like 2020-01-31")
+
+        else:
+            before = timezone.now() - timedelta(days=options["older_than"])
+
+        cutoff = archive.get_cutoff(before)
+        start = time.perf_counter()
+        moved = 0
+
+        while True:
+            count = archive.archive_batch(cutoff, options["batch_size"])
+
+            if not count:
+                break
+
+            moved += count
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Archived {moved} reviews dated before {cutoff.isoformat()} "
+            f"in {elapsed:.1f}s"
+        )
@@ -0,0 +1,133 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models.functions import Length
+from rest_framework.renderers import JSONRenderer
+
+from ... import compression, models
+from ...api import renderers
+from ...api.v1 import records
+from ...api.v1.pagination import KEYSET_ORDERING
+
+# Levels compared for each encoding
+LEVELS = {compression.GZIP: range(1, 10), compression.BROTLI: range(0, 12)}
+
+
+class Command(BaseCommand):
+    """Compares the JSON encoders and compression levels on review pages"""
+
+    help = (
+        "Renders pages of the review list as the API does and reports the "
+        "size and CPU time of each JSON encoder and compression level"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        parser.add_argument("--pages", type=int, default=10)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument(
+            "--longest",
+            action="store_true",
+            help="Use the reviews with the longest summaries",
+        )
+
+    def handle(self, *args, **options):
+        """Runs the benchmark"""
+
+        pages = self.load_pages(options)
+
+        if not pages:
+            raise CommandError("There are no reviews to render")
+
+        encoders = [("json", JSONRenderer())]
+
+        if renderers.orjson is not None:
+            encoders.append(("orjson", renderers.FastJSONRenderer()))
+
+        self.stdout.write(f"{'encoder':<10}{'ms/page':>10}")
+        bodies = None
+
+        for name, renderer in encoders:
+            rendered = [renderer.render(page) for page in pages]
+
+            if bodies is not None and rendered != bodies:
+                raise CommandError(f"{name} renders different bytes")
+
+            bodies = rendered
+            seconds = self.time(
+                lambda: [renderer.render(page) for page in pages], options
+            )
+            self.stdout.write(
+                f"{name:<10}{seconds * 1000 / len(pages):>10.2f}"
+            )
+
+        raw = sum(len(body) for body in bodies)
+        self.stdout.write(
+            f"\n{len(pages)} pages of {raw / len(pages) / 1024:.1f} KB\n"
+        )
+        self.stdout.write(
+            f"{'encoding':<10}{'level':>6}{'KB/page':>10}{'ratio':>8}"
+            f"{'ms/page':>10}{'MB/s':>8}"
+        )
+
+        for encoding in compression.get_encodings():
+            for level in LEVELS[encoding]:
+                size = sum(
+                    len(compression.compress(body, encoding, level))
+                    for body in bodies
+                )
+                seconds = self.time(
+                    lambda: [
+                        compression.compress(body, encoding, level)
+                        for body in bodies
+                    ],
+                    options,
+                )
+                self.stdout.write(
+                    f"{encoding:<10}{level:>6}"
+                    f"{size / len(pages) / 1024:>10.1f}"
+                    f"{raw / size:>8.2f}"
+                    f"{seconds * 1000 / len(pages):>10.2f}"
+                    f"{raw / seconds / 1e6:>8.0f}"
+                )
+
+    def load_pages(self, options):
+        """Builds the data of review list pages as the API sends them"""
+
+        queryset = models.CompanyReview.objects.all()
+
+        if options["longest"]:
+            queryset = queryset.order_by(Length("summary").desc(), "-id")
+
+        else:
+            queryset = queryset.order_by(*KEYSET_ORDERING)
+
+        size = options["page_size"]
+        rows = list(records.review_rows(queryset)[: options["pages"] * size])
+        count = queryset.count()
+
+        return [
+            {
+                "count": count,
+                "next": None,
+                "previous": None,
+                "results": records.review_record_list(
+                    rows[start : start + size]
+                ),
+            }
+            for start in range(0, len(rows), size)
+        ]
+
+    def time(self, function, options):
+        """Returns the best wall time of several runs of a function"""
+
+        timings = []
+
+        for _ in range(options["repeat"]):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+
+        return min(timings)
@@ -0,0 +1,146 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ... import cache, models
+from ...api.v1.pagination import KEYSET_ORDERING, keyset_page
+
+
+class Command(BaseCommand):
+    """Compares limit/offset and keyset pagination at different depths"""
+
+    help = (
+        "Times the first and a deep page of the review list using "
+        "limit/offset and keyset pagination"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        parser.add_argument("--page", type=int, default=10000)
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--reviewer",
+            type=int,
+            default=None,
+            help="Time the non-staff path for this reviewer id",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Insert this many reviews before running",
+        )
+
+    def handle(self, *args, **options):
+        """Runs the benchmark"""
+
+        page_size = options["page_size"]
+        deep_page = options["page"]
+
+        if options["seed"]:
+            self.seed(options["seed"], page_size * 10)
+
+        queryset = models.CompanyReview.objects.all()
+
+        if options["reviewer"] is not None:
+            queryset = queryset.filter(reviewer_id=options["reviewer"])
+
+        ordered = queryset.order_by(*KEYSET_ORDERING)
+        deep_offset = (deep_page - 1) * page_size
+
+        # Find the keyset position of the deep page outside the timings
+        position = ordered.values_list("date", "id")[
+            deep_offset - 1 : deep_offset
+        ]
+        position = list(position)
+
+        if not position:
+            raise CommandError(
+                f"Page {deep_page} does not exist, seed at least "
+                f"{deep_offset + page_size} reviews"
+            )
+
+        date, pk = position[0]
+
+        results = [
+            (
+                "offset",
+                1,
+                self.time(lambda: list(ordered[:page_size]), options),
+            ),
+            (
+                "offset",
+                deep_page,
+                self.time(
+                    lambda: list(
+                        ordered[deep_offset : deep_offset + page_size]
+                    ),
+                    options,
+                ),
+            ),
+            (
+                "keyset",
+                1,
+                self.time(
+                    lambda: keyset_page(queryset, size=page_size), options
+                ),
+            ),
+            (
+                "keyset",
+                deep_page,
+                self.time(
+                    lambda: keyset_page(queryset, date, pk, size=page_size),
+                    options,
+                ),
+            ),
+        ]
+
+        self.stdout.write(f"{'mode':<8}{'page':>10}{'best ms':>12}")
+
+        for mode, page, seconds in results:
+            self.stdout.write(f"{mode:<8}{page:>10}{seconds * 1000:>12.2f}")
+
+    def time(self, function, options):
+        """Returns the best wall time of several runs of a function"""
+
+        timings = []
+
+        for _ in range(options["repeat"]):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+
+        return min(timings)
+
+    def seed(self, count, batch_size):
+        """Inserts benchmark reviews in batches"""
+
+        company, _ = models.Company.objects.get_or_create(
+            name="Benchmark company"
+        )
+        reviewer, _ = models.Reviewer.objects.get_or_create(
+            username="benchmark"
+        )
+
+        for start in range(0, count, batch_size):
+            models.CompanyReview.objects.bulk_create(
+                models.CompanyReview(
+                    reviewer=reviewer,
+                    company=company,
+                    rating=1 + index % 5,
+                    title=f"Title {index}",
+                    summary=f"Summary {index}",
+                    ip_address="127.0.0.1",
+                )
+                for index in range(start, min(start + batch_size, count))
+            )
+
+        # bulk_create bypasses the signals maintaining aggregates and caches
+        models.CompanyRatingStats.objects.rebuild([company.pk])
+        models.CompanyDailyRating.objects.invalidate()
+        cache.invalidate(models.CompanyReview._meta.label)
+        cache.drop_counts(models.CompanyReview._meta.label)
+
+        self.stdout.write(f"Inserted {count} reviews")
@@ -0,0 +1,143 @@
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from ... import models
+from ...benchmark.replay import percentile
+
+
+class Command(BaseCommand):
+    """Compares the throughput of running WSGI and ASGI servers"""
+
+    help = (
+        "Sends the review list to a WSGI and an ASGI server from many "
+        "concurrent slow clients and reports throughput and latencies"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        parser.add_argument(
+            "--wsgi-url",
+            default="http://127.0.0.1:8000/api/v1/reviews/?limit=20",
+        )
+        parser.add_argument(
+            "--asgi-url",
+            default="http://127.0.0.1:8001/api/v1/async/reviews/?limit=20",
+        )
+        parser.add_argument("--clients", type=int, default=500)
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=4,
+            help="Requests sent one after another by every client",
+        )
+        parser.add_argument(
+            "--delay",
+            type=float,
+            default=0.2,
+            help="Seconds a client waits between the halves of a request",
+        )
+        parser.add_argument(
+            "--username",
+            default=None,
+            help="Authenticate as this user instead of the first staff user",
+        )
+
+    def handle(self, *args, **options):
+        """Runs the benchmark against both servers"""
+
+        users = models.Reviewer.objects.all()
+
+        if options["username"]:
+            user = users.filter(username=options["username"]).first()
+
+        else:
+            user = users.filter(is_staff=True).first()
+
+        if user is None:
+            raise CommandError("No user to authenticate as")
+
+        token = str(RefreshToken.for_user(user).access_token)
+
+        self.stdout.write(
+            f"{'server':<8}{'ok':>8}{'errors':>8}{'req/s':>10}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        )
+
+        for name in ("wsgi", "asgi"):
+            url = options[f"{name}_url"]
+            latencies, errors, elapsed = asyncio.run(
+                self.run(url, token, options)
+            )
+            latencies.sort()
+            self.stdout.write(
+                f"{name:<8}{len(latencies):>8}{errors:>8}"
+                f"{len(latencies) / elapsed:>10.1f}"
+                f"{percentile(latencies, 0.50) * 1000:>10.1f}"
+                f"{percentile(latencies, 0.95) * 1000:>10.1f}"
+                f"{percentile(latencies, 0.99) * 1000:>10.1f}"
+            )
+
+    async def run(self, url, token, options):
+        """Runs every client against a server"""
+
+        parts = urlsplit(url)
+
+        if parts.scheme != "http":
+            raise CommandError(f"Only plain HTTP URLs are supported: {url}")
+
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+        request = (
+            f"GET {target} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"Authorization: Bearer {token}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii")
+        latencies = []
+        failures = []
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                self.client(parts, request, options, latencies, failures)
+                for _ in range(options["clients"])
+            )
+        )
+
+        return latencies, len(failures), time.perf_counter() - start
+
+    async def client(self, parts, request, options, latencies, failures):
+        """Sends requests one after another, each split in two halves"""
+
+        half = len(request) // 2
+
+        for _ in range(options["requests"]):
+            start = time.perf_counter()
+
+            try:
+                reader, writer = await asyncio.open_connection(
+                    parts.hostname, parts.port or 80
+                )
+                writer.write(request[:half])
+                await writer.drain()
+                await asyncio.sleep(options["delay"])
+                writer.write(request[half:])
+                await writer.drain()
+
+                status_line = await reader.readline()
+                await reader.read()
+                writer.close()
+
+            except OSError as error:
+                failures.append(error)
+                continue
+
+            if status_line.split()[1:2] != [b"200"]:
+                failures.append(status_line)
+                continue
+
+            latencies.append(time.perf_counter() - start)
@@ -0,0 +1,106 @@
+import contextlib
+import sys
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, connection
+
+from ... import bulkload, models
+
+
+class Command(BaseCommand):
+    """Loads companies, reviewers and reviews from large files"""
+
+    help = (
+        "Streams records from JSON fixtures, NDJSON or CSV files into the "
+        "database in batches, much faster than loaddata"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            help="Files to load in order, - reads the standard input",
+        )
+        parser.add_argument(
+            "--format",
+            choices=sorted(set(bulkload.FORMATS.values())),
+            help="Format of the files, guessed from their extension",
+        )
+        parser.add_argument(
+            "--model",
+            choices=sorted(bulkload.MODELS),
+            help="Model of the records that do not name one",
+        )
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument(
+            "--drop-indexes",
+            action="store_true",
+            help="Drop the review and search indexes during the load and "
+            "rebuild them at the end",
+        )
+
+    def handle(self, *args, **options):
+        """Loads every file then rebuilds the derived data"""
+
+        model = options["model"] and bulkload.MODELS[options["model"]]
+        loader = bulkload.Loader(connection, options["batch_size"])
+        start = time.perf_counter()
+
+        if options["drop_indexes"]:
+            indexes = bulkload.indexes_dropped(connection)
+
+        else:
+            indexes = contextlib.nullcontext()
+
+        try:
+            with indexes:
+                try:
+                    for path in options["paths"]:
+                        self.load_file(loader, path, options["format"], model)
+
+                finally:
+                    self.report(loader, time.perf_counter() - start)
+
+                loaded = time.perf_counter()
+
+            loader.finish()
+
+        except (ValueError, ValidationError, DatabaseError) as error:
+            raise CommandError(error)
+
+        self.stdout.write(
+            f"Rebuilt the indexes and aggregates in "
+            f"{time.perf_counter() - loaded:.1f}s"
+        )
+
+    def load_file(self, loader, path, file_format, model):
+        """Loads the records of one file"""
+
+        if path == "-":
+            if file_format is None:
+                raise CommandError("Reading the standard input needs --format")
+
+            loader.load(bulkload.read_records(sys.stdin, file_format), model)
+            return
+
+        file_format = file_format or bulkload.get_format(path)
+
+        with open(path, newline="", encoding="utf-8") as stream:
+            loader.load(bulkload.read_records(stream, file_format), model)
+
+    def report(self, loader, elapsed):
+        """Writes the number of rows loaded and the load rate"""
+
+        counts = loader.counts
+        rows = sum(counts.values())
+
+        self.stdout.write(
+            f"Loaded {counts[models.Company]} companies, "
+            f"{counts[models.Reviewer]} reviewers and "
+            f"{counts[models.CompanyReview]} reviews in {elapsed:.1f}s "
+            f"({rows / max(elapsed, 1e-6):.0f} rows/s)"
+        )
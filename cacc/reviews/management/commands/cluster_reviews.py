@@ -0,0 +1,84 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ... import duplicates, models
+
+
+class Command(BaseCommand):
+    """Indexes the summaries of reviews and reports near-duplicates"""
+
+    help = (
+        "Stores the MinHash signatures of the reviews indexed by no earlier "
+        "run, flags their near-duplicates and lists the clusters of similar "
+        "reviews"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--rebuild",
+            action="store_true",
+            help="Drop every stored signature and index all reviews again",
+        )
+        parser.add_argument(
+            "--min-size",
+            type=int,
+            default=2,
+            help="Smallest cluster listed",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=20,
+            help="Largest number of clusters listed",
+        )
+
+    def handle(self, *args, **options):
+        """Indexes the reviews in batches, oldest first, then clusters them"""
+
+        if options["rebuild"]:
+            models.ReviewBucket.objects.all().delete()
+            models.ReviewSignature.objects.all().delete()
+
+        batch_size = options["batch_size"]
+        reviews = (
+            models.CompanyReview.objects.filter(signature__isnull=True)
+            .order_by("id")
+            .only("id", "summary")
+        )
+        start = time.perf_counter()
+        indexed = 0
+        flagged = 0
+        last_id = 0
+
+        while True:
+            batch = list(reviews.filter(id__gt=last_id)[:batch_size])
+
+            if not batch:
+                break
+
+            last_id = batch[-1].pk
+
+            with transaction.atomic():
+                flagged += duplicates.index_reviews(batch)
+
+            indexed += len(batch)
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Indexed {indexed} reviews in {elapsed:.1f}s, "
+            f"{flagged} flagged as near-duplicates"
+        )
+
+        clusters = duplicates.find_clusters(options["min_size"])
+        self.stdout.write(f"Found {len(clusters)} clusters")
+
+        for members in clusters[: options["limit"]]:
+            shown = ", ".join(str(review_id) for review_id in members[:10])
+            hidden = len(members) - 10
+            more = f" and {hidden} more" if hidden > 0 else ""
+            self.stdout.write(f"{len(members)} reviews: {shown}{more}")
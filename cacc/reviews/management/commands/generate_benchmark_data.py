@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ...benchmark import data
+
+
+class Command(BaseCommand):
+    """Fills the database with synthetic benchmark data"""
+
+    help = (
+        "Inserts companies, reviewers and reviews where a few companies and "
+        "reviewers hold most of the reviews"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        parser.add_argument("--companies", type=int, default=10000)
+        parser.add_argument("--reviewers", type=int, default=100000)
+        parser.add_argument("--reviews", type=int, default=1000000)
+        parser.add_argument(
+            "--skew",
+            type=float,
+            default=1.1,
+            help="Zipf exponent of the reviews per company",
+        )
+        parser.add_argument(
+            "--reviewer-skew",
+            type=float,
+            default=0.8,
+            help="Zipf exponent of the reviews per reviewer",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=365,
+            help="Spread the review dates over this many past days",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        """Generates the data"""
+
+        start = time.perf_counter()
+
+        try:
+            counts = data.generate(
+                options["companies"],
+                options["reviewers"],
+                options["reviews"],
+                skew=options["skew"],
+                reviewer_skew=options["reviewer_skew"],
+                days=options["days"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+            )
+
+        except ValueError as error:
+            raise CommandError(error)
+
+        elapsed = time.perf_counter() - start
+        rows = sum(counts.values())
+
+        self.stdout.write(
+            f"Inserted {counts['companies']} companies, "
+            f"{counts['reviewers']} reviewers and {counts['reviews']} "
+            f"reviews in {elapsed:.1f}s ({rows / elapsed:.0f} rows/s)"
+        )
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from ... import addresses, models
+
+
+class Command(BaseCommand):
+    """Fills in the packed addresses of existing reviews"""
+
+    help = (
+        "Stores the packed form of the submitter address of the reviews "
+        "saved without one, which the address range filters use"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """Walks the reviews without a packed address in batches"""
+
+        batch_size = options["batch_size"]
+        reviews = (
+            models.CompanyReview.objects.filter(ip_packed__isnull=True)
+            .order_by("id")
+            .only("id", "ip_address")
+        )
+        packed = 0
+        invalid = 0
+        last_id = 0
+
+        while True:
+            batch = list(reviews.filter(id__gt=last_id)[:batch_size])
+
+            if not batch:
+                break
+
+            last_id = batch[-1].pk
+            changed = []
+
+            for review in batch:
+                review.ip_packed = addresses.pack(review.ip_address)
+
+                if review.ip_packed is None:
+                    invalid += 1
+
+                else:
+                    changed.append(review)
+
+            with transaction.atomic():
+                models.CompanyReview.objects.bulk_update(
+                    changed, ["ip_packed"]
+                )
+
+            packed += len(changed)
+
+        self.stdout.write(
+            f"Packed the addresses of {packed} reviews, "
+            f"{invalid} invalid addresses left out"
+        )
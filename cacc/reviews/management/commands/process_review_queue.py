@@ -0,0 +1,61 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from ... import ingest
+
+
+class Command(BaseCommand):
+    """Inserts the reviews waiting in the ingestion queue"""
+
+    help = (
+        "Runs the ingestion queue worker in the foreground until it is "
+        "interrupted, draining the queue before exiting"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Drain the pending reviews and exit",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Reviews inserted per bulk_create call",
+        )
+
+    def handle(self, *args, **options):
+        """Processes the queue until stopped"""
+
+        queue = ingest.get_queue()
+
+        if options["once"]:
+            processed = ingest.drain(queue, options["batch_size"])
+            self.stdout.write(f"Processed {processed} queued reviews")
+            return
+
+        worker = ingest.IngestWorker(queue, options["batch_size"])
+        stopped = threading.Event()
+
+        def stop(signum, frame):
+            """Asks the worker to drain the queue and stop"""
+
+            stopped.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        worker.start()
+        self.stdout.write("Processing the review queue, stop with Ctrl-C")
+
+        while not stopped.wait(1):
+            if not worker.is_alive():
+                break
+
+        self.stdout.write("Draining the review queue")
+        worker.stop()
+        self.stdout.write(f"Queue: {queue.counts()}")
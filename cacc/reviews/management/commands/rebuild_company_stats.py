@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ... import models
+
+
+class Command(BaseCommand):
+    """Rebuilds or verifies the per-company rating aggregates"""
+
+    help = (
+        "Recomputes the rating aggregates of every company from its reviews "
+        "and fixes the stored values that drifted"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--verify",
+            action="store_true",
+            help="Report drifted aggregates without fixing them",
+        )
+
+    def handle(self, *args, **options):
+        """Walks the companies in batches"""
+
+        batch_size = options["batch_size"]
+        verify = options["verify"]
+        company_ids = models.Company.objects.order_by("id").values_list(
+            "id", flat=True
+        )
+        checked = 0
+        drifted = 0
+        last_id = 0
+
+        while True:
+            batch = list(company_ids.filter(id__gt=last_id)[:batch_size])
+
+            if not batch:
+                break
+
+            last_id = batch[-1]
+            checked += len(batch)
+            drifted += self.process(batch, verify)
+
+        self.stdout.write(
+            f"Checked {checked} companies, {drifted} with drifted aggregates"
+        )
+
+        if verify and drifted:
+            raise CommandError("Company rating aggregates are out of date")
+
+    def process(self, company_ids, verify):
+        """Compares and fixes the aggregates of a batch of companies"""
+
+        with transaction.atomic():
+            manager = models.CompanyRatingStats.objects
+            stored = manager.select_for_update().in_bulk(company_ids)
+            computed = manager.compute(company_ids)
+            missing = [
+                stats
+                for company_id, stats in computed.items()
+                if company_id not in stored and stats.review_count
+            ]
+            changed = [
+                stats
+                for company_id, stats in computed.items()
+                if company_id in stored
+                and stats.differs_from(stored[company_id])
+            ]
+
+            for stats in missing + changed:
+                self.stderr.write(
+                    f"Company {stats.company_id}: "
+                    f"{stats.review_count} reviews, "
+                    f"rating sum {stats.rating_sum}"
+                )
+
+            if not verify:
+                manager.bulk_create(missing)
+                manager.bulk_update(changed, models.CompanyRatingStats.FIELDS)
+
+        return len(missing) + len(changed)
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from ... import models
+
+
+class Command(BaseCommand):
+    """Refreshes the daily rating rollup of companies"""
+
+    help = (
+        "Recomputes the company days whose reviews changed since the last "
+        "refresh, or the whole rollup the first time"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        parser.add_argument(
+            "--full",
+            action="store_true",
+            help="Rebuild every day instead of the changed ones",
+        )
+
+    def handle(self, *args, **options):
+        """Refreshes the rollup up to the settled reviews"""
+
+        count, until = models.CompanyDailyRating.objects.refresh(
+            full=options["full"]
+        )
+        self.stdout.write(
+            f"Refreshed {count} company days up to {until.isoformat()}"
+        )
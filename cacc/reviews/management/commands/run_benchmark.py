@@ -0,0 +1,83 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from ...benchmark import mix, replay
+
+
+class Command(BaseCommand):
+    """Replays a request mix and reports the latencies as JSON"""
+
+    help = (
+        "Sends a weighted mix of requests to every route through the test "
+        "client or to a running server and writes a JSON report"
+    )
+
+    def add_arguments(self, parser):
+        """Adds the command arguments"""
+
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument(
+            "--mix",
+            default=None,
+            help="JSON file holding the request mix, see reviews.benchmark",
+        )
+        parser.add_argument(
+            "--url",
+            default=None,
+            help="Send the requests to a server at this URL",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Concurrent requests, only with --url",
+        )
+        parser.add_argument("--warmup", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--output", default=None, help="Write the report to this file"
+        )
+
+    def handle(self, *args, **options):
+        """Runs the benchmark"""
+
+        if options["concurrency"] > 1 and not options["url"]:
+            raise CommandError("--concurrency needs a server, pass --url")
+
+        try:
+            requests = mix.load_mix(options["mix"])
+            users = replay.get_users()
+
+            if options["url"]:
+                transport = replay.ServerTransport(options["url"], users)
+
+            else:
+                transport = replay.ClientTransport(users)
+
+        except ValueError as error:
+            raise CommandError(error)
+
+        sampler = mix.Sampler(
+            requests, replay.get_tokens(users["staff"]), options["seed"]
+        )
+        # Two users send every request, far faster than the submission
+        # limits allow, a server under benchmark should lift them as well
+        with override_settings(REVIEWS_THROTTLE_RATES={}):
+            report = replay.replay(
+                transport,
+                sampler,
+                options["requests"],
+                concurrency=options["concurrency"],
+                warmup=options["warmup"],
+            )
+        report["seed"] = options["seed"]
+        output = json.dumps(report, indent=2)
+
+        if options["output"]:
+            with open(options["output"], "w") as report_file:
+                report_file.write(output + "\n")
+
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,251 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from . import compression, perf, routers
+
+
+class PerformanceMiddleware:
+    """Records the timings and queries of a sample of the requests
+
+    Sampled responses carry a Server-Timing header and their timings are
+    added to the histograms of their route. The middleware runs natively
+    under both WSGI and ASGI, so async views stay async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Keeps the next handler of the chain"""
+
+        self.get_response = get_response
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Handles a request, recording it if it is sampled"""
+
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not self.sampled():
+            return self.get_response(request)
+
+        recorder = perf.Recorder()
+        token = perf.CURRENT.set(recorder)
+
+        try:
+            response = self.get_response(request)
+
+        finally:
+            perf.CURRENT.reset(token)
+
+        return self.finish(request, response, recorder)
+
+    async def __acall__(self, request):
+        """Handles a request from async code"""
+
+        if not self.sampled():
+            return await self.get_response(request)
+
+        recorder = perf.Recorder()
+        token = perf.CURRENT.set(recorder)
+
+        try:
+            response = await self.get_response(request)
+
+        finally:
+            perf.CURRENT.reset(token)
+
+        return self.finish(request, response, recorder)
+
+    def sampled(self):
+        """Tells whether the current request is recorded"""
+
+        rate = settings.REVIEWS_PERF_SAMPLE_RATE
+
+        return rate >= 1 or (rate > 0 and random.random() < rate)
+
+    def process_template_response(self, request, response):
+        """Times the rendering of a template or API response"""
+
+        recorder = perf.CURRENT.get()
+
+        if recorder is not None:
+            start = time.perf_counter()
+            response.add_post_render_callback(
+                lambda rendered: recorder.add(
+                    "render", time.perf_counter() - start
+                )
+            )
+
+        return response
+
+    def finish(self, request, response, recorder):
+        """Adds the timings to the response and to the route metrics"""
+
+        recorder.finish()
+        match = request.resolver_match
+        view_name = match.view_name if match is not None else "unresolved"
+        perf.METRICS.observe(f"{request.method} {view_name}", recorder)
+        response["Server-Timing"] = recorder.header()
+
+        return response
+
+
+class ReplicaPinMiddleware:
+    """Keeps the reads of a user on the primary for a while after a write
+
+    Each request starts reading from the primary, views opting in to read
+    replicas switch to one once their user is known.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Keeps the next handler of the chain"""
+
+        self.get_response = get_response
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Handles a request, pinning its user if it wrote"""
+
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = routers.CURRENT.set(None)
+
+        try:
+            response = self.get_response(request)
+
+        finally:
+            routers.CURRENT.reset(token)
+
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        """Handles a request from async code"""
+
+        token = routers.CURRENT.set(None)
+
+        try:
+            response = await self.get_response(request)
+
+        finally:
+            routers.CURRENT.reset(token)
+
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        """Pins the user of a successful write"""
+
+        if (
+            request.method not in routers.SAFE_METHODS
+            and response.status_code < 400
+        ):
+            user = getattr(request, "user", None)
+
+            if user is not None and user.is_authenticated:
+                routers.pin(user)
+
+        return response
+
+
+class CompressionMiddleware:
+    """Compresses responses with brotli or gzip, as the client accepts
+
+    JSON and text responses of at least ``REVIEWS_COMPRESSION_MIN_SIZE``
+    bytes are compressed, and streamed responses chunk by chunk whatever
+    their size. Compressing a whole response counts in the render time of
+    the request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        """Keeps the next handler of the chain"""
+
+        self.get_response = get_response
+
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Handles a request, compressing its response"""
+
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        return self.finish(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        """Handles a request from async code"""
+
+        return self.finish(request, await self.get_response(request))
+
+    def finish(self, request, response):
+        """Compresses the response in the encoding the client prefers"""
+
+        if (
+            not settings.REVIEWS_COMPRESSION
+            or response.has_header("Content-Encoding")
+            or not compression.is_compressible(
+                response.get("Content-Type", "")
+            )
+        ):
+            return response
+
+        if not response.streaming and (
+            len(response.content) < settings.REVIEWS_COMPRESSION_MIN_SIZE
+        ):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = compression.choose_encoding(
+            request.META.get("HTTP_ACCEPT_ENCODING", "")
+        )
+
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            chunks = response.streaming_content
+
+            if getattr(response, "is_async", False):
+                chunks = compression.acompress_chunks(chunks, encoding)
+
+            else:
+                chunks = compression.compress_chunks(chunks, encoding)
+
+            response.streaming_content = chunks
+            del response["Content-Length"]
+
+        else:
+            with perf.timed("render"):
+                content = compression.compress(response.content, encoding)
+
+            if len(content) >= len(response.content):
+                return response
+
+            response.content = content
+            response["Content-Length"] = str(len(content))
+
+        # The compressed body differs byte for byte from the original one
+        etag = response.get("ETag")
+
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+
+        response["Content-Encoding"] = encoding
+
+        return response
@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reviews", "0002_companyreview"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="companyreview",
+            index=models.Index(
+                fields=["date", "id"], name="review_date_id_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="companyreview",
+            index=models.Index(
+                fields=["reviewer", "date", "id"],
+                name="review_reviewer_date_id_idx",
+            ),
+        ),
+    ]
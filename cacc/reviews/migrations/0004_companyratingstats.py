@@ -0,0 +1,87 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def build_stats(apps, schema_editor):
+    """Builds the aggregates for the existing reviews"""
+
+    CompanyReview = apps.get_model("reviews", "CompanyReview")
+    CompanyRatingStats = apps.get_model("reviews", "CompanyRatingStats")
+
+    histogram = {
+        f"rating_{rating}": models.Count("id", filter=models.Q(rating=rating))
+        for rating in range(1, 6)
+    }
+    rows = (
+        CompanyReview.objects.order_by()
+        .values("company_id")
+        .annotate(
+            review_count=models.Count("id"),
+            rating_sum=models.Sum("rating"),
+            **histogram,
+        )
+    )
+
+    CompanyRatingStats.objects.bulk_create(
+        (CompanyRatingStats(**row) for row in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reviews", "0003_review_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CompanyRatingStats",
+            fields=[
+                (
+                    "company",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="rating_stats",
+                        serialize=False,
+                        to="reviews.company",
+                        verbose_name="Company",
+                    ),
+                ),
+                (
+                    "review_count",
+                    models.IntegerField(
+                        default=0, verbose_name="Review count"
+                    ),
+                ),
+                (
+                    "rating_sum",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Rating sum"
+                    ),
+                ),
+                (
+                    "rating_1",
+                    models.IntegerField(default=0, verbose_name="1 star"),
+                ),
+                (
+                    "rating_2",
+                    models.IntegerField(default=0, verbose_name="2 stars"),
+                ),
+                (
+                    "rating_3",
+                    models.IntegerField(default=0, verbose_name="3 stars"),
+                ),
+                (
+                    "rating_4",
+                    models.IntegerField(default=0, verbose_name="4 stars"),
+                ),
+                (
+                    "rating_5",
+                    models.IntegerField(default=0, verbose_name="5 stars"),
+                ),
+            ],
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from reviews import search
+
+
+def install_search_index(apps, schema_editor):
+    """Creates the full-text search index"""
+
+    search.install(schema_editor.connection)
+
+
+def uninstall_search_index(apps, schema_editor):
+    """Removes the full-text search index"""
+
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reviews", "0004_companyratingstats"),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
@@ -0,0 +1,18 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reviews", "0005_review_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="companyreview",
+            name="ingest_id",
+            field=models.UUIDField(
+                blank=True, editable=False, null=True, unique=True
+            ),
+        ),
+    ]
@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reviews", "0006_review_ingest_id"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="companyreview",
+            index=models.Index(
+                fields=["company", "date", "id"],
+                name="review_company_date_id_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="companyreview",
+            index=models.Index(
+                fields=["company", "rating", "date", "id"],
+                name="review_company_rating_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="companyreview",
+            index=models.Index(
+                fields=["rating", "date", "id"],
+                name="review_rating_date_id_idx",
+            ),
+        ),
+    ]
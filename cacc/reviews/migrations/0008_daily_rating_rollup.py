@@ -0,0 +1,109 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reviews", "0007_review_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DailyRatingChange",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("company_id", models.IntegerField()),
+                ("day", models.DateField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                (
+                    "name",
+                    models.CharField(
+                        max_length=64, primary_key=True, serialize=False
+                    ),
+                ),
+                (
+                    "value",
+                    models.DateTimeField(
+                        null=True, verbose_name="Refreshed until"
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="CompanyDailyRating",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "review_count",
+                    models.IntegerField(
+                        default=0, verbose_name="Review count"
+                    ),
+                ),
+                (
+                    "rating_sum",
+                    models.BigIntegerField(
+                        default=0, verbose_name="Rating sum"
+                    ),
+                ),
+                (
+                    "rating_1",
+                    models.IntegerField(default=0, verbose_name="1 star"),
+                ),
+                (
+                    "rating_2",
+                    models.IntegerField(default=0, verbose_name="2 stars"),
+                ),
+                (
+                    "rating_3",
+                    models.IntegerField(default=0, verbose_name="3 stars"),
+                ),
+                (
+                    "rating_4",
+                    models.IntegerField(default=0, verbose_name="4 stars"),
+                ),
+                (
+                    "rating_5",
+                    models.IntegerField(default=0, verbose_name="5 stars"),
+                ),
+                ("day", models.DateField(verbose_name="Day")),
+                (
+                    "company",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="daily_ratings",
+                        to="reviews.company",
+                        verbose_name="Company",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("company", "day"),
+                        name="daily_rating_company_day",
+                    )
+                ],
+            },
+        ),
+    ]
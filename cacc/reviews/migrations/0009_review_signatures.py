@@ -0,0 +1,73 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reviews", "0008_daily_rating_rollup"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReviewBucket",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "bucket",
+                    models.BigIntegerField(
+                        db_index=True, verbose_name="Bucket"
+                    ),
+                ),
+                (
+                    "review",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="buckets",
+                        to="reviews.companyreview",
+                        verbose_name="Review",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ReviewSignature",
+            fields=[
+                (
+                    "review",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="signature",
+                        serialize=False,
+                        to="reviews.companyreview",
+                        verbose_name="Review",
+                    ),
+                ),
+                ("signature", models.BinaryField(verbose_name="Signature")),
+                (
+                    "similarity",
+                    models.FloatField(null=True, verbose_name="Similarity"),
+                ),
+                (
+                    "duplicate_of",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="+",
+                        to="reviews.companyreview",
+                        verbose_name="Near-duplicate of",
+                    ),
+                ),
+            ],
+        ),
+    ]
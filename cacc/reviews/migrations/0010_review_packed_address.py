@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reviews", "0009_review_signatures"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="companyreview",
+            name="ip_packed",
+            field=models.BinaryField(
+                max_length=16, null=True, verbose_name="Packed address"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="companyreview",
+            index=models.Index(
+                fields=["ip_packed"], name="review_ip_packed_idx"
+            ),
+        ),
+    ]
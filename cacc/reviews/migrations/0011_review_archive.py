@@ -0,0 +1,80 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from reviews import archive
+
+
+def partition_archive(apps, schema_editor):
+    """Partitions the archive by date on PostgreSQL"""
+
+    archive.partition_table(
+        schema_editor, apps.get_model("reviews", "ArchivedReview")
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reviews", "0010_review_packed_address"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ArchivedReview",
+            fields=[
+                ("id", models.IntegerField(primary_key=True, serialize=False)),
+                ("rating", models.IntegerField(verbose_name="Rating")),
+                (
+                    "title",
+                    models.CharField(max_length=64, verbose_name="Title"),
+                ),
+                ("summary", models.TextField(verbose_name="Summary")),
+                (
+                    "ip_address",
+                    models.GenericIPAddressField(
+                        verbose_name="Submitter address"
+                    ),
+                ),
+                (
+                    "ip_packed",
+                    models.BinaryField(
+                        max_length=16, null=True, verbose_name="Packed address"
+                    ),
+                ),
+                ("date", models.DateTimeField(verbose_name="Submission date")),
+                (
+                    "ingest_id",
+                    models.UUIDField(blank=True, editable=False, null=True),
+                ),
+                (
+                    "company",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_reviews",
+                        to="reviews.company",
+                        verbose_name="Company to review",
+                    ),
+                ),
+                (
+                    "reviewer",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="archived_reviews",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Reviewer",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["company", "date"],
+                        name="archived_company_date_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(partition_archive, migrations.RunPython.noop),
+    ]
@@ -1,5 +1,11 @@
-from django.db import models
+import itertools
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.functions import TruncDate
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 Reviewer = get_user_model()
@@ -21,7 +27,9 @@ class CompanyReview(models.Model):
     MIN_RATING_VALUE = 1
     MAX_RATING_VALUE = 5
     MAX_TITLE_LENGTH: int = 64
-    MAX_SUMMARY_LENGTH: int = 10 ** 4
+    MAX_SUMMARY_LENGTH: int = 10**4
+    # Fields the daily rating rollup is computed from
+    ROLLUP_FIELDS = ("company_id", "date", "rating")
 
     reviewer = models.ForeignKey(
         Reviewer,
@@ -40,6 +48,509 @@ class CompanyReview(models.Model):
     ip_address = models.GenericIPAddressField(
         verbose_name=_("Submitter address")
     )
+    # ip_address packed to 16 bytes, see reviews.addresses
+    ip_packed = models.BinaryField(
+        max_length=16,
+        null=True,
+        editable=False,
+        verbose_name=_("Packed address"),
+    )
     date = models.DateTimeField(
         auto_now_add=True, verbose_name=_("Submission date")
     )
+    # Tracking id of reviews accepted through the ingestion queue
+    ingest_id = models.UUIDField(
+        null=True, blank=True, unique=True, editable=False
+    )
+
+    class Meta:
+        """Configuration for this model"""
+
+        indexes = [
+            # Supports keyset pagination over (date, id)
+            models.Index(fields=["date", "id"], name="review_date_id_idx"),
+            models.Index(
+                fields=["reviewer", "date", "id"],
+                name="review_reviewer_date_id_idx",
+            ),
+            # Support the filters of the review list: equality filters lead,
+            # followed by the rating range and the (date, id) ordering
+            models.Index(
+                fields=["company", "date", "id"],
+                name="review_company_date_id_idx",
+            ),
+            models.Index(
+                fields=["company", "rating", "date", "id"],
+                name="review_company_rating_date_idx",
+            ),
+            models.Index(
+                fields=["rating", "date", "id"],
+                name="review_rating_date_id_idx",
+            ),
+            # Serves the address range filters of abuse investigations
+            models.Index(fields=["ip_packed"], name="review_ip_packed_idx"),
+        ]
+
+
+class ArchivedReview(models.Model):
+    """Stores a review moved out of CompanyReview by manage.py archive_reviews
+
+    Archived reviews keep their id and are read-only. On PostgreSQL the
+    table is partitioned by year of the review date, see reviews.archive.
+    """
+
+    # The id of the review in CompanyReview
+    id = models.IntegerField(primary_key=True)
+    reviewer = models.ForeignKey(
+        Reviewer,
+        related_name="archived_reviews",
+        on_delete=models.CASCADE,
+        verbose_name=_("Reviewer"),
+    )
+    company = models.ForeignKey(
+        Company,
+        related_name="archived_reviews",
+        on_delete=models.CASCADE,
+        verbose_name=_("Company to review"),
+    )
+    rating = models.IntegerField(verbose_name=_("Rating"))
+    title = models.CharField(
+        max_length=CompanyReview.MAX_TITLE_LENGTH, verbose_name=_("Title")
+    )
+    summary = models.TextField(verbose_name=_("Summary"))
+    ip_address = models.GenericIPAddressField(
+        verbose_name=_("Submitter address")
+    )
+    ip_packed = models.BinaryField(
+        max_length=16, null=True, verbose_name=_("Packed address")
+    )
+    date = models.DateTimeField(verbose_name=_("Submission date"))
+    ingest_id = models.UUIDField(null=True, blank=True, editable=False)
+
+    class Meta:
+        """Configuration for this model"""
+
+        indexes = [
+            # Serves the aggregates recomputed over the whole history
+            models.Index(
+                fields=["company", "date"], name="archived_company_date_idx"
+            ),
+        ]
+
+    @classmethod
+    def field_names(cls):
+        """Gets the columns copied from CompanyReview"""
+
+        return [field.attname for field in cls._meta.concrete_fields]
+
+
+class RatingAggregates(models.Model):
+    """Stores the number of reviews, their rating sum and histogram"""
+
+    RATINGS = range(
+        CompanyReview.MIN_RATING_VALUE, CompanyReview.MAX_RATING_VALUE + 1
+    )
+    FIELDS = (
+        "review_count",
+        "rating_sum",
+        "rating_1",
+        "rating_2",
+        "rating_3",
+        "rating_4",
+        "rating_5",
+    )
+
+    review_count: int = models.IntegerField(
+        default=0, verbose_name=_("Review count")
+    )
+    rating_sum: int = models.BigIntegerField(
+        default=0, verbose_name=_("Rating sum")
+    )
+    rating_1: int = models.IntegerField(default=0, verbose_name=_("1 star"))
+    rating_2: int = models.IntegerField(default=0, verbose_name=_("2 stars"))
+    rating_3: int = models.IntegerField(default=0, verbose_name=_("3 stars"))
+    rating_4: int = models.IntegerField(default=0, verbose_name=_("4 stars"))
+    rating_5: int = models.IntegerField(default=0, verbose_name=_("5 stars"))
+
+    class Meta:
+        """Configuration for this model"""
+
+        abstract = True
+
+    @classmethod
+    def histogram_field(cls, rating):
+        """Gets the histogram field for a rating, if it has one"""
+
+        if rating in cls.RATINGS:
+            return f"rating_{rating}"
+
+        return None
+
+    @classmethod
+    def aggregations(cls):
+        """Gets the aggregates computing each field over reviews"""
+
+        return {
+            "review_count": models.Count("id"),
+            "rating_sum": models.Sum("rating"),
+            **{
+                cls.histogram_field(rating): models.Count(
+                    "id", filter=models.Q(rating=rating)
+                )
+                for rating in cls.RATINGS
+            },
+        }
+
+    @property
+    def average_rating(self):
+        """Gets the average rating or None when there are no reviews"""
+
+        if not self.review_count:
+            return None
+
+        return self.rating_sum / self.review_count
+
+    @property
+    def histogram(self):
+        """Gets the number of reviews for each rating"""
+
+        return {
+            str(rating): getattr(self, self.histogram_field(rating))
+            for rating in self.RATINGS
+        }
+
+    def differs_from(self, other):
+        """Tells whether two aggregates hold different values"""
+
+        return any(
+            getattr(self, field) != getattr(other, field)
+            for field in self.FIELDS
+        )
+
+
+class CompanyRatingStatsManager(models.Manager):
+    """Maintains the rating aggregates of companies"""
+
+    def record(self, changes):
+        """Applies review changes to the aggregates of their companies
+
+        ``changes`` is an iterable of ``(company_id, rating, delta)`` tuples
+        where ``delta`` is 1 for an added review and -1 for a removed one.
+        Callers are expected to run this inside the transaction that
+        writes the reviews.
+        """
+
+        totals = {}
+
+        for company_id, rating, delta in changes:
+            total = totals.setdefault(company_id, {"review_count": 0})
+            total["review_count"] += delta
+            total["rating_sum"] = total.get("rating_sum", 0) + rating * delta
+
+            histogram_field = self.model.histogram_field(rating)
+
+            if histogram_field is not None:
+                total[histogram_field] = total.get(histogram_field, 0) + delta
+
+        if not totals:
+            return
+
+        with transaction.atomic():
+            self.bulk_create(
+                [self.model(company_id=company_id) for company_id in totals],
+                ignore_conflicts=True,
+            )
+
+            for company_id, total in totals.items():
+                updates = {
+                    field: models.F(field) + value
+                    for field, value in total.items()
+                    if value
+                }
+
+                if updates:
+                    self.filter(company_id=company_id).update(**updates)
+
+    def compute(self, company_ids):
+        """Computes the aggregates of the given companies from their reviews
+
+        Archived reviews are counted as well.
+        """
+
+        computed = {
+            company_id: self.model(company_id=company_id)
+            for company_id in company_ids
+        }
+
+        for reviews in (CompanyReview.objects, ArchivedReview.objects):
+            rows = (
+                reviews.filter(company_id__in=company_ids)
+                .order_by()
+                .values("company_id")
+                .annotate(**self.model.aggregations())
+            )
+
+            for row in rows:
+                stats = computed[row.pop("company_id")]
+
+                for field, value in row.items():
+                    setattr(stats, field, getattr(stats, field) + value)
+
+        return computed
+
+    def rebuild(self, company_ids, batch_size=500):
+        """Recomputes the aggregates of companies from their reviews
+
+        Used after writes sending no signal, such as bulk loads.
+        """
+
+        company_ids = sorted(company_ids)
+
+        for start in range(0, len(company_ids), batch_size):
+            batch = company_ids[start : start + batch_size]
+
+            with transaction.atomic(using=self.db):
+                computed = self.compute(batch)
+                self.filter(company_id__in=batch).delete()
+                self.bulk_create(
+                    stats for stats in computed.values() if stats.review_count
+                )
+
+
+class CompanyRatingStats(RatingAggregates):
+    """Stores the rating aggregates of a company's reviews"""
+
+    company = models.OneToOneField(
+        Company,
+        primary_key=True,
+        related_name="rating_stats",
+        on_delete=models.CASCADE,
+        verbose_name=_("Company"),
+    )
+
+    objects = CompanyRatingStatsManager()
+
+
+class RollupWatermark(models.Model):
+    """Stores how far a rollup was refreshed"""
+
+    name = models.CharField(max_length=64, primary_key=True)
+    value = models.DateTimeField(null=True, verbose_name=_("Refreshed until"))
+
+
+class DailyRatingChange(models.Model):
+    """Stores a company day whose reviews were updated or deleted
+
+    New reviews are found by date, changes to older reviews are journaled
+    here until the next refresh of the daily rollup.
+    """
+
+    company_id = models.IntegerField()
+    day = models.DateField()
+
+    @classmethod
+    def mark(cls, *reviews):
+        """Journals the company days of reviews"""
+
+        cls.objects.bulk_create(
+            [
+                cls(company_id=company_id, day=timezone.localdate(date))
+                for company_id, date in set(reviews)
+            ]
+        )
+
+
+class CompanyDailyRatingManager(models.Manager):
+    """Maintains the daily rating rollup of companies"""
+
+    WATERMARK = "daily-ratings"
+
+    def aggregate(self, reviews):
+        """Gets the aggregates of reviews by company and day"""
+
+        return (
+            reviews.order_by()
+            .annotate(day=TruncDate("date"))
+            .values("company_id", "day")
+            .annotate(**self.model.aggregations())
+        )
+
+    def refresh(self, full=False):
+        """Recomputes the company days changed since the last refresh
+
+        Reviews dated after the watermark and the journaled days are
+        recomputed, or every day when ``full`` is set or the rollup was
+        never built. Reviews committed later than REVIEWS_ROLLUP_SETTLE
+        seconds after their date may be missed. Returns the number of
+        company days recomputed and the new watermark.
+        """
+
+        until = timezone.now() - timedelta(
+            seconds=settings.REVIEWS_ROLLUP_SETTLE
+        )
+
+        with transaction.atomic():
+            RollupWatermark.objects.get_or_create(name=self.WATERMARK)
+            watermark = RollupWatermark.objects.select_for_update().get(
+                name=self.WATERMARK
+            )
+            changes = list(
+                DailyRatingChange.objects.values_list("id", flat=True)
+            )
+
+            if full or watermark.value is None:
+                count = self.rebuild(until)
+
+            else:
+                count = self.update(watermark.value, until, changes)
+
+            DailyRatingChange.objects.filter(id__in=changes).delete()
+            watermark.value = until
+            watermark.save()
+
+        return count, until
+
+    def invalidate(self):
+        """Makes the next refresh rebuild the whole rollup
+
+        Called after inserting reviews without signals, whose dates may be
+        older than the watermark.
+        """
+
+        RollupWatermark.objects.filter(name=self.WATERMARK).update(value=None)
+
+    def rebuild(self, until):
+        """Replaces the whole rollup by the aggregates of older reviews"""
+
+        self.all().delete()
+        batch_size = settings.REVIEWS_ROLLUP_BATCH_SIZE
+        # Reviews are archived by whole days, so a day is never split
+        rows = itertools.chain.from_iterable(
+            self.aggregate(reviews.filter(date__lt=until)).iterator(
+                chunk_size=batch_size
+            )
+            for reviews in (ArchivedReview.objects, CompanyReview.objects)
+        )
+        count = 0
+        batch = []
+
+        for row in rows:
+            batch.append(self.model(**row))
+
+            if len(batch) == batch_size:
+                count += len(self.bulk_create(batch))
+                batch = []
+
+        return count + len(self.bulk_create(batch))
+
+    def update(self, since, until, changes):
+        """Recomputes the days of new reviews and of journaled changes"""
+
+        days = {}
+        journaled = DailyRatingChange.objects.filter(
+            id__in=changes
+        ).values_list("company_id", "day")
+        created = (
+            CompanyReview.objects.filter(date__gte=since, date__lt=until)
+            .order_by()
+            .annotate(day=TruncDate("date"))
+            .values_list("company_id", "day")
+            .distinct()
+        )
+
+        for company_id, day in (*journaled, *created):
+            days.setdefault(day, set()).add(company_id)
+
+        batch_size = settings.REVIEWS_ROLLUP_BATCH_SIZE
+        count = 0
+
+        for day, company_ids in sorted(days.items()):
+            company_ids = sorted(company_ids)
+
+            for start in range(0, len(company_ids), batch_size):
+                count += self.recompute(
+                    day, company_ids[start : start + batch_size], until
+                )
+
+        return count
+
+    def recompute(self, day, company_ids, until):
+        """Recomputes a day of some companies from their reviews"""
+
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        end = timezone.make_aware(
+            datetime.combine(day + timedelta(days=1), time.min)
+        )
+        self.filter(company_id__in=company_ids, day=day).delete()
+
+        for reviews in (ArchivedReview.objects, CompanyReview.objects):
+            reviews = reviews.filter(
+                company_id__in=company_ids,
+                date__gte=start,
+                date__lt=min(end, until),
+            )
+            self.bulk_create(
+                [self.model(**row) for row in self.aggregate(reviews)]
+            )
+
+        return len(company_ids)
+
+
+class CompanyDailyRating(RatingAggregates):
+    """Stores the rating aggregates of a company's reviews of one day"""
+
+    company = models.ForeignKey(
+        Company,
+        related_name="daily_ratings",
+        on_delete=models.CASCADE,
+        verbose_name=_("Company"),
+    )
+    day = models.DateField(verbose_name=_("Day"))
+
+    objects = CompanyDailyRatingManager()
+
+    class Meta:
+        """Configuration for this model"""
+
+        constraints = [
+            # Also serves the time series of a company over a range of days
+            models.UniqueConstraint(
+                fields=["company", "day"], name="daily_rating_company_day"
+            )
+        ]
+
+
+class ReviewSignature(models.Model):
+    """Stores the MinHash signature of the summary of a review"""
+
+    review = models.OneToOneField(
+        CompanyReview,
+        primary_key=True,
+        related_name="signature",
+        on_delete=models.CASCADE,
+        verbose_name=_("Review"),
+    )
+    # Packed 32-bit hashes, empty for summaries too short to compare
+    signature = models.BinaryField(verbose_name=_("Signature"))
+    # Most similar review found when the signature was stored
+    duplicate_of = models.ForeignKey(
+        CompanyReview,
+        null=True,
+        blank=True,
+        related_name="+",
+        on_delete=models.SET_NULL,
+        verbose_name=_("Near-duplicate of"),
+    )
+    similarity = models.FloatField(null=True, verbose_name=_("Similarity"))
+
+
+class ReviewBucket(models.Model):
+    """Stores a locality-sensitive hash of a band of a review signature"""
+
+    review = models.ForeignKey(
+        CompanyReview,
+        related_name="buckets",
+        on_delete=models.CASCADE,
+        verbose_name=_("Review"),
+    )
+    bucket = models.BigIntegerField(db_index=True, verbose_name=_("Bucket"))
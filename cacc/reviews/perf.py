@@ -0,0 +1,191 @@
+"""Per-request timings of the database, authentication, serialization and
+rendering, aggregated into per-route histograms
+
+The middleware starts a ``Recorder`` for the sampled requests and keeps it
+in a context variable, which follows the request into threads run by
+``sync_to_async``. Code timing one of the phases uses ``timed()``, which does
+nothing for requests that are not sampled. Phases may overlap, the queries
+sent while authenticating count in both ``auth`` and ``db``.
+"""
+
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+PHASES = ("db", "auth", "serialize", "render", "total")
+
+# Upper bounds in milliseconds of the histogram buckets, the last bucket
+# holds everything slower
+BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+CURRENT = contextvars.ContextVar("reviews_perf_recorder", default=None)
+
+
+class Recorder:
+    """Timings and query count of a single request"""
+
+    def __init__(self):
+        """Starts the clock of a request"""
+
+        self.started = time.perf_counter()
+        self.durations = dict.fromkeys(PHASES, 0.0)
+        self.queries = 0
+
+    def add(self, phase, seconds):
+        """Adds time spent in a phase"""
+
+        self.durations[phase] += seconds
+
+    def finish(self):
+        """Stops the clock of the request"""
+
+        self.durations["total"] = time.perf_counter() - self.started
+
+    def header(self):
+        """Formats the timings as a Server-Timing header value"""
+
+        metrics = []
+
+        for phase in PHASES:
+            metric = f"{phase};dur={self.durations[phase] * 1000:.3f}"
+
+            if phase == "db":
+                metric += f';desc="{self.queries} queries"'
+
+            metrics.append(metric)
+
+        return ", ".join(metrics)
+
+
+@contextmanager
+def timed(phase):
+    """Adds the time spent in the block to a phase of the current request"""
+
+    recorder = CURRENT.get()
+
+    if recorder is None:
+        yield
+        return
+
+    start = time.perf_counter()
+
+    try:
+        yield
+
+    finally:
+        recorder.add(phase, time.perf_counter() - start)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper counting and timing queries"""
+
+    recorder = CURRENT.get()
+
+    if recorder is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+
+    try:
+        return execute(sql, params, many, context)
+
+    finally:
+        recorder.queries += 1
+        recorder.add("db", time.perf_counter() - start)
+
+
+def install_query_recorder(connection):
+    """Wraps the queries of a database connection once"""
+
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class RouteMetrics:
+    """Thread-safe histograms of the phase timings of every route
+
+    Metrics are kept in the memory of each process, a deployment running
+    several workers serves the metrics of the worker answering.
+    """
+
+    def __init__(self):
+        """Initializes empty metrics"""
+
+        self.routes = {}
+        self.lock = threading.Lock()
+
+    def new_route(self):
+        """Gets the empty metrics of a route"""
+
+        return {
+            "count": 0,
+            "queries": 0,
+            "phases": {
+                phase: {"sum": 0.0, "buckets": [0] * (len(BUCKETS) + 1)}
+                for phase in PHASES
+            },
+        }
+
+    def observe(self, route, recorder):
+        """Adds the timings of a request to the metrics of its route"""
+
+        with self.lock:
+            metrics = self.routes.get(route)
+
+            if metrics is None:
+                metrics = self.routes[route] = self.new_route()
+
+            metrics["count"] += 1
+            metrics["queries"] += recorder.queries
+
+            for phase, seconds in recorder.durations.items():
+                milliseconds = seconds * 1000
+                histogram = metrics["phases"][phase]
+                histogram["sum"] += milliseconds
+                histogram["buckets"][
+                    bisect.bisect_left(BUCKETS, milliseconds)
+                ] += 1
+
+    def snapshot(self):
+        """Gets the metrics of every route with cumulative buckets"""
+
+        with self.lock:
+            routes = {}
+
+            for route, metrics in sorted(self.routes.items()):
+                count = metrics["count"]
+                phases = {}
+
+                for phase, histogram in metrics["phases"].items():
+                    bounds = [str(bound) for bound in BUCKETS] + ["+Inf"]
+                    cumulative = 0
+                    buckets = {}
+
+                    for bound, observed in zip(bounds, histogram["buckets"]):
+                        cumulative += observed
+                        buckets[bound] = cumulative
+
+                    phases[phase] = {
+                        "sum_ms": round(histogram["sum"], 3),
+                        "mean_ms": round(histogram["sum"] / count, 3),
+                        "buckets": buckets,
+                    }
+
+                routes[route] = {
+                    "count": count,
+                    "queries": metrics["queries"],
+                    "phases": phases,
+                }
+
+            return routes
+
+    def clear(self):
+        """Removes every observation"""
+
+        with self.lock:
+            self.routes.clear()
+
+
+METRICS = RouteMetrics()
@@ -0,0 +1,188 @@
+"""Routing of safe reads to read replicas
+
+Views opt in by choosing a replica once the user of a request is known, the
+router then sends the reads of this request to it. Reads of a user who wrote
+recently stay on the primary so that they see their own writes, and replicas
+failing their health check are left out until they recover.
+"""
+
+import contextvars
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+from . import cache
+
+# Alias of the replica serving the reads of the current request, if any
+CURRENT = contextvars.ContextVar("reviews_read_replica", default=None)
+
+# Apps whose models are replicated and may be read from a replica
+REPLICATED_APPS = {"reviews", "auth"}
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+PIN_KEY = "reviews:replica:pin:{}"
+
+
+class ReadReplicaRouter:
+    """Sends the reads of opted-in requests to their replica"""
+
+    def db_for_read(self, model, **hints):
+        """Gets the replica of the current request for replicated models"""
+
+        alias = CURRENT.get()
+
+        if alias is not None and model._meta.app_label in REPLICATED_APPS:
+            return alias
+
+        return None
+
+    def db_for_write(self, model, **hints):
+        """Sends every write to the primary"""
+
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allows relations between objects read from any copy"""
+
+        return True
+
+
+class ReplicaPool:
+    """Health of the configured replicas, checked every few seconds"""
+
+    def __init__(self):
+        """Initializes a pool with unchecked replicas"""
+
+        self.checks = {}
+        self.lock = threading.Lock()
+
+    def check(self, alias):
+        """Tells whether a replica answers a trivial query"""
+
+        connection = connections[alias]
+
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+                cursor.fetchone()
+
+        except DatabaseError:
+            connection.close()
+            return False
+
+        return True
+
+    def is_healthy(self, alias):
+        """Gets the last health of a replica, checking it if it is due"""
+
+        now = time.monotonic()
+
+        with self.lock:
+            healthy, checked_at = self.checks.get(alias, (None, 0))
+
+        if now - checked_at < settings.REVIEWS_REPLICA_CHECK_INTERVAL:
+            return healthy
+
+        healthy = self.check(alias)
+
+        with self.lock:
+            self.checks[alias] = (healthy, now)
+
+        return healthy
+
+    def choose(self):
+        """Gets a random healthy replica, or None"""
+
+        healthy = [
+            alias
+            for alias in settings.REVIEWS_READ_REPLICAS
+            if self.is_healthy(alias)
+        ]
+
+        return random.choice(healthy) if healthy else None
+
+    def clear(self):
+        """Forgets the results of previous health checks"""
+
+        with self.lock:
+            self.checks.clear()
+
+
+REPLICAS = ReplicaPool()
+
+
+def pin(user):
+    """Sends the reads of a user to the primary for a short while"""
+
+    cache.get_cache().set(
+        PIN_KEY.format(user.pk), 1, settings.REVIEWS_REPLICA_PIN_SECONDS
+    )
+
+
+def is_pinned(user):
+    """Tells whether a user wrote recently"""
+
+    return (
+        user.is_authenticated
+        and cache.get_cache().get(PIN_KEY.format(user.pk)) is not None
+    )
+
+
+def use_replica(request, user):
+    """Sends the following reads of a request to a replica if allowed"""
+
+    if not settings.REVIEWS_READ_REPLICAS:
+        return
+
+    if request.method not in SAFE_METHODS or is_pinned(user):
+        return
+
+    CURRENT.set(REPLICAS.choose())
+
+
+def use_primary():
+    """Sends the following reads of the request to the primary"""
+
+    CURRENT.set(None)
+
+
+class ReplicaReadsMixin:
+    """Serves the safe requests of an API view from a read replica
+
+    The user is authenticated on the primary, the handler then reads from
+    the replica.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        """Chooses the database of the request once its user is known"""
+
+        super().initial(request, *args, **kwargs)
+        use_replica(request, request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        """Sends the reads that follow the response to the primary"""
+
+        use_primary()
+
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ReplicaPageMixin:
+    """Serves the pages of a template view from a read replica
+
+    Pages are rendered after the view returns, reads go back to the primary
+    once the page is rendered.
+    """
+
+    def get(self, request, *args, **kwargs):
+        """Reads the page from a replica"""
+
+        use_replica(request, request.user)
+        response = super().get(request, *args, **kwargs)
+        response.add_post_render_callback(lambda rendered: use_primary())
+
+        return response
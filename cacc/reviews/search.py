@@ -0,0 +1,172 @@
+"""Full-text search over review titles and summaries
+
+PostgreSQL keeps a weighted ``tsvector`` in a generated column with a GIN
+index. SQLite keeps an external content FTS5 table that triggers update on
+every insert, update and delete. Other databases fall back to ``icontains``.
+"""
+
+import re
+
+from django.db import connections
+from django.db.models import Q
+
+REVIEW_TABLE = "reviews_companyreview"
+FTS_TABLE = "reviews_companyreview_fts"
+SEARCH_CONFIG = "english"
+
+POSTGRESQL_INSTALL = (
+    f"ALTER TABLE {REVIEW_TABLE} ADD COLUMN IF NOT EXISTS search_vector "
+    "tsvector GENERATED ALWAYS AS ("
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A')"
+    f" || setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(summary, '')),"
+    " 'B')) STORED",
+    f"CREATE INDEX IF NOT EXISTS review_search_vector_idx ON {REVIEW_TABLE} "
+    "USING GIN (search_vector)",
+)
+POSTGRESQL_UNINSTALL = (
+    "DROP INDEX IF EXISTS review_search_vector_idx",
+    f"ALTER TABLE {REVIEW_TABLE} DROP COLUMN IF EXISTS search_vector",
+)
+
+SQLITE_TRIGGERS = {
+    f"{FTS_TABLE}_insert": (
+        f"AFTER INSERT ON {REVIEW_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, title, summary) "
+        "VALUES (new.id, new.title, new.summary); END"
+    ),
+    f"{FTS_TABLE}_delete": (
+        f"AFTER DELETE ON {REVIEW_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, summary) "
+        "VALUES ('delete', old.id, old.title, old.summary); END"
+    ),
+    f"{FTS_TABLE}_update": (
+        f"AFTER UPDATE OF title, summary ON {REVIEW_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, summary) "
+        "VALUES ('delete', old.id, old.title, old.summary); "
+        f"INSERT INTO {FTS_TABLE}(rowid, title, summary) "
+        "VALUES (new.id, new.title, new.summary); END"
+    ),
+}
+
+
+def install(connection):
+    """Creates the search index of a database if it is missing
+
+    SQLite drops triggers whenever Django remakes the review table during
+    a migration, so the triggers are recreated and the index rebuilt when
+    any of them is missing. Safe to call repeatedly.
+    """
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            for statement in POSTGRESQL_INSTALL:
+                cursor.execute(statement)
+
+        elif connection.vendor == "sqlite":
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+                "AND tbl_name = %s",
+                [REVIEW_TABLE],
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+
+            if existing.issuperset(SQLITE_TRIGGERS):
+                return
+
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"title, summary, content='{REVIEW_TABLE}', "
+                "content_rowid='id', tokenize='porter unicode61')"
+            )
+            # Title matches weigh more than summary matches
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) "
+                "VALUES ('rank', 'bm25(10.0, 1.0)')"
+            )
+
+            for name, definition in SQLITE_TRIGGERS.items():
+                cursor.execute(
+                    f"CREATE TRIGGER IF NOT EXISTS {name} {definition}"
+                )
+
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+            )
+
+
+def repair(connection):
+    """Recreates the SQLite triggers if a migration dropped them"""
+
+    if connection.vendor != "sqlite":
+        return
+
+    if FTS_TABLE in connection.introspection.table_names():
+        install(connection)
+
+
+def uninstall(connection):
+    """Removes the search index of a database"""
+
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            for statement in POSTGRESQL_UNINSTALL:
+                cursor.execute(statement)
+
+        elif connection.vendor == "sqlite":
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+
+def fts5_query(terms):
+    """Builds an FTS5 query matching every word of the search terms"""
+
+    words = re.findall(r"\w+", terms)
+
+    return " ".join(f'"{word}"' for word in words)
+
+
+def search_reviews(queryset, terms):
+    """Filters reviews matching the search terms, best matches first
+
+    Matching reviews are annotated with a ``search_rank`` where higher
+    values are better matches.
+    """
+
+    vendor = connections[queryset.db].vendor
+
+    if vendor == "postgresql":
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+
+        return queryset.extra(
+            select={
+                "search_rank": (
+                    f"ts_rank_cd({REVIEW_TABLE}.search_vector, {tsquery})"
+                )
+            },
+            select_params=[terms],
+            where=[f"{REVIEW_TABLE}.search_vector @@ {tsquery}"],
+            params=[terms],
+        ).order_by("-search_rank", "-id")
+
+    if vendor == "sqlite":
+        query = fts5_query(terms)
+
+        if not query:
+            return queryset.none()
+
+        # FTS5 ranks with bm25, where lower values are better matches
+        return queryset.extra(
+            select={"search_rank": f"-{FTS_TABLE}.rank"},
+            tables=[FTS_TABLE],
+            where=[
+                f"{FTS_TABLE}.rowid = {REVIEW_TABLE}.id",
+                f"{FTS_TABLE} MATCH %s",
+            ],
+            params=[query],
+        ).order_by("-search_rank", "-id")
+
+    return queryset.filter(
+        Q(title__icontains=terms) | Q(summary__icontains=terms)
+    ).order_by("-date", "-id")
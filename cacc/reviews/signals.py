@@ -0,0 +1,115 @@
+from django.db import connections, transaction
+
+from . import addresses, autocomplete, cache, models, perf, search
+
+
+def repair_search_index(sender, using, **kwargs):
+    """Restores the search triggers after migrations ran"""
+
+    search.repair(connections[using])
+
+
+def invalidate_cached_pages(sender, **kwargs):
+    """Invalidates the cached pages depending on a changed model"""
+
+    on_bump = None
+
+    # The autocomplete index applies this process's changes itself
+    if sender is models.Company:
+        on_bump = autocomplete.COMPANY_INDEX.record_generation
+
+    cache.invalidate(sender._meta.label, on_bump)
+
+
+def count_saved_object(sender, instance, created, **kwargs):
+    """Counts a new object in the cached list counts"""
+
+    if created:
+        cache.count_objects(sender._meta.label, [instance], 1)
+
+
+def uncount_deleted_object(sender, instance, **kwargs):
+    """Removes a deleted object from the cached list counts"""
+
+    cache.count_objects(sender._meta.label, [instance], -1)
+
+
+def invalidate_user_record(sender, instance, update_fields=None, **kwargs):
+    """Discards the cached authentication record of a changed user"""
+
+    from .api import authentication
+
+    # Logging in only touches last_login, which records do not hold
+    if update_fields is not None and set(update_fields) == {"last_login"}:
+        return
+
+    authentication.invalidate_user(instance.pk)
+
+
+def record_queries(sender, connection, **kwargs):
+    """Counts and times the queries of a new database connection"""
+
+    perf.install_query_recorder(connection)
+
+
+def index_company(sender, instance, **kwargs):
+    """Updates the name of a saved company in the autocomplete index"""
+
+    pk, name = instance.pk, instance.name
+    transaction.on_commit(lambda: autocomplete.COMPANY_INDEX.update(pk, name))
+
+
+def unindex_company(sender, instance, **kwargs):
+    """Removes a deleted company from the autocomplete index"""
+
+    pk = instance.pk
+    transaction.on_commit(lambda: autocomplete.COMPANY_INDEX.remove(pk))
+
+
+def track_review_rollup(sender, instance, **kwargs):
+    """Remembers the rollup fields of a loaded or saved review"""
+
+    instance._rollup_values = {
+        field: instance.__dict__.get(field)
+        for field in models.CompanyReview.ROLLUP_FIELDS
+    }
+
+
+def mark_changed_review(sender, instance, raw=False, **kwargs):
+    """Journals the rollup days of a review about to be updated"""
+
+    # New reviews are found by date when refreshing the rollup
+    if raw or instance._state.adding:
+        return
+
+    fields = sender.ROLLUP_FIELDS
+    stored = getattr(instance, "_rollup_values", {})
+
+    # Deferred fields and reviews saved by bulk_create are not tracked
+    if any(stored.get(field) is None for field in fields):
+        stored = sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+        if stored is None:
+            return
+
+    current = {
+        field: instance.__dict__.get(field, stored[field]) for field in fields
+    }
+
+    if current != stored:
+        models.DailyRatingChange.mark(
+            (stored["company_id"], stored["date"]),
+            (current["company_id"], current["date"]),
+        )
+
+
+def mark_deleted_review(sender, instance, **kwargs):
+    """Journals the rollup day of a deleted review"""
+
+    models.DailyRatingChange.mark((instance.company_id, instance.date))
+
+
+def pack_review_address(sender, instance, **kwargs):
+    """Stores the packed form of the address of a saved review"""
+
+    instance.ip_packed = addresses.pack(instance.ip_address)
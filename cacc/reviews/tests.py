@@ -0,0 +1,594 @@
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count, Max, Min, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import addresses, bulkload, cache, models, routers, search, views
+from .benchmark import data, mix
+from .api.v1.tests import (
+    CAMPAIGN_SUMMARY,
+    ReplicaTestMixin,
+    create_random_reviews,
+)
+
+ADMIN_USER_USERNAME = "admin"
+
+
+class TestReviewListViews(TestCase):
+    """Tests for the administrator review list views"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Logs in as an administrator"""
+
+        self.admin = models.Reviewer.objects.get(username=ADMIN_USER_USERNAME)
+        self.reviewers = models.Reviewer.objects.filter(is_staff=False)
+        self.client.force_login(self.admin)
+
+    def count_queries(self, url):
+        """Counts the queries issued to render a url"""
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+
+        self.assertEqual(response.status_code, 200)
+
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_reviews(self):
+        """Tests that the list views issue a constant number of queries"""
+
+        reviewer = self.reviewers.first()
+        urls = [
+            reverse("review-list"),
+            reverse("review-list-by-user", kwargs={"reviewer": reviewer.id}),
+        ]
+
+        create_random_reviews(3, [reviewer])
+        small = [self.count_queries(url) for url in urls]
+
+        create_random_reviews(views.REVIEWS_PER_PAGE * 2, [reviewer])
+        large = [self.count_queries(url) for url in urls]
+
+        self.assertEqual(small, large)
+
+    def test_template_rendering_is_timed(self):
+        """Tests that the list views report their rendering time"""
+
+        response = self.client.get(reverse("review-list"))
+        metrics = dict(
+            metric.strip().split(";")[:2]
+            for metric in response["Server-Timing"].split(",")
+        )
+
+        self.assertGreater(float(metrics["render"][len("dur=") :]), 0)
+        self.assertGreater(float(metrics["auth"][len("dur=") :]), 0)
+
+    def test_reviews_are_paginated(self):
+        """Tests that a page only holds a limited number of reviews"""
+
+        create_random_reviews(views.REVIEWS_PER_PAGE + 5, self.reviewers)
+        total = models.CompanyReview.objects.count()
+
+        response = self.client.get(reverse("review-list"))
+        self.assertEqual(
+            len(response.context["reviews"]), views.REVIEWS_PER_PAGE
+        )
+        self.assertEqual(response.context["page_obj"].paginator.count, total)
+
+        response = self.client.get(reverse("review-list"), {"page": 2})
+        self.assertEqual(
+            len(response.context["reviews"]), total - views.REVIEWS_PER_PAGE
+        )
+
+    def test_unknown_objects_respond_with_not_found(self):
+        """Tests that unknown reviewers and reviews respond with not found"""
+
+        response = self.client.get(
+            reverse("review-list-by-user", kwargs={"reviewer": 9999})
+        )
+        self.assertEqual(response.status_code, 404)
+
+        response = self.client.get(
+            reverse("review-detail", kwargs={"review": 9999})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_reviews_can_be_searched(self):
+        """Tests that the list can be narrowed with a search"""
+
+        create_random_reviews(5, self.reviewers)
+        review = models.CompanyReview.objects.first()
+        review.title = "Exceptional mentoring"
+        review.save()
+
+        response = self.client.get(
+            reverse("review-list"), {"search": "mentoring"}
+        )
+
+        self.assertEqual(list(response.context["reviews"]), [review])
+        self.assertContains(response, "Exceptional mentoring")
+
+    def test_reviews_can_be_filtered_by_network(self):
+        """Tests that the list can be narrowed to an address range"""
+
+        create_random_reviews(5, self.reviewers)
+        review = models.CompanyReview.objects.first()
+        review.ip_address = "2001:db8::7"
+        review.save()
+        url = reverse("review-list")
+
+        response = self.client.get(url, {"network": "2001:db8::/32"})
+        self.assertEqual(list(response.context["reviews"]), [review])
+
+        response = self.client.get(url, {"network": "2001:db8::/129"})
+        self.assertEqual(list(response.context["reviews"]), [])
+        self.assertContains(response, "Enter an address or a network")
+
+    def test_packed_addresses_are_backfilled(self):
+        """Tests that the command packs the addresses of older reviews"""
+
+        create_random_reviews(3, self.reviewers)
+        models.CompanyReview.objects.update(ip_packed=None)
+        models.CompanyReview.objects.filter(
+            pk=models.CompanyReview.objects.first().pk
+        ).update(ip_address="10.1.2.3")
+
+        output = StringIO()
+        call_command("pack_review_addresses", batch_size=2, stdout=output)
+
+        # The addresses of create_random_reviews are not valid
+        self.assertIn("addresses of 1 reviews, 3 invalid", output.getvalue())
+        self.assertEqual(
+            models.CompanyReview.objects.filter(
+                ip_packed__range=addresses.network_range("10.0.0.0/8")
+            ).count(),
+            1,
+        )
+
+    def test_archived_reviews_are_shown(self):
+        """Tests that archived reviews keep their detail page"""
+
+        review = models.CompanyReview.objects.first()
+        models.CompanyReview.objects.filter(pk=review.pk).update(
+            date=timezone.now() - timedelta(days=400)
+        )
+        output = StringIO()
+        call_command("archive_reviews", older_than=365, stdout=output)
+        self.assertIn("Archived 1 reviews dated before", output.getvalue())
+
+        response = self.client.get(
+            reverse("review-detail", kwargs={"review": review.pk})
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, review.title)
+        self.assertNotIn(
+            review, self.client.get(reverse("review-list")).context["reviews"]
+        )
+
+        with self.assertRaises(CommandError):
+            call_command("archive_reviews", before="2020-13-01")
+
+
+@skipUnless(connection.vendor == "sqlite", "Uses the SQLite search index")
+class TestSearchIndexRepair(TestCase):
+    """Tests for restoring the SQLite search triggers"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def test_dropped_triggers_are_restored(self):
+        """Tests that repairing restores triggers and reindexes reviews"""
+
+        with connection.cursor() as cursor:
+            for name in search.SQLITE_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER {name}")
+
+        reviewer = models.Reviewer.objects.filter(is_staff=False).first()
+        create_random_reviews(1, [reviewer])
+        review = models.CompanyReview.objects.latest("id")
+
+        search.repair(connection)
+
+        found = search.search_reviews(
+            models.CompanyReview.objects.all(), review.title
+        )
+        self.assertIn(review, found)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"]
+)
+class TestBenchmarkTools(TestCase):
+    """Tests for the benchmark data generator and request replay"""
+
+    def setUp(self):
+        """Generates a small skewed data set"""
+
+        self.counts = data.generate(20, 10, 500, seed=1, batch_size=64)
+
+    def test_generated_reviews_are_skewed(self):
+        """Tests that a few companies hold most of the reviews"""
+
+        self.assertEqual(
+            self.counts, {"companies": 20, "reviewers": 10, "reviews": 500}
+        )
+        self.assertEqual(models.CompanyReview.objects.count(), 500)
+
+        per_company = sorted(
+            models.CompanyReview.objects.values("company")
+            .annotate(count=Count("id"))
+            .values_list("count", flat=True),
+            reverse=True,
+        )
+        self.assertGreater(sum(per_company[:4]), 250)
+
+        dates = models.CompanyReview.objects.aggregate(
+            first=Min("date"), last=Max("date")
+        )
+        self.assertGreater(dates["last"] - dates["first"], timedelta(days=30))
+
+    def test_generated_data_is_consistent(self):
+        """Tests that aggregates and the search index cover new reviews"""
+
+        call_command("rebuild_company_stats", "--verify", stdout=StringIO())
+
+        review = models.CompanyReview.objects.first()
+        word = review.title.split()[0]
+        matches = search.search_reviews(models.CompanyReview.objects, word)
+        self.assertIn(review, matches)
+
+    def test_generated_history_is_rolled_up(self):
+        """Tests that a refresh after generating data covers every review"""
+
+        models.CompanyDailyRating.objects.refresh()
+        data.generate(5, 5, 100, seed=2, batch_size=64)
+        _, until = models.CompanyDailyRating.objects.refresh()
+
+        rolled_up = models.CompanyDailyRating.objects.all().aggregate(
+            total=Sum("review_count")
+        )["total"]
+        self.assertEqual(
+            rolled_up,
+            models.CompanyReview.objects.filter(date__lt=until).count(),
+        )
+
+    def test_seeded_reviews_are_aggregated(self):
+        """Tests that the pagination benchmark seed keeps aggregates right"""
+
+        models.CompanyDailyRating.objects.refresh()
+        counts = cache.get_generations(
+            [cache.COUNTS_LABEL.format(models.CompanyReview._meta.label)]
+        )
+
+        call_command(
+            "benchmark_pagination",
+            seed=50,
+            page=2,
+            page_size=10,
+            repeat=1,
+            stdout=StringIO(),
+        )
+
+        call_command("rebuild_company_stats", "--verify", stdout=StringIO())
+        self.assertIsNone(
+            models.RollupWatermark.objects.get(
+                name=models.CompanyDailyRating.objects.WATERMARK
+            ).value
+        )
+        self.assertNotEqual(
+            cache.get_generations(
+                [cache.COUNTS_LABEL.format(models.CompanyReview._meta.label)]
+            ),
+            counts,
+        )
+
+    def test_replay_reports_every_route(self):
+        """Tests that the replay reports latencies and query counts"""
+
+        output = StringIO()
+        call_command(
+            "run_benchmark", "--requests=200", "--warmup=0", stdout=output
+        )
+        report = json.loads(output.getvalue())
+
+        self.assertEqual(report["transport"], "client")
+        self.assertEqual(report["overall"]["count"], 200)
+        self.assertEqual(report["overall"]["errors"], 0)
+
+        for summary in report["routes"].values():
+            latency = summary["latency_ms"]
+            self.assertLessEqual(latency["p50"], latency["p95"])
+            self.assertLessEqual(latency["p95"], latency["p99"])
+            self.assertIsNotNone(summary["queries"])
+
+        weighted = {entry["name"] for entry in mix.load_mix()}
+        self.assertGreater(len(report["routes"]), len(weighted) / 2)
+
+    def test_compression_levels_are_compared(self):
+        """Tests that every encoder and level is reported on real pages"""
+
+        output = StringIO()
+        call_command(
+            "benchmark_compression",
+            pages=2,
+            repeat=1,
+            longest=True,
+            stdout=output,
+        )
+        lines = output.getvalue().splitlines()
+
+        self.assertIn("2 pages of", output.getvalue())
+        self.assertEqual(sum(line.startswith("gzip ") for line in lines), 9)
+
+
+class BulkLoadTestMixin:
+    """Writes the files to load to a temporary directory"""
+
+    def setUp(self):
+        """Creates the temporary directory"""
+
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        """Writes a file to load and returns its path"""
+
+        path = os.path.join(self.directory, name)
+
+        with open(path, "w", encoding="utf-8") as stream:
+            stream.write(content)
+
+        return path
+
+    def bulk_load(self, *args, **options):
+        """Runs the bulk loader and returns its output"""
+
+        output = StringIO()
+        call_command("bulk_load", *args, stdout=output, **options)
+
+        return output.getvalue()
+
+
+class TestBulkLoad(BulkLoadTestMixin, TestCase):
+    """Tests for the bulk loader command"""
+
+    def test_fixtures_load_like_loaddata(self):
+        """Tests that Django fixtures are loaded with their ids"""
+
+        fixtures = os.path.join(os.path.dirname(__file__), "fixtures", "test")
+        output = self.bulk_load(
+            *(
+                os.path.join(fixtures, f"{name}.json")
+                for name in ("companies", "users", "reviews")
+            )
+        )
+
+        self.assertIn("Loaded 1 companies, 3 reviewers and 1 reviews", output)
+        self.assertIn("rows/s", output)
+        admin = models.Reviewer.objects.get(username=ADMIN_USER_USERNAME)
+        self.assertTrue(admin.is_staff)
+        self.assertTrue(admin.password.startswith("pbkdf2_sha256$"))
+
+        review = models.CompanyReview.objects.get(pk=1)
+        self.assertEqual(review.reviewer.username, ADMIN_USER_USERNAME)
+        self.assertEqual(review.date.isoformat(), "2020-01-01T00:00:00+00:00")
+
+        stats = models.CompanyRatingStats.objects.get(company=review.company)
+        self.assertEqual((stats.review_count, stats.rating_sum), (1, 4))
+
+    def test_flat_records_are_loaded(self):
+        """Tests NDJSON and CSV records of a model given on the command"""
+
+        companies = self.write(
+            "companies.ndjson",
+            '{"name": "Acme"}\n\n{"name": "Initech"}\n',
+        )
+        self.bulk_load(companies, model="company")
+        acme = models.Company.objects.get(name="Acme")
+
+        reviewers = self.write(
+            "reviewers.csv", "username,email,last_login\nloaded,,\n"
+        )
+        self.bulk_load(reviewers, model="reviewer")
+        reviewer = models.Reviewer.objects.get(username="loaded")
+        self.assertFalse(reviewer.has_usable_password())
+        self.assertIsNone(reviewer.last_login)
+        self.assertTrue(reviewer.is_active)
+
+        reviews = self.write(
+            "reviews.csv",
+            "company,reviewer,rating,title,summary,ip_address,date\n"
+            f'{acme.pk},{reviewer.pk},5,"Loaded, quoted",Fine,10.0.0.1,'
+            "2021-03-04 05:06:07\n"
+            f"{acme.pk},{reviewer.pk},3,Undated,Fine,10.0.0.2,\n",
+        )
+        output = self.bulk_load(reviews, model="review", batch_size=1)
+        self.assertIn("2 reviews", output)
+
+        dated = models.CompanyReview.objects.get(title="Loaded, quoted")
+        self.assertEqual(dated.date.isoformat(), "2021-03-04T05:06:07+00:00")
+        undated = models.CompanyReview.objects.get(title="Undated")
+        self.assertLess(timezone.now() - undated.date, timedelta(minutes=1))
+        self.assertEqual(bytes(undated.ip_packed), addresses.pack("10.0.0.2"))
+
+        stats = models.CompanyRatingStats.objects.get(company=acme)
+        self.assertEqual((stats.review_count, stats.rating_sum), (2, 8))
+        self.assertEqual(
+            list(
+                search.search_reviews(
+                    models.CompanyReview.objects.all(), "quoted"
+                )
+            ),
+            [dated],
+        )
+
+    def test_json_arrays_are_streamed(self):
+        """Tests that array items split across reads are decoded"""
+
+        items = [{"name": "[a, b]"}, {"name": 'say "hi"'}, {"nested": [1, 2]}]
+        text = json.dumps(items, indent=2)
+
+        with patch.object(bulkload, "READ_SIZE", 5):
+            decoded = list(bulkload.json_items(StringIO(text)))
+
+            self.assertEqual(decoded, items)
+            self.assertEqual(list(bulkload.json_items(StringIO(" [ ] "))), [])
+
+            for invalid in ('{"name": 1}', "[{}", '[{"name": }]'):
+                with self.subTest(invalid=invalid):
+                    with self.assertRaises(bulkload.BulkLoadError):
+                        list(bulkload.json_items(StringIO(invalid)))
+
+    def test_invalid_input_is_reported(self):
+        """Tests that unusable files fail with a command error"""
+
+        for name, content, options in (
+            ("companies.ndjson", '{"name": "Acme"}\n', {}),
+            ("companies.txt", "name\nAcme\n", {"model": "company"}),
+            ("companies.ndjson", "{name}\n", {"model": "company"}),
+            ("groups.json", '[{"model": "auth.group", "fields": {}}]', {}),
+        ):
+            with self.subTest(name=name, content=content):
+                with self.assertRaises(CommandError):
+                    self.bulk_load(self.write(name, content), **options)
+
+
+class TestBulkLoadIndexes(BulkLoadTestMixin, TransactionTestCase):
+    """Tests for the bulk loader with the indexes dropped"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def test_indexes_are_rebuilt(self):
+        """Tests that the dropped indexes and search index are back"""
+
+        reviews = self.write(
+            "reviews.ndjson",
+            "".join(
+                json.dumps(
+                    {
+                        "company": 1,
+                        "reviewer": 2,
+                        "rating": 2,
+                        "title": f"Bulk {index}",
+                        "summary": "Loaded without indexes",
+                        "ip_address": "10.0.0.1",
+                    }
+                )
+                + "\n"
+                for index in range(50)
+            ),
+        )
+        output = self.bulk_load(reviews, model="review", drop_indexes=True)
+        self.assertIn("Rebuilt the indexes", output)
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, models.CompanyReview._meta.db_table
+            )
+
+        for index in models.CompanyReview._meta.indexes:
+            self.assertIn(index.name, constraints)
+
+        found = search.search_reviews(
+            models.CompanyReview.objects.all(), "indexes"
+        )
+        self.assertEqual(found.count(), 50)
+
+
+class TestClusterReviews(TestCase):
+    """Tests for the near-duplicate backfill and clustering command"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def cluster_reviews(self, **options):
+        """Runs the command and returns its output"""
+
+        output = StringIO()
+        call_command("cluster_reviews", stdout=output, **options)
+
+        return output.getvalue()
+
+    def test_existing_reviews_are_indexed_and_clustered(self):
+        """Tests that reviews saved without signatures are backfilled"""
+
+        review = models.CompanyReview.objects.get()
+        summaries = [
+            CAMPAIGN_SUMMARY,
+            CAMPAIGN_SUMMARY.replace("bright", "sunny"),
+            CAMPAIGN_SUMMARY.replace("friendly", "pleasant"),
+            "A long review with a lot to say about hours, pay and managers",
+        ]
+        ids = [
+            models.CompanyReview.objects.create(
+                title="Backfilled",
+                summary=summary,
+                company=review.company,
+                rating=1,
+                reviewer=review.reviewer,
+                ip_address="10.0.0.1",
+            ).pk
+            for summary in summaries
+        ]
+
+        output = self.cluster_reviews(batch_size=2)
+        self.assertIn("Indexed 5 reviews", output)
+        self.assertIn("2 flagged", output)
+        self.assertIn("Found 1 clusters", output)
+        self.assertIn(f"3 reviews: {ids[0]}, {ids[1]}, {ids[2]}", output)
+        self.assertEqual(models.ReviewSignature.objects.count(), 5)
+
+        output = self.cluster_reviews()
+        self.assertIn("Indexed 0 reviews", output)
+
+        output = self.cluster_reviews(rebuild=True, min_size=4)
+        self.assertIn("Indexed 5 reviews", output)
+        self.assertIn("Found 0 clusters", output)
+
+
+class TestReviewPageReplicaReads(ReplicaTestMixin, TransactionTestCase):
+    """Tests for the routing of the administrator pages to a replica"""
+
+    fixtures = ["test/companies", "test/users", "test/reviews"]
+
+    def setUp(self):
+        """Logs in as an administrator"""
+
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def test_pages_are_rendered_from_the_replica(self):
+        """Tests that the lazy querysets of a page read from the replica"""
+
+        review = self.create_replica_review("Replicated review")
+
+        response = self.client.get(reverse("review-list"))
+        self.assertContains(response, "Replicated review")
+
+        response = self.client.get(
+            reverse("review-detail", kwargs={"review": review.pk})
+        )
+        self.assertContains(response, "Replicated review")
+        self.assertIsNone(routers.CURRENT.get())
+
+    def test_pinned_users_read_from_the_primary(self):
+        """Tests that a user who just wrote reads the primary"""
+
+        self.create_replica_review("Replicated review")
+        routers.pin(self.admin)
+
+        response = self.client.get(reverse("review-list"))
+        self.assertNotContains(response, "Replicated review")
@@ -1,7 +1,12 @@
 from django.contrib.auth.mixins import UserPassesTestMixin
+from django.core.paginator import Paginator
+from django.http import Http404
+from django.shortcuts import get_object_or_404
 from django.views.generic import TemplateView
 
-from . import models
+from . import addresses, models, perf, routers, search
+
+REVIEWS_PER_PAGE = 50
 
 
 class AdminOnlyViewMixin(UserPassesTestMixin):
@@ -9,10 +14,57 @@ class AdminOnlyViewMixin(UserPassesTestMixin):
 
     def test_func(self):
         """Tests whether the user is an admin or not"""
-        return self.request.user.is_staff
 
+        # Loading the session and its user is the authentication of a page
+        with perf.timed("auth"):
+            return self.request.user.is_staff
+
+
+class ReviewPageMixin:
+    """Mixin for paginating review lists server side"""
+
+    paginate_by = REVIEWS_PER_PAGE
+
+    def paginate_reviews(self, context, queryset):
+        """Adds a page of reviews from the queryset to the context"""
+
+        # The summary is only shown on the detail view
+        queryset = queryset.defer("summary")
+        network = self.request.GET.get("network", "").strip()
+
+        if network:
+            context["network"] = network
+
+            try:
+                queryset = queryset.filter(
+                    ip_packed__range=addresses.network_range(network)
+                )
+
+            except ValueError:
+                context["network_error"] = "Enter an address or a network"
+                queryset = queryset.none()
+
+        terms = self.request.GET.get("search", "").strip()
 
-class ReviewListView(AdminOnlyViewMixin, TemplateView):
+        if terms:
+            queryset = search.search_reviews(queryset, terms)
+            context["search"] = terms
+
+        else:
+            queryset = queryset.order_by("-date", "-id")
+
+        paginator = Paginator(queryset, self.paginate_by)
+        page = paginator.get_page(self.request.GET.get("page"))
+
+        context["page_obj"] = page
+        context["reviews"] = page.object_list
+
+        return context
+
+
+class ReviewListView(
+    AdminOnlyViewMixin, routers.ReplicaPageMixin, ReviewPageMixin, TemplateView
+):
     """Lists all company reviews"""
 
     template_name = "reviews/review-list.html"
@@ -22,12 +74,16 @@ class ReviewListView(AdminOnlyViewMixin, TemplateView):
 
         context = super().get_context_data(**kwargs)
 
-        context["reviews"] = models.CompanyReview.objects.all()
+        reviews = models.CompanyReview.objects.select_related(
+            "reviewer", "company"
+        )
 
-        return context
+        return self.paginate_reviews(context, reviews)
 
 
-class UserReviewListView(AdminOnlyViewMixin, TemplateView):
+class UserReviewListView(
+    AdminOnlyViewMixin, routers.ReplicaPageMixin, ReviewPageMixin, TemplateView
+):
     """Lists all reviews by a user"""
 
     template_name = "reviews/review-list.html"
@@ -37,16 +93,19 @@ class UserReviewListView(AdminOnlyViewMixin, TemplateView):
         context = super().get_context_data(**kwargs)
 
         reviewer_id = kwargs.get("reviewer")
-        reviewer = models.Reviewer.objects.get(id=reviewer_id)
-        reviews = models.CompanyReview.objects.filter(reviewer=reviewer)
+        reviewer = get_object_or_404(models.Reviewer, id=reviewer_id)
+        reviews = models.CompanyReview.objects.select_related(
+            "company"
+        ).filter(reviewer=reviewer)
 
         context["focused_reviewer"] = reviewer
-        context["reviews"] = reviews
 
-        return context
+        return self.paginate_reviews(context, reviews)
 
 
-class ReviewDetaiView(AdminOnlyViewMixin, TemplateView):
+class ReviewDetaiView(
+    AdminOnlyViewMixin, routers.ReplicaPageMixin, TemplateView
+):
     """Shows the detail for a review"""
 
     template_name = "reviews/review-detail.html"
@@ -56,7 +115,22 @@ class ReviewDetaiView(AdminOnlyViewMixin, TemplateView):
         context = super().get_context_data(**kwargs)
 
         review_id = kwargs.get("review")
-        review = models.CompanyReview.objects.get(id=review_id)
+
+        try:
+            review = get_object_or_404(
+                models.CompanyReview.objects.select_related(
+                    "reviewer", "company"
+                ),
+                id=review_id,
+            )
+
+        except Http404:
+            review = get_object_or_404(
+                models.ArchivedReview.objects.select_related(
+                    "reviewer", "company"
+                ),
+                id=review_id,
+            )
 
         context["review"] = review
         context["max_rating"] = models.CompanyReview.MAX_RATING_VALUE